@@ -18,6 +18,8 @@ def initialize(test_mode=False):
     """
     global CLIENTS
     CLIENTS = create_clients(test_mode=test_mode)
+    hwp._reset()
+    smurf._reset()
 
 
 __all__ = ["acu",
@@ -5,17 +5,106 @@ The usual caveats apply, these interfaces might change without notice.
 """
 
 import datetime as dt
+import random
 import signal
+import threading
 import time
 
+from collections import Counter
 from functools import wraps
 
 import ocs
 import sorunlib as run
 
+from ocs.client_http import ControlClientError
+from sorunlib import util
+from sorunlib.util import CircuitOpenError
+
 from sorunlib.commands import _timestamp_to_utc_datetime
 
 
+# Deadline, in seconds, for all shutdown operations to complete
+SHUTDOWN_TIMEOUT = 120
+
+# Retry policy for each type of request on an Operation. Only requests that are
+# safe to repeat are retried, i.e. starting an Operation is not. Retries are
+# delayed by 'backoff' seconds, doubling after each attempt, plus up to a
+# fraction 'jitter' of that delay at random.
+RETRY_POLICIES = {
+    'status': {'attempts': 3, 'backoff': 0.5, 'jitter': 0.5},
+    'wait': {'attempts': 3, 'backoff': 0.5, 'jitter': 0.5},
+    'stop': {'attempts': 3, 'backoff': 0.5, 'jitter': 0.5},
+    'abort': {'attempts': 3, 'backoff': 0.5, 'jitter': 0.5},
+}
+
+# Number of retries made, keyed by (instance-id, operation, request)
+RETRY_COUNTS = Counter()
+
+
+def retry_request(client, operation, request, **kwargs):
+    """Make a request on an Operation, retrying after transient communication
+    errors according to ``RETRY_POLICIES``.
+
+    Args:
+        client (ocs.ocs_client.OCSClient): OCS Client with the Operation.
+        operation (str): Operation name, i.e. 'stream'.
+        request (str): Request to make on the Operation, i.e. 'status',
+            'wait', or 'stop'. Requests without a policy are made only once.
+        **kwargs: Passed through to the request.
+
+    Returns:
+        ocs.ocs_client.OCSReply: Response to the request.
+
+    Raises:
+        ocs.client_http.ControlClientError: If the final attempt fails.
+        sorunlib.util.CircuitOpenError: Immediately, without retrying, if the
+            Agent has recently been unreachable.
+
+    """
+    policy = RETRY_POLICIES.get(request, {'attempts': 1})
+    func = getattr(getattr(client, operation), request)
+
+    attempt = 1
+    while True:
+        try:
+            return func(**kwargs)
+        except CircuitOpenError:
+            raise
+        except ControlClientError as e:
+            if attempt >= policy['attempts']:
+                raise
+            delay = policy['backoff'] * 2**(attempt - 1)
+            delay *= 1 + random.uniform(0, policy['jitter'])
+            print(f"Request '{request}' for {operation} in Agent "
+                  + f"{client.instance_id} failed, retrying in "
+                  + f"{delay:.2f} seconds.\n{e}")
+            RETRY_COUNTS[(client.instance_id, operation, request)] += 1
+            time.sleep(delay)
+            attempt += 1
+
+
+def max_request_duration(request, timeout=0):
+    """Upper bound on the duration of :func:`retry_request`.
+
+    Args:
+        request (str): Request made on the Operation, i.e. 'wait'.
+        timeout (float): Duration, in seconds, the Agent may hold each attempt
+            open, i.e. the ``timeout`` of a 'wait'.
+
+    Returns:
+        float: Duration, in seconds, of every attempt timing out, including
+        the delays between them.
+
+    """
+    policy = RETRY_POLICIES.get(request, {'attempts': 1})
+    attempts = policy['attempts']
+    # Each attempt may wait to connect, then for the reply
+    duration = attempts * (timeout + 2 * util._TIMEOUT)
+    for attempt in range(1, attempts):
+        duration += policy['backoff'] * 2**(attempt - 1) * (1 + policy['jitter'])
+    return duration
+
+
 def _check_error(client, response):
     """Check if a response is an error or timeout."""
     op = response.session['op_name']
@@ -115,11 +204,9 @@ def check_started(client, response, timeout=60):
     op_code = response.session.get('op_code')
 
     if op_code == 2:  # STARTING
-        _operation = client.__getattribute__(op)
-
         # Wait at most ~timeout seconds while checking the status
         for i in range(timeout):
-            response = _operation.status()
+            response = retry_request(client, op, 'status')
             _check_error(client, response)
             op_code = response.session.get('op_code')
             if op_code == 3:  # RUNNING
@@ -135,9 +222,87 @@ def check_started(client, response, timeout=60):
         raise RuntimeError(error)
 
 
+class TaskHandle:
+    """Handle on an OCS Task that has been started, but not waited on.
+
+    Args:
+        client (ocs.ocs_client.OCSClient): OCS Client the Task was started on.
+        operation (str): Task name.
+
+    """
+
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+        self._response = None
+        # Response from a wait that saw the Task finish, checked by result()
+        self._finished = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.client.instance_id}, {self.operation})"
+
+    def done(self, timeout=None):
+        """Check whether the Task has finished.
+
+        Args:
+            timeout (float, optional): Duration, in seconds, to wait for the
+                Task to finish before returning. If None, return immediately.
+
+        Returns:
+            bool: True if the Task is no longer running, otherwise False.
+
+        """
+        if self._response is not None or self._finished is not None:
+            return True
+
+        if timeout is None:
+            resp = retry_request(self.client, self.operation, 'status')
+        else:
+            resp = retry_request(self.client, self.operation, 'wait',
+                                 timeout=timeout)
+            if resp.status == ocs.TIMEOUT:
+                return False
+        _check_error(self.client, resp)
+        if resp.session.get('status') != 'done':
+            return False
+        if timeout is not None:
+            self._finished = resp
+        return True
+
+    def result(self, timeout=None):
+        """Wait for the Task to complete and check that it succeeded.
+
+        Args:
+            timeout (float, optional): Duration, in seconds, to wait for the
+                Task to complete. If None, wait indefinitely.
+
+        Returns:
+            ocs.ocs_client.OCSReply: Response from the completed Task.
+
+        Raises:
+            RuntimeError: If the Task failed or the timeout is reached.
+
+        """
+        if self._response is None:
+            resp = self._finished or retry_request(self.client, self.operation,
+                                                   'wait', timeout=timeout)
+            check_response(self.client, resp)
+            self._response = resp
+
+        return self._response
+
+    def cancel(self):
+        """Abort the Task.
+
+        Returns:
+            ocs.ocs_client.OCSReply: Response from the abort request.
+
+        """
+        return retry_request(self.client, self.operation, 'abort')
+
+
 def _check_operation_running(client, operation):
-    op = client.__getattribute__(operation)
-    resp = op.status()
+    resp = retry_request(client, operation, 'status')
     check_running(client, resp)
 
 
@@ -193,30 +358,87 @@ def protect_shutdown(f):
     This will catch and print the caught signals to ``stdout`` while shutdown
     is happening. Currently handles only ``SIGINT`` and ``SIGTERM``.
 
+    Signal handlers can only be installed from the main thread, so when called
+    from any other thread, i.e. via :mod:`sorunlib.aio`, the function is run
+    without them.
+
     """
     @wraps(f)
     def wrapper(*args, **kwds):
+        if threading.current_thread() is not threading.main_thread():
+            return f(*args, **kwds)
+
         def handler(sig, frame):
             print(f'Caught {signal.Signals(sig).name} during shutdown.')
 
         int_handler = signal.signal(signal.SIGINT, handler)
         term_handler = signal.signal(signal.SIGTERM, handler)
 
-        result = f(*args, **kwds)
-
-        signal.signal(signal.SIGINT, int_handler)
-        signal.signal(signal.SIGTERM, term_handler)
-        return result
+        try:
+            return f(*args, **kwds)
+        finally:
+            signal.signal(signal.SIGINT, int_handler)
+            signal.signal(signal.SIGTERM, term_handler)
     return wrapper
 
 
+def run_concurrently(tasks, timeout=None):
+    """Run several tasks concurrently, waiting at most until a deadline.
+
+    Each task runs in a daemon thread, so tasks that have not finished by the
+    deadline are abandoned and do not prevent the interpreter from exiting.
+
+    Args:
+        tasks (dict): Dictionary mapping a key for each task, i.e. a client, to
+            a callable taking no arguments.
+        timeout (float, optional): Deadline, in seconds, shared by all tasks.
+            If None, wait for every task to finish.
+
+    Returns:
+        tuple: A tuple of ``(results, stragglers)``. ``results`` is a dict
+        mapping the key of each finished task to its return value, or to the
+        exception it raised. ``stragglers`` is a list of the keys of tasks
+        abandoned at the deadline.
+
+    """
+    results = {}
+
+    def target(key, func):
+        try:
+            results[key] = func()
+        except Exception as e:
+            results[key] = e
+
+    threads = {key: threading.Thread(target=target, args=(key, func),
+                                     daemon=True)
+               for key, func in tasks.items()}
+    for thread in threads.values():
+        thread.start()
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for thread in threads.values():
+        remaining = None if deadline is None else \
+            max(0, deadline - time.monotonic())
+        thread.join(timeout=remaining)
+
+    # Report in the order the tasks were given
+    stragglers = [key for key, thread in threads.items() if thread.is_alive()]
+    finished = {key: results[key] for key in tasks if key not in stragglers}
+
+    return finished, stragglers
+
+
 @protect_shutdown
-def stop_smurfs():
+def stop_smurfs(timeout=SHUTDOWN_TIMEOUT):
     """Simple wrapper to shutdown all SMuRF systems and handle any errors that
     occur.
 
+    Args:
+        timeout (float): Deadline, in seconds, for all streams to stop. Any
+            SMuRF whose stream has not stopped by then is abandoned.
+
     """
     try:
-        run.smurf.stream('off')
+        run.smurf.stream('off', timeout=timeout)
     except RuntimeError as e:
         print(f"Caught error while shutting down SMuRF streams: {e}")
@@ -1,23 +1,168 @@
 import datetime as dt
+import time
+
+from collections import deque
 
 import sorunlib as run
 
 from sorunlib.commands import _timestamp_to_utc_datetime
-from sorunlib._internal import check_response
+from sorunlib._internal import check_response, TaskHandle
+from sorunlib.planning import solve_intercept
+from sorunlib.status import ACUStatus
 
+MOVE_TIMEOUT = 600
 
-def move_to(az, el):
-    """Move telescope to specified coordinates.
+# Number of recent moves recorded for calibrating the slew model
+MOVE_LOG_SIZE = 200
+
+_move_log = deque(maxlen=MOVE_LOG_SIZE)
+
+
+def _current_position(acu, axes):
+    """Current position of the given axes, or None if unavailable."""
+    try:
+        status = ACUStatus.from_reply(acu.monitor.status())
+    except RuntimeError:
+        return None
+    position = {axis: getattr(status, axis) for axis in axes}
+    if None in position.values():
+        return None
+    return position
+
+
+def _record_move(start, target, response):
+    """Record the duration of a completed move, if it can be determined."""
+    begin = response.session.get('start_time')
+    end = response.session.get('end_time')
+    if start is None or not isinstance(begin, (int, float)) \
+            or not isinstance(end, (int, float)):
+        return
+    _move_log.append({'start': start,
+                      'target': dict(target),
+                      'duration': end - begin})
+
+
+def recorded_moves():
+    """Get the moves recently completed through this module.
+
+    Moves are recorded when started with ``record=True``, i.e.
+    ``move_to(az, el, record=True)``, and waited on. They are used to
+    calibrate the slew model with :func:`sorunlib.planning.calibrate_slew`.
+
+    Returns:
+        list: List of dicts, oldest first, each containing the 'start' and
+        'target' position of each commanded axis and the 'duration' of the
+        move in seconds.
+
+    """
+    return list(_move_log)
+
+
+class MoveHandle(TaskHandle):
+    """Handle on an ACU motion Task that is still in progress.
+
+    Returned by :func:`move_to_async` and :func:`set_boresight_async`. In
+    addition to the :class:`sorunlib._internal.TaskHandle` interface, i.e.
+    ``done()``, ``result(timeout)`` and ``cancel()``, this reports the
+    progress of the motion.
+
+    Args:
+        client (ocs.ocs_client.OCSClient): ACU client.
+        operation (str): Task name, i.e. 'go_to'.
+        target (dict): Target position for each commanded axis, keyed by
+            'az', 'el', or 'boresight'.
+        start (dict, optional): Position of each commanded axis when the
+            motion was started. If given, the move is recorded once complete.
+
+    """
+
+    def __init__(self, client, operation, target, start=None):
+        super().__init__(client, operation)
+        self.target = target
+        self.start = start
+        self._first_sample = None
+
+    def result(self, timeout=None):
+        done = self._response is not None
+        resp = super().result(timeout=timeout)
+        if not done:
+            _record_move(self.start, self.target, resp)
+        return resp
+
+    def progress(self):
+        """Get the current position and estimate the time remaining.
+
+        The estimate assumes the telescope continues at the average rate
+        observed since the first call to this method.
+
+        Returns:
+            dict: Dictionary containing the current 'position' of each
+            commanded axis, the largest 'remaining' distance to the target in
+            degrees, and the 'eta' in seconds, which is None until enough
+            motion has been observed to make an estimate.
+
+        Raises:
+            RuntimeError: If the position of a commanded axis is not reported.
+
+        """
+        status = ACUStatus.from_reply(self.client.monitor.status())
+        position = {axis: getattr(status, axis) for axis in self.target}
+        missing = [axis for axis, value in position.items() if value is None]
+        if missing:
+            error = "Unable to follow move, ACU does not report the " + \
+                f"position of {', '.join(missing)}."
+            raise RuntimeError(error)
+        remaining = max(abs(self.target[axis] - position[axis])
+                        for axis in self.target)
+
+        now = time.time()
+        if self._first_sample is None:
+            self._first_sample = (now, remaining)
+
+        eta = None
+        t0, d0 = self._first_sample
+        if remaining == 0:
+            eta = 0
+        elif d0 > remaining:
+            eta = remaining * (now - t0) / (d0 - remaining)
+
+        return {'position': position,
+                'remaining': remaining,
+                'eta': eta}
+
+
+def move_to_async(az, el, record=False):
+    """Start moving the telescope to specified coordinates, without waiting for
+    the motion to complete.
 
     Args:
         az (float): destination angle for the azimuthal axis
         el (float): destination angle for the elevation axis
+        record (bool): Record the move, see :func:`recorded_moves`. This
+            queries the starting position, which costs an extra request before
+            the motion starts. Defaults to False.
+
+    Returns:
+        MoveHandle: Handle used to check on, wait for, or cancel the motion.
 
     """
     acu = run.CLIENTS['acu']
+    start = _current_position(acu, ['az', 'el']) if record else None
     acu.go_to.start(az=az, el=el)
-    resp = acu.go_to.wait(timeout=600)
-    check_response(acu, resp)
+    return MoveHandle(acu, 'go_to', {'az': az, 'el': el}, start=start)
+
+
+def move_to(az, el, record=False):
+    """Move telescope to specified coordinates.
+
+    Args:
+        az (float): destination angle for the azimuthal axis
+        el (float): destination angle for the elevation axis
+        record (bool): Record the move, see :func:`move_to_async`. Defaults to
+            False.
+
+    """
+    move_to_async(az, el, record=record).result(timeout=MOVE_TIMEOUT)
 
 
 def move_to_target(az, el, start_time, stop_time, drift):
@@ -32,7 +177,9 @@ def move_to_target(az, el, start_time, stop_time, drift):
             available to scan, i.e. "2024-09-22T08:42:16.343049+00:00".
         drift (float): Azimuthal drift rate of the target in degrees per
             second. Used to adjust ``az`` if the move occurs after
-            ``start_time`` but before ``stop_time``.
+            ``start_time`` but before ``stop_time``, accounting for the
+            target's drift during the move itself. See
+            :func:`sorunlib.planning.solve_intercept`.
 
     """
     start = _timestamp_to_utc_datetime(start_time)
@@ -40,8 +187,13 @@ def move_to_target(az, el, start_time, stop_time, drift):
     now = dt.datetime.now(dt.timezone.utc)
 
     if now > start and now < stop:
-        az = az + drift * (now - start).total_seconds()
-        print(f"Target has drifted since {start_time}. Moving to ({az}, {el}).")
+        acu = run.CLIENTS['acu']
+        position = ACUStatus.from_reply(acu.monitor.status())
+        az, duration = solve_intercept(az, el, drift,
+                                       (now - start).total_seconds(),
+                                       position.az, position.el)
+        print(f"Target has drifted since {start_time}. Moving to ({az}, {el}),"
+              + f" arriving in an estimated {duration:.1f} seconds.")
 
     if now > stop:
         return
@@ -49,16 +201,36 @@ def move_to_target(az, el, start_time, stop_time, drift):
     move_to(az, el)
 
 
-def set_boresight(target):
+def set_boresight(target, record=False):
     """Move the third axis to a specific target angle.
 
     Args:
         target (float): destination angle for boresight rotation
+        record (bool): Record the move, see :func:`move_to_async`. Defaults to
+            False.
+
+    """
+    set_boresight_async(target, record=record).result(timeout=MOVE_TIMEOUT)
+
+
+def set_boresight_async(target, record=False):
+    """Start moving the third axis to a specific target angle, without waiting
+    for the motion to complete.
+
+    Args:
+        target (float): destination angle for boresight rotation
+        record (bool): Record the move, see :func:`move_to_async`. Defaults to
+            False.
+
+    Returns:
+        MoveHandle: Handle used to check on, wait for, or cancel the motion.
 
     """
     acu = run.CLIENTS['acu']
-    resp = acu.set_boresight(target=target)
-    check_response(acu, resp)
+    start = _current_position(acu, ['boresight']) if record else None
+    acu.set_boresight.start(target=target)
+    return MoveHandle(acu, 'set_boresight', {'boresight': target},
+                      start=start)
 
 
 def set_scan_params(az_speed, az_accel, el_freq=None, reset=False,
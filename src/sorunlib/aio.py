@@ -0,0 +1,112 @@
+"""asyncio interface to sorunlib.
+
+Every public function in the subsystem modules (``acu``, ``hwp``, ``seq``,
+``smurf``, ``stimulator`` and ``wiregrid``) is mirrored here as a coroutine
+function with the same name, arguments and docstring. Context managers, i.e.
+:func:`sorunlib.seq.hwp_spin_up`, are not mirrored. This allows independent
+subsystems to be commanded concurrently from within a sequence, i.e.::
+
+    import asyncio
+    from sorunlib import aio
+
+    async def setup():
+        await asyncio.gather(aio.acu.move_to(180, 60),
+                             aio.smurf.uxm_relock())
+
+    asyncio.run(setup())
+
+Each call runs the synchronous implementation in a worker thread, so the
+behavior, including error handling, is identical to the synchronous API.
+Cancelling a coroutine does not interrupt an operation already in progress,
+with the exception of :func:`wait_until`.
+
+.. note::
+    Operations on the same subsystem should not be run concurrently, as they
+    share the global ``CLIENTS`` list and the underlying Agents typically
+    only run one operation at a time.
+
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+import types
+
+import sorunlib as run
+
+__all__ = ["acu",
+           "hwp",
+           "seq",
+           "smurf",
+           "stimulator",
+           "wiregrid",
+           "wait_until"]
+
+
+def _to_async(func):
+    """Wrap a synchronous function to run in a worker thread when awaited."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+
+def _is_context_manager(func):
+    """Check whether a function was made with
+    :func:`contextlib.contextmanager`."""
+    return inspect.isgeneratorfunction(getattr(func, '__wrapped__', None))
+
+
+def _mirror(module):
+    """Create a namespace containing coroutine versions of all public
+    functions defined in a module, except context managers.
+
+    Args:
+        module (module): sorunlib subsystem module, i.e. ``sorunlib.acu``.
+
+    Returns:
+        module: New module with the same name under ``sorunlib.aio``.
+
+    """
+    name = module.__name__.split('.')[-1]
+    mirror = types.ModuleType(f'{__name__}.{name}', module.__doc__)
+    for attr, obj in vars(module).items():
+        if attr.startswith('_'):
+            continue
+        if not inspect.isfunction(obj) or obj.__module__ != module.__name__:
+            continue
+        if _is_context_manager(obj):
+            continue
+        setattr(mirror, attr, _to_async(obj))
+
+    return mirror
+
+
+acu = _mirror(run.acu)
+hwp = _mirror(run.hwp)
+seq = _mirror(run.seq)
+smurf = _mirror(run.smurf)
+stimulator = _mirror(run.stimulator)
+wiregrid = _mirror(run.wiregrid)
+
+
+async def wait_until(timestamp, tolerance=None, prepare=None, progress=None):
+    """Wait until a specified time.
+
+    Coroutine version of :func:`sorunlib.commands.wait_until`. Unlike the
+    other coroutines in this module, cancelling this one also ends the
+    underlying wait.
+
+    """
+    abort = threading.Event()
+    try:
+        return await asyncio.to_thread(run.commands.wait_until,
+                                       timestamp,
+                                       tolerance=tolerance,
+                                       prepare=prepare,
+                                       abort=abort,
+                                       progress=progress)
+    except asyncio.CancelledError:
+        abort.set()
+        raise
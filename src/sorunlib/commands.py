@@ -1,6 +1,14 @@
 import time
 import datetime as dt
 
+# Longest single sleep, in seconds, while waiting. The remaining time is
+# recomputed against the UTC clock after every chunk, which corrects for clock
+# adjustments and host suspension during long waits.
+WAIT_CHUNK = 10
+
+# Interval, in seconds, between status messages during long waits
+PROGRESS_INTERVAL = 600
+
 
 def _timestamp_to_utc_datetime(timestamp):
     """Produce a UTC datetime object from a naive or UTC timestamp.
@@ -31,7 +39,56 @@ def _timestamp_to_utc_datetime(timestamp):
     return target
 
 
-def wait_until(timestamp, tolerance=None):
+def _run_preparation(prepare):
+    """Run the preparation callable(s) passed to :func:`wait_until`."""
+    if callable(prepare):
+        prepare = [prepare]
+
+    for func in prepare:
+        func()
+
+
+def _sleep_until(target, abort=None, progress=None):
+    """Sleep until a target time, in chunks of at most ``WAIT_CHUNK`` seconds.
+
+    Args:
+        target (datetime.datetime): UTC datetime to sleep until.
+        abort (threading.Event): Event that ends the sleep early when set.
+            If None, the sleep cannot be interrupted.
+        progress (callable): Called with the remaining number of seconds
+            before each chunk. If None, a status message is printed every
+            ``PROGRESS_INTERVAL`` seconds instead.
+
+    Returns:
+        bool: True if the target time was reached, False if aborted.
+
+    """
+    last_report = time.monotonic()
+
+    while True:
+        now = dt.datetime.now(dt.timezone.utc)
+        remaining = (target - now).total_seconds()
+        if remaining <= 0:
+            return True
+
+        if abort is not None and abort.is_set():
+            return False
+
+        if progress is not None:
+            progress(remaining)
+        elif time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            print(f"Waiting for {remaining} more seconds")
+            last_report = time.monotonic()
+
+        chunk = min(remaining, WAIT_CHUNK)
+        if abort is None:
+            time.sleep(chunk)
+        elif abort.wait(chunk):
+            return False
+
+
+def wait_until(timestamp, tolerance=None, prepare=None, abort=None,
+               progress=None):
     """Wait until a specified time.
 
     Args:
@@ -47,6 +104,22 @@ def wait_until(timestamp, tolerance=None):
             difference between the current time and `timestamp` is greater than
             this `tolerance` (int, float), then an error is raised. If `None`,
             an error will not be raised. Default is `None`.
+        prepare (callable or list of callables): Preparation for the next
+            step in the schedule, i.e. agent health checks or preflight
+            checks. These are called, in order and without arguments, at the
+            start of the wait, and the remaining wait is adjusted for the time
+            they take. Skipped if there is no time left to wait. Exceptions
+            raised during preparation are not caught. Default is `None`.
+        abort (threading.Event): Event which, when set, ends the wait early,
+            i.e. from a watchdog or operator request. Check the return value
+            to tell an aborted wait from a completed one. Default is `None`.
+        progress (callable): Called periodically during the wait with the
+            number of seconds remaining. If `None`, a status message is
+            printed every ten minutes. Default is `None`.
+
+    Returns:
+        bool: True if the target time was reached, or had already passed, and
+        False if the wait was aborted.
 
     Raises:
         ValueError: If `timestamp` has an unsupported timezone, `tolerance`
@@ -58,6 +131,7 @@ def wait_until(timestamp, tolerance=None):
         >>> wait_until("2015-10-21T07:28:00+00:00")
         >>> wait_until("2015-10-21T07:28:00+00:00", 60)
         >>> wait_until("2015-10-21T07:28:00+00:00", "2015-10-21T07:29:00+00:00")
+        >>> wait_until("2015-10-21T07:28:00+00:00", prepare=smurf.check_targets)
 
     """
     target = _timestamp_to_utc_datetime(timestamp)
@@ -82,11 +156,25 @@ def wait_until(timestamp, tolerance=None):
         raise ValueError(f"Current time ({now}) is past deadline "
                          + f"({deadline.isoformat()}) set by tolerance ({tolerance})")
 
+    # Prepare for the next step while we have time to spare
+    if prepare is not None and target > now:
+        _run_preparation(prepare)
+        now = dt.datetime.now(dt.timezone.utc)
+        if now > target:
+            diff = (now - target).total_seconds()
+            print(f"Preparation overran target by {diff} seconds")
+
     # Wait until timestamp
     if target > now:
         duration = (target - now).total_seconds()
         print(f"Waiting for {duration} seconds")
-        time.sleep(duration)
+        if not _sleep_until(target, abort=abort, progress=progress):
+            now = dt.datetime.now(dt.timezone.utc)
+            diff = (target - now).total_seconds()
+            print(f"Wait aborted with {diff} seconds remaining")
+            return False
     else:
         diff = (now - target).total_seconds()
         print(f"No wait, as target is {diff} seconds in the past")
+
+    return True
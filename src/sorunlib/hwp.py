@@ -1,5 +1,110 @@
+"""This module is responsible for commanding the HWP through the HWP
+Supervisor agent.
+
+Frequency changes, i.e. :func:`set_freq` and :func:`stop`, are followed
+through the ``hwp_state`` reported by the supervisor's ``monitor`` Process,
+printing the frequency and an estimated time to reach the target. If the
+frequency makes no progress towards the target for a while, the action is
+aborted rather than waiting for it to time out. The thresholds are set by the
+``hwp_stall`` block of the sorunlib configuration file. Stall detection does
+not apply to a passive spin down, which slows gradually on its own.
+
+:func:`set_direction` spins the HWP in a given direction. The sign of the
+frequency for each direction depends on the hardware and the supervisor's
+configuration. It is set by ``hwp_direction_sign`` in the configuration file
+or, if that is not given, derived from the direction and signed frequency the
+supervisor reports while the HWP is spinning. It is resolved once per
+session.
+
+"""
+
+import time
+
 import sorunlib as run
-from sorunlib._internal import check_response, stop_smurfs
+from sorunlib._internal import _check_error, check_response, stop_smurfs, TaskHandle
+from sorunlib.status import HWPState
+
+# Interval, in seconds, between checks on the HWP while changing frequency
+MONITOR_INTERVAL = 10
+
+# Default stall detection, overridden by 'hwp_stall' in the configuration. The
+# HWP has stalled if its frequency gets less than 'tolerance' Hz closer to the
+# target within 'duration' seconds.
+DEFAULT_STALL_PARAMS = {
+    'duration': 120,
+    'tolerance': 0.05,
+}
+
+# Cached direction to frequency sign mapping, see _get_direction_sign()
+_direction_sign = None
+
+
+def _reset():
+    """Clear the cached direction to frequency sign mapping."""
+    global _direction_sign
+    _direction_sign = None
+
+
+def _get_direction_sign():
+    """Get the sign of the frequency for each rotational direction.
+
+    Resolved on first use from ``hwp_direction_sign`` in the configuration
+    file or, if not configured, from the HWP Supervisor's ``hwp_state`` while
+    the HWP is spinning, and cached until :func:`sorunlib.initialize` is next
+    called.
+
+    Returns:
+        dict: Sign, either 1 or -1, keyed by direction, 'cw' or 'ccw'.
+
+    Raises:
+        RuntimeError: If the configured mapping is invalid, or if it is not
+            configured and cannot be derived from the supervisor.
+
+    """
+    global _direction_sign
+    if _direction_sign is not None:
+        return _direction_sign
+
+    cfg = run.config.load_config()
+    sign = cfg.get('hwp_direction_sign')
+    if sign is None:
+        _direction_sign = _query_direction_sign()
+        return _direction_sign
+
+    if sorted(sign) != ['ccw', 'cw'] or \
+            sorted(sign.values()) != [-1, 1]:
+        error = "Invalid 'hwp_direction_sign' configuration, expected " + \
+            f"opposite signs, 1 and -1, for 'cw' and 'ccw': {sign}"
+        raise RuntimeError(error)
+
+    _direction_sign = dict(sign)
+    return _direction_sign
+
+
+def _query_direction_sign():
+    """Derive the sign of the frequency for each direction from the direction
+    and signed frequency reported by the HWP Supervisor.
+
+    Raises:
+        RuntimeError: If the HWP is not spinning, or the direction or signed
+            frequency is not reported.
+
+    """
+    hwp = run.CLIENTS['hwp']
+    state = HWPState.from_reply(hwp.monitor.status())
+
+    freq = state.pid_target_freq or state.pid_current_freq
+    if not state.is_spinning or state.direction not in ['cw', 'ccw'] or \
+            not freq:
+        error = "Unable to determine the sign of the HWP frequency for " + \
+            "each direction from the HWP supervisor, which requires the " + \
+            "HWP to be spinning. Set 'hwp_direction_sign' in the " + \
+            "sorunlib configuration file."
+        raise RuntimeError(error)
+
+    other = 'cw' if state.direction == 'ccw' else 'ccw'
+    sign = 1 if freq > 0 else -1
+    return {state.direction: sign, other: -sign}
 
 
 def _get_direction():
@@ -20,8 +125,7 @@ def _get_direction():
 
     """
     hwp = run.CLIENTS['hwp']
-    resp = hwp.monitor.status()
-    direction = resp.session['data']['hwp_state']['direction']
+    direction = HWPState.from_reply(hwp.monitor.status()).direction
 
     if direction not in ['cw', 'ccw']:
         raise RuntimeError("The HWP direction is unknown. Aborting...")
@@ -29,6 +133,97 @@ def _get_direction():
     return direction
 
 
+def _load_stall_params():
+    cfg = run.config.load_config()
+    params = dict(DEFAULT_STALL_PARAMS)
+    params.update(cfg.get('hwp_stall') or {})
+    return params
+
+
+def _get_freq():
+    """Get the current rotation frequency of the HWP, or None if
+    unavailable."""
+    hwp = run.CLIENTS['hwp']
+    try:
+        return HWPState.from_reply(hwp.monitor.status()).freq
+    except RuntimeError as e:
+        print(f"Unable to read HWP state: {e}")
+        return None
+
+
+def _abort(error):
+    hwp = run.CLIENTS['hwp']
+    print(f"{error} Aborting HWP action.")
+    try:
+        resp = hwp.abort_action()
+        check_response(hwp, resp)
+    except RuntimeError as e:
+        print(f"Failed to abort HWP action: {e}")
+    raise RuntimeError(error)
+
+
+def _monitor_freq(operation, target, timeout=None, stall=True):
+    """Follow the HWP frequency while a Task changes it.
+
+    Args:
+        operation (str): Name of the running supervisor Task, i.e.
+            'pid_to_freq'.
+        target (float): Target frequency in Hz. Only the magnitude is used.
+        timeout (float, optional): Duration, in seconds, to wait for the Task
+            to complete. If None, wait indefinitely.
+        stall (bool, optional): Whether to abort the Task if the HWP stalls.
+            Defaults to True.
+
+    Returns:
+        ocs.ocs_client.OCSReply: Response from the completed Task.
+
+    Raises:
+        RuntimeError: If the HWP stalls, the timeout is reached, or the Task
+            fails. The supervisor action is aborted in the first two cases.
+
+    """
+    hwp = run.CLIENTS['hwp']
+    task = TaskHandle(hwp, operation)
+    params = _load_stall_params()
+    target = abs(target)
+
+    start = time.monotonic()
+    first = None
+    last_progress = None
+
+    while True:
+        now = time.monotonic()
+        if timeout is not None and now - start > timeout:
+            _abort(f"HWP did not reach {target} Hz within {timeout} seconds.")
+
+        freq = _get_freq()
+        # Stalls can only be detected with a valid frequency
+        if freq is not None:
+            remaining = abs(target - abs(freq))
+            if first is None:
+                first = last_progress = (now, remaining)
+
+            if remaining <= params['tolerance'] or \
+                    last_progress[1] - remaining >= params['tolerance']:
+                last_progress = (now, remaining)
+            elif stall and now - last_progress[0] > params['duration']:
+                _abort(f"HWP stalled at {freq:.2f} Hz, no progress towards "
+                       + f"{target} Hz in {params['duration']} seconds.")
+
+            eta = 'unknown'
+            if remaining <= params['tolerance']:
+                eta = 'reached'
+            elif first[1] > remaining:
+                rate = (first[1] - remaining) / (now - first[0])
+                eta = f"{remaining / rate:.0f} s"
+            print(f"HWP at {freq:.2f} Hz, target {target} Hz, ETA: {eta}")
+
+        if task.done(timeout=MONITOR_INTERVAL):
+            break
+
+    return task.result()
+
+
 # Public API
 def set_freq(freq, timeout=None):
     """Set the rotational frequency of the HWP.
@@ -42,16 +237,40 @@ def set_freq(freq, timeout=None):
             operation to complete. An exception will be raised if this timeout
             is exceeded.
 
+    Raises:
+        RuntimeError: If the frequency change fails, stalls, or exceeds the
+            timeout. In the last two cases the action is aborted.
+
     .. _docs: https://socs.readthedocs.io/en/main/agents/hwp_supervisor_agent.html
 
     """
     hwp = run.CLIENTS['hwp']
-    if timeout is None:
-        resp = hwp.pid_to_freq(target_freq=freq)
-    else:
-        hwp.pid_to_freq.start(target_freq=freq)
-        resp = hwp.pid_to_freq.wait(timeout=timeout)
-    check_response(hwp, resp)
+    resp = hwp.pid_to_freq.start(target_freq=freq)
+    _check_error(hwp, resp)
+    _monitor_freq('pid_to_freq', freq, timeout=timeout)
+
+
+def set_direction(direction, freq, timeout=None):
+    """Spin the HWP in a given direction.
+
+    Args:
+        direction (str): Rotational direction, either 'cw' (clockwise) or
+            'ccw' (counter-clockwise), as seen from the sky to window.
+        freq (float): Rotational frequency in Hz. Only the magnitude is used.
+        timeout (float, optional): Duration, in seconds, to wait for the
+            operation to complete. See :func:`set_freq`.
+
+    Raises:
+        RuntimeError: If the direction is invalid, or the frequency change
+            fails.
+
+    """
+    sign = _get_direction_sign()
+    if direction not in sign:
+        error = f"Invalid HWP direction '{direction}', expected 'cw' or 'ccw'."
+        raise RuntimeError(error)
+
+    set_freq(freq=sign[direction] * abs(freq), timeout=timeout)
 
 
 def spin_up(freq):
@@ -110,16 +329,23 @@ def stop(active=True, brake_voltage=None):
         brake_voltage (float, optional): Voltage used when actively stopping
             the HWP. Only considered when active is True.
 
+    Raises:
+        RuntimeError: If stopping the HWP fails or, when braking, stalls. In
+            the latter case the action is aborted.
+
     """
     hwp = run.CLIENTS['hwp']
 
     print('Stopping HWP and waiting for it to spin down.')
     if active:
         if brake_voltage is None:
-            resp = hwp.brake()
+            resp = hwp.brake.start()
         else:
-            resp = hwp.brake(brake_voltage=brake_voltage)
-        check_response(hwp, resp)
+            resp = hwp.brake.start(brake_voltage=brake_voltage)
+        _check_error(hwp, resp)
+        _monitor_freq('brake', 0)
     else:
-        resp = hwp.pmx_off(wait_stop=True)
-        check_response(hwp, resp)
+        resp = hwp.pmx_off.start(wait_stop=True)
+        _check_error(hwp, resp)
+        # Spinning down on its own can be slow, but is never stuck
+        _monitor_freq('pmx_off', 0, stall=False)
@@ -0,0 +1,493 @@
+"""Plan telescope motion before committing telescope time.
+
+:func:`sorunlib.seq.scan` passes its scan parameters straight through to the
+ACU ``generate_scan`` Process, so the resulting geometry, i.e. where the
+turnarounds fall and how much of the scan is spent at constant velocity, is
+normally only known once the scan has run. :func:`plan_scan` models the same
+motion ahead of time, so a schedule can compare widths and speeds before
+choosing one::
+
+    from sorunlib import planning
+
+    for width in [10, 20, 40]:
+        plan = planning.plan_scan('2024-06-21T15:58:00', width, az=180, el=50,
+                                  start_time='2024-06-21T14:58:00')
+        print(width, plan.num_sweeps, plan.efficiency)
+
+The model assumes the ACU's standard turnaround, a constant acceleration of
+``az_accel`` that reverses the azimuth velocity, overshooting each endpoint by
+``az_speed**2 / (2 * az_accel)``. The sinusoidal azimuth speed variation of
+type 2 and 3 scans, and the ACU's ramp-up before the first sweep, are not
+modeled.
+
+Point-to-point moves, i.e. :func:`sorunlib.acu.move_to`, are modeled by
+:func:`slew_time`, using the axis speeds and accelerations in the
+``acu_slew`` block of the sorunlib configuration file. :func:`solve_intercept`
+uses this to find where a drifting target can be caught, and accepts arrays of
+targets, so many candidates can be ranked by their slew cost in one call.
+:func:`order_moves` reorders a set of independent moves, i.e. pointing
+targets, to minimize the total slew time, and :func:`calibrate_slew` fits the
+model parameters to the moves recorded by :mod:`sorunlib.acu`.
+
+"""
+
+import datetime as dt
+
+import numpy as np
+
+import sorunlib as run
+
+from sorunlib.commands import _timestamp_to_utc_datetime
+from sorunlib.status import ACUStatus
+
+# Default scan parameters of the ACU Agent on the SATs, used when not given.
+# These should match any changes made with acu.set_scan_params().
+DEFAULT_AZ_SPEED = 1.0
+DEFAULT_AZ_ACCEL = 1.0
+DEFAULT_EL_FREQ = 0.0
+
+# Default time, in seconds, between points in a planned trajectory
+PLAN_STEP = 0.1
+
+# Default go_to slew model, overridden by 'acu_slew' in the configuration.
+# Speeds in deg/s, accelerations in deg/s^2 and settle time in seconds.
+DEFAULT_SLEW_PARAMS = {
+    'az_speed': 2.0,
+    'az_accel': 1.0,
+    'el_speed': 1.0,
+    'el_accel': 1.0,
+    'boresight_speed': 1.0,
+    'boresight_accel': 1.0,
+    'settle_time': 1.0,
+}
+
+# Convergence tolerance, in seconds, and iteration limit for solve_intercept()
+INTERCEPT_TOL = 1e-3
+INTERCEPT_MAX_ITER = 20
+
+
+class ScanPlan:
+    """Planned trajectory of a constant elevation scan.
+
+    Attributes:
+        times (numpy.ndarray): Time of each point, in seconds since the start
+            of the scan.
+        az (numpy.ndarray): Azimuth position at each point.
+        el (numpy.ndarray): Elevation position at each point.
+        constant_velocity (numpy.ndarray): Boolean mask, True where the
+            azimuth axis is moving at constant velocity, i.e. outside a
+            turnaround.
+        num_sweeps (int): Number of complete constant velocity sweeps between
+            the endpoints.
+        efficiency (float): Fraction of the scan spent at constant velocity.
+        turnaround_time (float): Duration, in seconds, of each turnaround.
+        overshoot (float): Distance, in degrees, the turnarounds extend past
+            each endpoint.
+
+    """
+    __slots__ = ('times', 'az', 'el', 'constant_velocity', 'num_sweeps',
+                 'efficiency', 'turnaround_time', 'overshoot')
+
+    def __init__(self, times, az, el, constant_velocity, num_sweeps,
+                 efficiency, turnaround_time, overshoot):
+        self.times = times
+        self.az = az
+        self.el = el
+        self.constant_velocity = constant_velocity
+        self.num_sweeps = num_sweeps
+        self.efficiency = efficiency
+        self.turnaround_time = turnaround_time
+        self.overshoot = overshoot
+
+    @property
+    def duration(self):
+        """float: Total duration of the scan in seconds."""
+        return float(self.times[-1]) if len(self.times) else 0.
+
+    def __repr__(self):
+        return f'ScanPlan(duration={self.duration}, ' + \
+            f'num_sweeps={self.num_sweeps}, efficiency={self.efficiency:.3f})'
+
+
+def _scan_az(t, width, az_speed, az_accel):
+    """Azimuth offset from the first endpoint, and constant velocity mask, at
+    times ``t`` for a scan without drift."""
+    cv_time = width / az_speed
+    turn_time = 2 * az_speed / az_accel
+    period = 2 * (cv_time + turn_time)
+
+    phase = np.mod(t, period)
+    offset = np.empty_like(phase)
+
+    # Positive sweep from the first endpoint
+    leg1 = phase < cv_time
+    offset[leg1] = az_speed * phase[leg1]
+
+    # Turnaround beyond the second endpoint
+    turn1 = (phase >= cv_time) & (phase < cv_time + turn_time)
+    tau = phase[turn1] - cv_time
+    offset[turn1] = width + az_speed * tau - 0.5 * az_accel * tau**2
+
+    # Negative sweep from the second endpoint
+    leg2 = (phase >= cv_time + turn_time) & (phase < 2 * cv_time + turn_time)
+    tau = phase[leg2] - cv_time - turn_time
+    offset[leg2] = width - az_speed * tau
+
+    # Turnaround beyond the first endpoint
+    turn2 = phase >= 2 * cv_time + turn_time
+    tau = phase[turn2] - 2 * cv_time - turn_time
+    offset[turn2] = -az_speed * tau + 0.5 * az_accel * tau**2
+
+    return offset, leg1 | leg2
+
+
+def plan_scan(stop_time, width, az=None, el=None, az_speed=None,
+              az_accel=None, el_freq=None, az_drift=0, scan_type=1,
+              el_amp=None, start_time=None, step=PLAN_STEP):
+    """Compute the trajectory of a scan, as run by :func:`sorunlib.seq.scan`.
+
+    Args:
+        stop_time (str): Time in ISO format the scan ends, i.e.
+            "2022-06-21T15:58:00".
+        width (float): Scan width in azimuth. The scan starts at ``az`` and
+            moves in the positive azimuth direction.
+        az (float, optional): Azimuth the scan starts from. If None, the
+            current telescope position is used.
+        el (float, optional): Elevation of the scan. If None, the current
+            telescope position is used.
+        az_speed (float, optional): The azimuth scan speed in deg/s.
+        az_accel (float, optional): The azimuth acceleration at turnaround in
+            deg/s^2.
+        el_freq (float, optional): The frequency of elevation nods in type 3
+            scans, in Hz.
+        az_drift (float): Drift velocity in deg/s, causing scan extrema to
+            move accordingly.
+        scan_type (int): Scan type. Possible values are 1, 2, or 3.
+        el_amp (float): For type 3 scans, the amplitude (half peak-to-peak)
+            for the elevation oscillation, in degrees.
+        start_time (str, optional): Time in ISO format the scan starts. If
+            None, the scan is assumed to start now.
+        step (float): Time, in seconds, between points in the trajectory.
+
+    Returns:
+        ScanPlan: The planned trajectory, number of sweeps and efficiency.
+
+    """
+    # It is an error to not declare el_amp when you specify type 3 scan.
+    assert (scan_type != 3 or el_amp is not None)
+    assert width > 0
+
+    if az is None or el is None:
+        acu = run.CLIENTS['acu']
+        position = ACUStatus.from_reply(acu.monitor.status())
+        az = position.az if az is None else az
+        el = position.el if el is None else el
+
+    az_speed = DEFAULT_AZ_SPEED if az_speed is None else az_speed
+    az_accel = DEFAULT_AZ_ACCEL if az_accel is None else az_accel
+    el_freq = DEFAULT_EL_FREQ if el_freq is None else el_freq
+
+    if start_time is None:
+        start = dt.datetime.now(dt.timezone.utc)
+    else:
+        start = _timestamp_to_utc_datetime(start_time)
+    stop = _timestamp_to_utc_datetime(stop_time)
+    duration = max((stop - start).total_seconds(), 0)
+
+    times = np.arange(0, duration + step / 2, step)
+    offset, constant_velocity = _scan_az(times, width, az_speed, az_accel)
+    az_track = az + offset + az_drift * times
+
+    if scan_type == 3:
+        el_track = el + el_amp * np.sin(2 * np.pi * el_freq * times)
+    else:
+        el_track = np.full_like(times, el)
+
+    # Sweep k, counting from 0, ends at k * (cv_time + turn_time) + cv_time
+    cv_time = width / az_speed
+    turn_time = 2 * az_speed / az_accel
+    if duration < cv_time:
+        num_sweeps = 0
+    else:
+        num_sweeps = int((duration - cv_time) // (cv_time + turn_time)) + 1
+
+    efficiency = float(np.mean(constant_velocity)) if len(times) else 0.
+
+    return ScanPlan(times=times,
+                    az=az_track,
+                    el=el_track,
+                    constant_velocity=constant_velocity,
+                    num_sweeps=num_sweeps,
+                    efficiency=efficiency,
+                    turnaround_time=turn_time,
+                    overshoot=az_speed**2 / (2 * az_accel))
+
+
+def load_slew_params():
+    """Load the slew model parameters from the sorunlib configuration.
+
+    Returns:
+        dict: The ``acu_slew`` configuration block, with any missing
+        parameters filled in from :data:`DEFAULT_SLEW_PARAMS`.
+
+    """
+    cfg = run.config.load_config()
+    params = dict(DEFAULT_SLEW_PARAMS)
+    params.update(cfg.get('acu_slew') or {})
+    return params
+
+
+def _axis_time(distance, speed, accel):
+    """Time to move each distance with a trapezoidal velocity profile."""
+    distance = np.abs(distance)
+    # Distance covered accelerating up to speed and back down again
+    ramp = speed**2 / accel
+    return np.where(distance < ramp,
+                    2 * np.sqrt(distance / accel),
+                    distance / speed + speed / accel)
+
+
+def slew_time(az1, el1, az2, el2, boresight1=None, boresight2=None,
+              params=None):
+    """Estimate the duration of a move between two positions.
+
+    Azimuth and elevation move simultaneously, each accelerating to its
+    maximum speed and decelerating to a stop, so the duration is set by the
+    slower axis, plus a fixed settle time. Boresight rotation is a separate
+    command, i.e. :func:`sorunlib.acu.set_boresight`, so if given, its
+    duration and settle time are added.
+
+    Args:
+        az1 (float or array): Starting azimuth.
+        el1 (float or array): Starting elevation.
+        az2 (float or array): Destination azimuth.
+        el2 (float or array): Destination elevation.
+        boresight1 (float or array, optional): Starting boresight angle.
+        boresight2 (float or array, optional): Destination boresight angle.
+        params (dict, optional): Slew model parameters, as in
+            :data:`DEFAULT_SLEW_PARAMS`. If None, these are loaded with
+            :func:`load_slew_params`.
+
+    Returns:
+        float or numpy.ndarray: Estimated duration of each move in seconds.
+
+    """
+    if params is None:
+        params = load_slew_params()
+
+    az_time = _axis_time(np.subtract(az2, az1), params['az_speed'],
+                         params['az_accel'])
+    el_time = _axis_time(np.subtract(el2, el1), params['el_speed'],
+                         params['el_accel'])
+    duration = np.maximum(az_time, el_time) + params['settle_time']
+
+    if boresight1 is not None and boresight2 is not None:
+        distance = np.subtract(boresight2, boresight1)
+        boresight_time = _axis_time(distance, params['boresight_speed'],
+                                    params['boresight_accel'])
+        duration = duration + np.where(distance != 0,
+                                       boresight_time + params['settle_time'],
+                                       0)
+
+    return duration
+
+
+def solve_intercept(az, el, drift, elapsed, current_az, current_el,
+                    params=None):
+    """Find where the telescope can catch one or more drifting targets.
+
+    A target at ``az`` when ``elapsed`` seconds ago, drifting at ``drift``
+    deg/s, will have moved on by the time the slew completes. This iterates
+    on the arrival time until the estimated slew ends where the target will
+    be.
+
+    Args:
+        az (float or array): Azimuth of each target at its reference time.
+        el (float or array): Elevation of each target.
+        drift (float or array): Azimuthal drift rate of each target in deg/s.
+        elapsed (float or array): Time since each target was at ``az``, in
+            seconds.
+        current_az (float): Current azimuth of the telescope.
+        current_el (float): Current elevation of the telescope.
+        params (dict, optional): Slew model parameters. If None, these are
+            loaded with :func:`load_slew_params`.
+
+    Returns:
+        tuple: A tuple of ``(intercept_az, duration)``, the azimuth to move to
+        for each target and the estimated slew duration in seconds, which can
+        be used to rank targets by how quickly they can be reached.
+
+    """
+    if params is None:
+        params = load_slew_params()
+
+    az, el, drift, elapsed = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (az, el, drift, elapsed)])
+
+    duration = np.zeros_like(az)
+    for _ in range(INTERCEPT_MAX_ITER):
+        intercept_az = az + drift * (elapsed + duration)
+        new_duration = slew_time(current_az, current_el, intercept_az, el,
+                                 params=params)
+        converged = np.all(np.abs(new_duration - duration) < INTERCEPT_TOL)
+        duration = new_duration
+        if converged:
+            break
+
+    intercept_az = az + drift * (elapsed + duration)
+    if intercept_az.ndim == 0:
+        return float(intercept_az), float(duration)
+    return intercept_az, duration
+
+
+def _slew_costs(positions, start, params):
+    """Slew time between each pair of positions, and from ``start`` to each
+    position."""
+    columns = positions.T
+    first = [x[:, None] for x in columns]
+    second = [x[None, :] for x in columns]
+    boresight = {}
+    if positions.shape[1] == 3:
+        boresight = {'boresight1': first[2], 'boresight2': second[2]}
+    matrix = slew_time(first[0], first[1], second[0], second[1],
+                       params=params, **boresight)
+
+    if start is None:
+        from_start = np.zeros(len(positions))
+    else:
+        start = np.asarray(start, dtype=float)
+        boresight = {}
+        if positions.shape[1] == 3:
+            boresight = {'boresight1': start[2], 'boresight2': columns[2]}
+        from_start = slew_time(start[0], start[1], columns[0], columns[1],
+                               params=params, **boresight)
+
+    return matrix, from_start
+
+
+def _path_time(order, matrix, from_start):
+    return from_start[order[0]] + sum(matrix[a, b]
+                                      for a, b in zip(order[:-1], order[1:]))
+
+
+def order_moves(positions, start=None, params=None):
+    """Order a set of independent moves to minimize the total slew time.
+
+    A nearest-neighbor ordering is refined by reversing sections of the path
+    (2-opt) until no reversal shortens it further. This is not guaranteed to
+    find the best ordering, but is close for the handful of positions in a
+    typical calibration sequence.
+
+    Args:
+        positions (list): List of ``(az, el)`` or ``(az, el, boresight)``
+            positions to visit.
+        start (tuple, optional): Starting position of the telescope, in the
+            same form as ``positions``. If None, the path may start anywhere.
+        params (dict, optional): Slew model parameters. If None, these are
+            loaded with :func:`load_slew_params`.
+
+    Returns:
+        list: Indices into ``positions`` in the order they should be visited.
+
+    Examples:
+        Visit pointing targets in the fastest order::
+
+            targets = [(120, 50), (240, 60), (130, 55)]
+            for i in planning.order_moves(targets, start=(180, 50)):
+                acu.move_to(*targets[i])
+
+    """
+    if params is None:
+        params = load_slew_params()
+
+    positions = np.asarray(positions, dtype=float)
+    if len(positions) < 2:
+        return list(range(len(positions)))
+    matrix, from_start = _slew_costs(positions, start, params)
+
+    # Nearest-neighbor starting path
+    remaining = list(range(len(positions)))
+    costs = from_start
+    order = []
+    while remaining:
+        nearest = min(remaining, key=lambda i: costs[i])
+        order.append(nearest)
+        remaining.remove(nearest)
+        costs = matrix[nearest]
+
+    # 2-opt refinement
+    best = _path_time(order, matrix, from_start)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                time_ = _path_time(candidate, matrix, from_start)
+                if time_ < best - 1e-9:
+                    order, best = candidate, time_
+                    improved = True
+
+    return [int(i) for i in order]
+
+
+def calibrate_slew(moves=None, params=None):
+    """Fit the slew model to the durations of recorded moves.
+
+    For each axis, moves that were limited by that axis and long enough to
+    reach full speed are fit with a straight line, duration against distance.
+    The slope gives the axis speed, and the intercept the combined
+    acceleration and settle time. Axes without at least two such moves, of
+    different lengths, keep their current parameters.
+
+    Args:
+        moves (list, optional): Recorded moves, as returned by
+            :func:`sorunlib.acu.recorded_moves`, which is used if None.
+        params (dict, optional): Slew model parameters to start from. If None,
+            these are loaded with :func:`load_slew_params`.
+
+    Returns:
+        dict: Updated slew model parameters, suitable for the ``acu_slew``
+        configuration block.
+
+    """
+    if moves is None:
+        moves = run.acu.recorded_moves()
+    if params is None:
+        params = load_slew_params()
+    params = dict(params)
+
+    def axis_time(axis, move):
+        distance = move['target'][axis] - move['start'][axis]
+        return _axis_time(distance, params[f'{axis}_speed'],
+                          params[f'{axis}_accel'])
+
+    settle_times = []
+    for axis in ['az', 'el', 'boresight']:
+        speed = params[f'{axis}_speed']
+        accel = params[f'{axis}_accel']
+        distances = []
+        durations = []
+        for move in moves:
+            if axis not in move['target']:
+                continue
+            # Only use moves limited by this axis, that reach full speed
+            slowest = max(move['target'], key=lambda x: axis_time(x, move))
+            distance = abs(move['target'][axis] - move['start'][axis])
+            if slowest != axis or distance < speed**2 / accel:
+                continue
+            distances.append(distance)
+            durations.append(move['duration'])
+
+        if len(set(distances)) < 2:
+            continue
+        slope, intercept = np.polyfit(distances, durations, 1)
+        if slope <= 0:
+            continue
+        params[f'{axis}_speed'] = float(1 / slope)
+        settle_times.append(intercept - params[f'{axis}_speed'] / accel)
+
+    if settle_times:
+        params['settle_time'] = max(float(np.mean(settle_times)), 0.)
+
+    return params
@@ -1,32 +1,251 @@
 import datetime as dt
+import threading
 import time
 
+from contextlib import contextmanager
+from functools import partial
+
 import sorunlib as run
 
 from sorunlib.commands import _timestamp_to_utc_datetime
-from sorunlib._internal import check_response, check_started, monitor_process, protect_shutdown, stop_smurfs
+from sorunlib._internal import check_response, check_started, max_request_duration, monitor_process, protect_shutdown, retry_request, run_concurrently, stop_smurfs
+from sorunlib.status import ACUStatus
 
 
 OP_TIMEOUT = 60
 
+# Duration, in seconds, allowed for the HWP to spin up
+HWP_SPIN_UP_TIMEOUT = 1800
+
+# Operations that do not need a stable HWP, and so may run while it spins up
+# in the background. Any other operation waits for the spin-up to finish.
+HWP_COMPATIBLE = {
+    'acu.move_to',
+    'acu.move_to_async',
+    'acu.move_to_target',
+    'acu.set_boresight',
+    'acu.set_boresight_async',
+    'smurf.check_targets',
+    'smurf.recover',
+    'smurf.set_targets',
+    'smurf.uxm_setup',
+    'smurf.uxm_relock',
+    'smurf.bias_dets',
+}
+
+
+def _stop_motion(acu):
+    retry_request(acu, 'generate_scan', 'stop')
+    print("Waiting for telescope motion to stop.")
+    resp = retry_request(acu, 'generate_scan', 'wait', timeout=OP_TIMEOUT)
+    check_response(acu, resp)
+
+
+def _stop_motion_timeout():
+    """Deadline, in seconds, for :func:`_stop_motion`, covering every retry."""
+    return max_request_duration('stop') + \
+        max_request_duration('wait', timeout=OP_TIMEOUT)
+
 
 @protect_shutdown
 def _stop_scan():
     acu = run.CLIENTS['acu']
+    timeout = _stop_motion_timeout()
 
     print("Stopping scan.")
-    stop_smurfs()
+    # Streams and motion are independent, stop them all at once, with a
+    # single deadline so nothing is left running past it
+    tasks = run.smurf._stop_tasks()
+    tasks['acu'] = partial(_stop_motion, acu)
+    results, stragglers = run_concurrently(tasks, timeout=timeout)
+    motion = results.pop('acu', None)
 
-    # Stop motion
-    acu.generate_scan.stop()
-    print("Waiting for telescope motion to stop.")
-    resp = acu.generate_scan.wait(timeout=OP_TIMEOUT)
-    check_response(acu, resp)
+    # Abandoned SMuRFs are removed from the targets list here, rather than by
+    # their still running threads
+    smurf_error = None
+    try:
+        failed = run.smurf._failed_stops(
+            results, [x for x in stragglers if x != 'acu'], timeout)
+        run.smurf._remove_failed(failed)
+        run.smurf._check_smurf_threshold()
+    except RuntimeError as e:
+        print(f"Caught error while shutting down SMuRF streams: {e}")
+    except Exception as e:
+        smurf_error = e
+
+    if 'acu' in stragglers:
+        error = f"Telescope motion did not stop within {timeout} seconds."
+        raise RuntimeError(error)
+    if isinstance(motion, Exception):
+        raise motion
+    if smurf_error is not None:
+        raise smurf_error
     print("Scan finished.")
 
 
+def _scan_window_open(stop_time, min_duration=None):
+    """Check whether there is still time to scan before ``stop_time``."""
+    now = dt.datetime.now(dt.timezone.utc)
+    scan_stop = _timestamp_to_utc_datetime(stop_time)
+
+    # Check stop time has not already passed
+    if now > scan_stop:
+        return False
+
+    # Check there is enough time to perform scan
+    if min_duration is not None:
+        start_by_time = scan_stop - dt.timedelta(seconds=min_duration)
+        if now > start_by_time:
+            return False
+
+    return True
+
+
+def _start_generate_scan(acu, width, az_drift=0, scan_type=1, el_amp=None,
+                         **kwargs):
+    """Start generate_scan from the current telescope position."""
+    # Grab current telescope position
+    position = ACUStatus.from_reply(acu.monitor.status())
+    az = position.az
+    el = position.el
+
+    if scan_type == 3:
+        el1 = el - el_amp
+        el2 = el + el_amp
+    else:
+        el1 = el2 = el
+
+    # Start telescope motion
+    # az_speed and az_accel assumed from ACU defaults
+    # Can be modified by acu.set_scan_params()
+    resp = acu.generate_scan.start(az_endpoint1=az,
+                                   az_endpoint2=az + width,
+                                   el_endpoint1=el1,
+                                   el_endpoint2=el2,
+                                   el_speed=0,
+                                   az_drift=az_drift,
+                                   scan_type=scan_type,
+                                   **kwargs)
+    check_started(acu, resp)
+
+
+class HWPSpinUp:
+    """HWP spin-up running in the background.
+
+    Returned by :func:`hwp_spin_up`. Operations run through :meth:`run` are
+    checked against the compatibility policy, and wait for the spin-up to
+    finish first unless they are known not to need a stable HWP.
+
+    Args:
+        freq (float): Target frequency to rotate the HWP in Hz, as in
+            :func:`sorunlib.hwp.set_freq`.
+        timeout (float): Duration, in seconds, allowed for the spin-up.
+        compatible (set): Names of operations, i.e. 'acu.move_to', that may
+            run during the spin-up.
+
+    """
+
+    def __init__(self, freq, timeout=HWP_SPIN_UP_TIMEOUT,
+                 compatible=HWP_COMPATIBLE):
+        self.freq = freq
+        self.compatible = compatible
+        self._error = None
+        self._joined = False
+        self._thread = threading.Thread(target=self._spin_up,
+                                        args=(freq, timeout),
+                                        daemon=True)
+        self._thread.start()
+
+    def _spin_up(self, freq, timeout):
+        try:
+            hwp = run.CLIENTS['hwp']
+            resp = hwp.enable_driver_board()
+            check_response(hwp, resp)
+            run.hwp.set_freq(freq=freq, timeout=timeout)
+        except Exception as e:
+            self._error = e
+
+    def done(self):
+        """Check whether the spin-up has finished, successfully or not."""
+        return not self._thread.is_alive()
+
+    def join(self):
+        """Wait for the spin-up to finish.
+
+        Raises:
+            RuntimeError: If the spin-up failed. Only raised on the first call.
+
+        """
+        self._thread.join()
+        if not self._joined:
+            self._joined = True
+            if self._error is not None:
+                raise self._error
+
+    def run(self, func, *args, **kwargs):
+        """Run an operation, waiting for the spin-up to finish first if the
+        operation is not in the compatibility policy.
+
+        Args:
+            func (function): sorunlib function to run, i.e.
+                ``sorunlib.smurf.uxm_relock``.
+            *args: Positional arguments passed to ``func``.
+            **kwargs: Keyword arguments passed to ``func``.
+
+        Returns:
+            The return value of ``func``.
+
+        """
+        name = f"{func.__module__.split('.')[-1]}.{func.__name__}"
+        if name not in self.compatible and not self.done():
+            print(f"{name} requires a stable HWP, waiting for spin-up to "
+                  + "finish.")
+            self.join()
+        return func(*args, **kwargs)
+
+
+@contextmanager
+def hwp_spin_up(freq, timeout=HWP_SPIN_UP_TIMEOUT, compatible=HWP_COMPATIBLE):
+    """Spin up the HWP in the background while running other operations.
+
+    Unlike :func:`sorunlib.hwp.spin_up`, detector data is not streamed during
+    the spin-up, leaving the SMuRFs free for setup. The spin-up is joined on
+    leaving the context, unless an error is raised within it.
+
+    Args:
+        freq (float): Target frequency to rotate the HWP in Hz, as in
+            :func:`sorunlib.hwp.set_freq`.
+        timeout (float): Duration, in seconds, allowed for the spin-up.
+        compatible (set): Names of operations that may run during the
+            spin-up. Defaults to :data:`HWP_COMPATIBLE`.
+
+    Yields:
+        HWPSpinUp: Handle used to run operations during the spin-up.
+
+    Examples:
+        Relock the detectors and move the telescope while the HWP spins up::
+
+            with seq.hwp_spin_up(2.0) as spin_up:
+                spin_up.run(acu.move_to, az=180, el=50)
+                spin_up.run(smurf.uxm_relock)
+                spin_up.run(smurf.bias_dets)
+            seq.scan(...)
+
+    """
+    spin_up = HWPSpinUp(freq, timeout=timeout, compatible=compatible)
+    try:
+        yield spin_up
+    except BaseException:
+        # Do not hold up the error waiting on the HWP
+        if not spin_up.done():
+            print("Leaving HWP spin-up running in the background.")
+        raise
+    spin_up.join()
+
+
 def scan(description, stop_time, width, az_drift=0, scan_type=1, el_amp=None,
-         tag=None, subtype=None, min_duration=None, **kwargs):
+         tag=None, subtype=None, min_duration=None, az=None, el=None,
+         **kwargs):
     """Run a constant elevation scan, collecting detector data.
 
     Args:
@@ -47,55 +266,40 @@ def scan(description, stop_time, width, az_drift=0, scan_type=1, el_amp=None,
         min_duration (float, optional): Minimum duration required to scan,
             specified in seconds. If not enough time exists between now and the
             ``stop_time`` the scan is not executed. Defaults to None.
+        az (float, optional): Azimuth to move to before starting the scan. The
+            move runs while the SMuRF streams are starting up. If None, the
+            scan starts from the current position. Defaults to None.
+        el (float, optional): Elevation to move to before starting the scan.
+            Must be specified if ``az`` is. Defaults to None.
 
     Any additional arguments are passed through to generate_scan.
 
     """
-    now = dt.datetime.now(dt.timezone.utc)
-    scan_stop = _timestamp_to_utc_datetime(stop_time)
-
-    # Check stop time has not already passed
-    if now > scan_stop:
+    if not _scan_window_open(stop_time, min_duration):
         return
 
-    # Check there is enough time to perform scan
-    if min_duration is not None:
-        start_by_time = scan_stop - dt.timedelta(seconds=min_duration)
-        if now > start_by_time:
-            return
-
     # It is an error to not declare el_amp when you specify type 3 scan.
     assert (scan_type != 3 or el_amp is not None)
 
+    # Starting position must be fully specified, if given.
+    assert ((az is None) == (el is None))
+
     acu = run.CLIENTS['acu']
 
     try:
+        # Start moving to the scan start position, finishing after the streams
+        # are enabled
+        if az is not None:
+            move = run.acu.move_to_async(az=az, el=el)
+
         # Enable SMuRF streams
         run.smurf.stream('on', subtype=subtype, tag=tag)
 
-        # Grab current telescope position
-        resp = acu.monitor.status()
-        az = resp.session['data']['StatusDetailed']['Azimuth current position']
-        el = resp.session['data']['StatusDetailed']['Elevation current position']
+        if az is not None:
+            move.result(timeout=run.acu.MOVE_TIMEOUT)
 
-        if scan_type == 3:
-            el1 = el - el_amp
-            el2 = el + el_amp
-        else:
-            el1 = el2 = el
-
-        # Start telescope motion
-        # az_speed and az_accel assumed from ACU defaults
-        # Can be modified by acu.set_scan_params()
-        resp = acu.generate_scan.start(az_endpoint1=az,
-                                       az_endpoint2=az + width,
-                                       el_endpoint1=el1,
-                                       el_endpoint2=el2,
-                                       el_speed=0,
-                                       az_drift=az_drift,
-                                       scan_type=scan_type,
-                                       **kwargs)
-        check_started(acu, resp)
+        _start_generate_scan(acu, width, az_drift=az_drift,
+                             scan_type=scan_type, el_amp=el_amp, **kwargs)
 
         # Wait until stop time
         monitor_process(acu, 'generate_scan', stop_time)
@@ -103,6 +307,103 @@ def scan(description, stop_time, width, az_drift=0, scan_type=1, el_amp=None,
         _stop_scan()
 
 
+def scan_series(segments, tag=None, subtype=None):
+    """Run a series of scans back-to-back without restarting the SMuRF
+    streams.
+
+    The streams are started once, before the first segment, and left running
+    until the last segment ends. Between segments only ``generate_scan`` is
+    stopped and restarted with the next segment's parameters. Segments whose
+    ``stop_time`` has passed by the time they are reached are skipped.
+
+    Args:
+        segments (list): List of dicts, each containing the arguments to
+            :func:`scan` for one segment, i.e. ``description``,
+            ``stop_time``, ``width``, and optionally ``az_drift``,
+            ``scan_type``, ``el_amp``, ``min_duration``, ``az`` and ``el``.
+            Any additional entries are passed through to generate_scan.
+        tag (str, optional): Tag or comma-separated listed of tags to attach to
+            the stream, shared by all segments.
+        subtype (str, optional): Operation subtype used to tag the stream.
+
+    Returns:
+        list: List of dicts, one per segment scanned, with the segment's
+        ``description`` and its ``start`` and ``stop`` times as UTC
+        datetimes. These identify each segment within the shared stream.
+
+    Examples:
+        Scan two fields back-to-back::
+
+            seq.scan_series([
+                {'description': 'field1', 'stop_time': '2024-06-21T15:58:00',
+                 'width': 20.},
+                {'description': 'field2', 'stop_time': '2024-06-21T16:58:00',
+                 'width': 20., 'az': 120, 'el': 50},
+            ])
+
+    """
+    for segment in segments:
+        # It is an error to not declare el_amp when you specify type 3 scan.
+        assert (segment.get('scan_type', 1) != 3
+                or segment.get('el_amp') is not None)
+
+        # Starting position must be fully specified, if given.
+        assert (('az' in segment) == ('el' in segment))
+
+    acu = run.CLIENTS['acu']
+    streaming = False
+    moving = False
+    scanned = []
+
+    try:
+        for segment in segments:
+            segment = dict(segment)
+            description = segment.pop('description')
+            stop_time = segment.pop('stop_time')
+            min_duration = segment.pop('min_duration', None)
+            az = segment.pop('az', None)
+            el = segment.pop('el', None)
+
+            if not _scan_window_open(stop_time, min_duration):
+                print(f"Skipping segment '{description}', not enough time "
+                      + "remaining.")
+                continue
+
+            if az is not None:
+                move = run.acu.move_to_async(az=az, el=el)
+
+            # Enable SMuRF streams, once, for the whole series. Set first, so
+            # streams are stopped even if only some of them start
+            if not streaming:
+                streaming = True
+                run.smurf.stream('on', subtype=subtype, tag=tag)
+
+            if az is not None:
+                move.result(timeout=run.acu.MOVE_TIMEOUT)
+
+            print(f"Starting segment '{description}'.")
+            start = dt.datetime.now(dt.timezone.utc)
+            # Set first, so motion is stopped even if the start check fails
+            moving = True
+            _start_generate_scan(acu, **segment)
+
+            # Wait until stop time
+            monitor_process(acu, 'generate_scan', stop_time)
+            _stop_motion(acu)
+            moving = False
+
+            scanned.append({'description': description,
+                            'start': start,
+                            'stop': dt.datetime.now(dt.timezone.utc)})
+    finally:
+        if moving:
+            _stop_scan()
+        elif streaming:
+            stop_smurfs()
+
+    return scanned
+
+
 def el_nod(el1, el2, num=5, pause=5):
     """Perform a set of elevation nods.
 
@@ -126,9 +427,9 @@ def el_nod(el1, el2, num=5, pause=5):
         run.smurf.stream('on', subtype='cal', tag='el_nods')
 
         # Grab current telescope position
-        resp = acu.monitor.status()
-        init_az = resp.session['data']['StatusDetailed']['Azimuth current position']
-        init_el = resp.session['data']['StatusDetailed']['Elevation current position']
+        position = ACUStatus.from_reply(acu.monitor.status())
+        init_az = position.az
+        init_el = position.el
 
         # Perform nods
         for x in range(num):
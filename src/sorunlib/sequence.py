@@ -0,0 +1,227 @@
+"""Compose multi-subsystem sequences from steps, parallel groups and streaming
+scopes.
+
+Sequences that coordinate several subsystems are usually written as a chain
+of ``try``/``finally`` blocks, each turning the SMuRF streams on and making
+sure they are stopped again. This module describes the same sequence
+declaratively, and takes care of the streams and cleanup when it runs::
+
+    from sorunlib import acu, smurf, wiregrid
+    from sorunlib.sequence import execute, parallel, step, streaming
+
+    execute(
+        parallel(step(acu.move_to, az=180, el=60),
+                 step(smurf.uxm_relock)),
+        streaming(step(wiregrid.insert),
+                  step(wiregrid.rotate, continuous=True, duration=20),
+                  tag='wiregrid, wg_inserting'),
+        streaming(step(wiregrid.rotate, continuous=False),
+                  tag='wiregrid, wg_inserting'),
+        cleanup=[step(wiregrid.eject)],
+    )
+
+Branches of a :func:`parallel` group run concurrently, each in its own
+thread. Consecutive :func:`streaming` scopes with the same tag and subtype
+are merged, so the streams are not stopped and restarted between them. A
+streaming scope nested in another with the same tag and subtype runs within
+the outer stream.
+
+Only one SMuRF stream can run at a time, so at most one branch of a parallel
+group may contain a streaming scope, and streaming scopes with different
+tags cannot be nested.
+
+"""
+
+import sorunlib as run
+
+from sorunlib._internal import run_concurrently, stop_smurfs
+
+
+class Step:
+    """A single operation in a sequence.
+
+    Args:
+        func (function): Function to call, i.e. ``sorunlib.acu.move_to``.
+        *args: Positional arguments passed to ``func``.
+        **kwargs: Keyword arguments passed to ``func``.
+
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        name = getattr(self.func, '__qualname__', repr(self.func))
+        return f"Step({name})"
+
+    def _streams(self):
+        return False
+
+    def _run(self, stream=None):
+        self.func(*self.args, **self.kwargs)
+
+
+class Parallel:
+    """A group of branches that run concurrently.
+
+    Args:
+        *branches: Steps, or other sequence elements, to run concurrently.
+
+    Raises:
+        RuntimeError: If more than one branch contains a streaming scope.
+
+    """
+
+    def __init__(self, *branches):
+        if sum(branch._streams() for branch in branches) > 1:
+            error = "Only one branch of a parallel group may stream data."
+            raise RuntimeError(error)
+        self.branches = branches
+
+    def __repr__(self):
+        return f"Parallel({', '.join(repr(x) for x in self.branches)})"
+
+    def _streams(self):
+        return any(branch._streams() for branch in self.branches)
+
+    def _run(self, stream=None):
+        tasks = {i: (lambda branch=branch: branch._run(stream))
+                 for i, branch in enumerate(self.branches)}
+        results, _ = run_concurrently(tasks)
+
+        # Raise the first error, in branch order, once all branches are done
+        for result in results.values():
+            if isinstance(result, Exception):
+                raise result
+
+
+class Streaming:
+    """A scope within which the SMuRF streams are on.
+
+    Args:
+        *nodes: Steps, or other sequence elements, to run in order.
+        tag (str, optional): Tag or comma-separated listed of tags to attach to
+            the stream.
+        subtype (str, optional): Operation subtype used to tag the stream.
+        **kwargs: Additional keyword arguments passed to
+            :func:`sorunlib.smurf.stream`.
+
+    """
+
+    def __init__(self, *nodes, tag=None, subtype='cal', **kwargs):
+        self.nodes = _coalesce(nodes)
+        self.tag = tag
+        self.subtype = subtype
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        return f"Streaming({', '.join(repr(x) for x in self.nodes)}, " + \
+            f"tag={self.tag!r})"
+
+    @property
+    def _key(self):
+        return (self.tag, self.subtype, tuple(sorted(self.kwargs.items())))
+
+    def _streams(self):
+        return True
+
+    def _run(self, stream=None):
+        # Already streaming with the same settings
+        if stream == self._key:
+            _run_all(self.nodes, stream)
+            return
+
+        if stream is not None:
+            error = f"Cannot start stream with tag '{self.tag}' while " + \
+                f"streaming with tag '{stream[0]}'."
+            raise RuntimeError(error)
+
+        try:
+            run.smurf.stream('on', tag=self.tag, subtype=self.subtype,
+                             **self.kwargs)
+            _run_all(self.nodes, self._key)
+        finally:
+            stop_smurfs()
+
+
+def _coalesce(nodes):
+    """Merge consecutive streaming scopes with the same settings."""
+    merged = []
+    for node in nodes:
+        previous = merged[-1] if merged else None
+        if isinstance(node, Streaming) and isinstance(previous, Streaming) \
+                and node._key == previous._key:
+            merged[-1] = Streaming(*previous.nodes, *node.nodes,
+                                   tag=node.tag, subtype=node.subtype,
+                                   **node.kwargs)
+        else:
+            merged.append(node)
+    return merged
+
+
+def _run_all(nodes, stream=None):
+    for node in nodes:
+        node._run(stream)
+
+
+def _run_cleanup(nodes):
+    """Run every cleanup step, returning any errors raised."""
+    errors = []
+    for node in nodes or []:
+        try:
+            node._run()
+        except Exception as e:
+            print(f"Cleanup step {node} failed: {e}")
+            errors.append(e)
+    return errors
+
+
+def step(func, *args, **kwargs):
+    """Create a step that calls ``func(*args, **kwargs)``."""
+    return Step(func, *args, **kwargs)
+
+
+def parallel(*branches):
+    """Create a group of branches to run concurrently.
+
+    See :class:`Parallel`.
+
+    """
+    return Parallel(*branches)
+
+
+def streaming(*nodes, tag=None, subtype='cal', **kwargs):
+    """Create a scope that runs ``nodes`` in order with the SMuRF streams on.
+
+    See :class:`Streaming`.
+
+    """
+    return Streaming(*nodes, tag=tag, subtype=subtype, **kwargs)
+
+
+def execute(*nodes, cleanup=None):
+    """Run a sequence.
+
+    Args:
+        *nodes: Steps, parallel groups and streaming scopes to run in order.
+        cleanup (list, optional): Steps to run once the sequence ends, whether
+            or not it succeeded, i.e. ejecting the wiregrid. Every cleanup step
+            is attempted, even if an earlier one fails.
+
+    Raises:
+        Exception: The first error raised by the sequence or, if the sequence
+            succeeded, by its cleanup.
+
+    """
+    try:
+        _run_all(_coalesce(nodes))
+    except BaseException:
+        # Cleanup errors are reported, but the original error is raised
+        _run_cleanup(cleanup)
+        raise
+
+    errors = _run_cleanup(cleanup)
+    if errors:
+        raise errors[0]
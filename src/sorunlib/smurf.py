@@ -6,23 +6,192 @@ If a SMuRF fails to perform an operation it will be dropped from the global
 number of active SMuRFs falls below the configured ``smurf_failure_threshold``
 an exception will be raised, halting observations.
 
-:func:`initialize() <sorunlib.__init__.initialize>` must be run to re-add
-previously failed SMuRFs to the ``CLIENTS`` list.
+:func:`recover()` re-adds previously failed SMuRFs that are reachable again,
+and is cheap enough to run between schedule steps, i.e. as preparation in
+:func:`sorunlib.commands.wait_until`. :func:`initialize()
+<sorunlib.__init__.initialize>` can also be run to rebuild all clients.
+
+The duration of each operation on each SMuRF is also tracked. If
+``smurf_straggler_factor`` is configured, a SMuRF that is consistently that
+many times slower than the others at the same operation is quarantined, i.e.
+temporarily dropped from the ``CLIENTS`` list, for ``smurf_quarantine_time``
+seconds. Once that time has passed it is re-added before the next operation,
+if it responds to a status request. A SMuRF that missed a setup operation
+while quarantined, i.e. ``uxm_relock``, is instead left out until
+:func:`recover()` is run, as its detectors may not be locked or biased.
+Quarantined SMuRFs are still included when streams are stopped. SMuRFs are
+only quarantined if enough remain to satisfy the
+``smurf_failure_threshold``.
+
+Stream settings shared between sequences, i.e. the downsample factor and
+filter, can be defined once as named profiles under ``smurf_stream_profiles``
+in the configuration file. A :class:`StreamProfile` passes its settings to the
+controllers when the stream starts, and tags the stream with them::
+
+    smurf.stream('on', tag='stimulator,gain', subtype='cal', profile='fast')
 
 """
 
+import statistics
 import time
 
+from collections import deque
+from functools import partial
+
 from ocs.client_http import ControlClientError
 
 import sorunlib as run
-from sorunlib._internal import check_response, check_started
+from sorunlib._internal import _check_error, check_response, check_started, retry_request, run_concurrently
+from sorunlib.status import gather, SmurfStream
+from sorunlib.util import _find_active_instances, _try_client
+
+# Sampling rate, in Hz, of the SMuRF data before downsampling
+SAMPLE_RATE = 4000
+# Filter order used by pysmurf when none is given
+DEFAULT_FILTER_ORDER = 4
+# Cutoff frequency of the downsample filter, as a fraction of the downsampled
+# sampling rate, used when none is given
+FILTER_CUTOFF_RATIO = 63 / 200
 
 # Timing between commanding separate SMuRF Controllers
 # Yet to be determined in the field. Eventually might need this to be unique
 # per operation. Also, move to configuration file once sorunlib has one.
 CRYO_WAIT = 120
 
+# Number of recent durations kept per SMuRF and operation
+HEALTH_WINDOW = 10
+# Minimum number of recorded durations before a SMuRF can be quarantined
+HEALTH_MIN_SAMPLES = 3
+# Default duration, in seconds, to quarantine a slow SMuRF
+QUARANTINE_TIME = 3600
+# Operations that change the state of the detectors. A SMuRF that misses any
+# of these while quarantined is not re-added automatically.
+SETUP_OPERATIONS = ('uxm_setup', 'uxm_relock', 'bias_dets', 'set_biases',
+                    'zero_biases', 'all_off')
+
+
+class _HealthTracker:
+    """Track the operation durations and failures of each SMuRF controller.
+
+    Durations are kept separately for each operation, so controllers are only
+    compared on like operations.
+
+    Args:
+        window (int): Number of recent durations to keep per controller and
+            operation.
+
+    """
+
+    def __init__(self, window=HEALTH_WINDOW):
+        self.window = window
+        self.durations = {}
+        self.failures = {}
+
+    def record(self, instance_id, operation, duration):
+        """Record the duration of a successful operation."""
+        history = self.durations.setdefault((instance_id, operation),
+                                            deque(maxlen=self.window))
+        history.append(duration)
+
+    def record_failure(self, instance_id):
+        """Record a failed operation."""
+        self.failures[instance_id] = self.failures.get(instance_id, 0) + 1
+
+    def reset(self, instance_id):
+        """Forget the recorded durations for a controller."""
+        for key in [key for key in self.durations if key[0] == instance_id]:
+            del self.durations[key]
+
+    def median_duration(self, instance_id, operation):
+        """Median of the recent durations of an operation, or None if there
+        are too few."""
+        history = self.durations.get((instance_id, operation), [])
+        if len(history) < HEALTH_MIN_SAMPLES:
+            return None
+        return statistics.median(history)
+
+    def stragglers(self, instance_ids, operation, factor):
+        """Find controllers much slower than their peers at an operation.
+
+        Args:
+            instance_ids (list): Controllers to compare.
+            operation (str): Operation to compare durations of.
+            factor (float): A controller is a straggler if its median duration
+                is more than ``factor`` times the median of the other
+                controllers' median durations.
+
+        Returns:
+            list: instance-ids of the stragglers, slowest first.
+
+        """
+        medians = {id_: self.median_duration(id_, operation)
+                   for id_ in instance_ids}
+        medians = {k: v for k, v in medians.items() if v is not None}
+
+        stragglers = []
+        for id_, median in medians.items():
+            others = [v for k, v in medians.items() if k != id_]
+            if not others:
+                continue
+            if median > factor * statistics.median(others):
+                stragglers.append(id_)
+
+        return sorted(stragglers, key=lambda id_: medians[id_], reverse=True)
+
+
+_health = _HealthTracker()
+
+# Quarantined clients, keyed by instance-id, with the time they may return
+_quarantine = {}
+
+# Setup operations run while each quarantined client was out, keyed by
+# instance-id
+_missed = {}
+
+# Straggler settings loaded from the configuration file, see
+# _load_straggler_settings()
+_straggler_settings = None
+
+# instance-ids of clients dropped after a failure
+_dropped = set()
+
+
+# Stream profiles loaded from the configuration file, keyed by name
+_profiles = None
+
+
+def _reset():
+    """Clear all health history, quarantined and dropped clients, and the
+    loaded stream profiles and straggler settings."""
+    global _health, _profiles, _straggler_settings
+    _health = _HealthTracker()
+    _quarantine.clear()
+    _missed.clear()
+    _dropped.clear()
+    _profiles = None
+    _straggler_settings = None
+
+
+def _remove_failed(clients):
+    """Remove failed clients from the ``CLIENTS`` list, or from quarantine,
+    keeping track of them so they can be recovered later."""
+    for client in clients:
+        if client in run.CLIENTS['smurf']:
+            run.CLIENTS['smurf'].remove(client)
+        _quarantine.pop(client.instance_id, None)
+        _missed.pop(client.instance_id, None)
+        _dropped.add(client.instance_id)
+
+
+def _op_duration(response):
+    """Duration of a completed operation from its session, or None if not
+    available."""
+    start = response.session.get('start_time')
+    end = response.session.get('end_time')
+    if isinstance(start, (int, float)) and isinstance(end, (int, float)):
+        return end - start
+    return None
+
 
 def _wait_for_cryo(time_):
     if time_ is None:
@@ -42,6 +211,96 @@ def _check_smurf_threshold():
         raise RuntimeError(error)
 
 
+def _record_duration(smurf, operation, response):
+    duration = _op_duration(response)
+    if duration is not None:
+        _health.record(smurf.instance_id, operation, duration)
+
+
+def _load_straggler_settings():
+    """Load the straggler settings from the configuration file, once per
+    session.
+
+    Returns:
+        tuple: ``(factor, threshold, duration)``, where ``factor`` is None if
+        stragglers are not quarantined.
+
+    """
+    global _straggler_settings
+    if _straggler_settings is None:
+        cfg = run.config.load_config()
+        _straggler_settings = (cfg.get('smurf_straggler_factor'),
+                               cfg['smurf_failure_threshold'],
+                               cfg.get('smurf_quarantine_time',
+                                       QUARANTINE_TIME))
+    return _straggler_settings
+
+
+def _quarantine_stragglers(operation):
+    """Quarantine SMuRFs that are consistently slower than the others at an
+    operation, if configured to do so."""
+    factor, threshold, duration = _load_straggler_settings()
+    if factor is None:
+        return
+
+    clients = {smurf.instance_id: smurf for smurf in run.CLIENTS['smurf']}
+
+    for instance_id in _health.stragglers(list(clients), operation, factor):
+        if len(run.CLIENTS['smurf']) <= threshold:
+            break
+        print(f"{clients[instance_id]} is consistently slower than other "
+              + f"SMuRFs, quarantining for {duration} seconds.")
+        run.CLIENTS['smurf'].remove(clients[instance_id])
+        _quarantine[instance_id] = (clients[instance_id], time.time() + duration)
+        _missed[instance_id] = []
+
+
+def _record_missed(operation):
+    """Note a setup operation run while SMuRFs are quarantined."""
+    if operation not in SETUP_OPERATIONS:
+        return
+    for instance_id in _quarantine:
+        missed = _missed.setdefault(instance_id, [])
+        if operation not in missed:
+            missed.append(operation)
+
+
+def _readmit_quarantined():
+    """Re-add quarantined SMuRFs whose quarantine has expired, if they respond
+    to a status request and have not missed any setup operations. Others are
+    treated as failed, and left for :func:`recover`."""
+    active = [smurf.instance_id for smurf in run.CLIENTS['smurf']]
+    now = time.time()
+    for instance_id, (client, release_time) in list(_quarantine.items()):
+        if release_time > now:
+            continue
+        del _quarantine[instance_id]
+        missed = _missed.pop(instance_id, [])
+        if instance_id in active:
+            continue
+
+        try:
+            resp = client.stream.status()
+            _check_error(client, resp)
+        except (ControlClientError, RuntimeError) as e:
+            print(f"Unable to re-add {client} after quarantine.")
+            print(e)
+            _health.record_failure(instance_id)
+            _dropped.add(instance_id)
+            continue
+
+        if missed:
+            print(f"{client} missed {', '.join(missed)} while quarantined, "
+                  + "not re-adding it until recovered with recover().")
+            _dropped.add(instance_id)
+            continue
+
+        print(f"Re-adding {client} after quarantine.")
+        # Judge the client only on its performance from here on
+        _health.reset(instance_id)
+        run.CLIENTS['smurf'].append(client)
+
+
 def _run_op(operation, concurrent, settling_time, **kwargs):
     """Run operation across all active SMuRF controllers.
 
@@ -61,6 +320,9 @@ def _run_op(operation, concurrent, settling_time, **kwargs):
     """
     clients_to_remove = []
 
+    _readmit_quarantined()
+    _record_missed(operation)
+
     # Start operation
     for smurf in run.CLIENTS['smurf']:
         op = smurf.__getattribute__(operation)
@@ -70,9 +332,11 @@ def _run_op(operation, concurrent, settling_time, **kwargs):
             resp = op.wait()
             try:
                 check_response(smurf, resp)
+                _record_duration(smurf, operation, resp)
             except RuntimeError as e:
                 print(f"Failed to perform {operation} on {smurf}, removing from targets list.")
                 print(e)
+                _health.record_failure(smurf.instance_id)
                 clients_to_remove.append(smurf)
 
             # Allow cryo to settle
@@ -85,18 +349,21 @@ def _run_op(operation, concurrent, settling_time, **kwargs):
             resp = op.wait()
             try:
                 check_response(smurf, resp)
+                _record_duration(smurf, operation, resp)
             except RuntimeError as e:
                 print(f"Failed to perform {operation} on {smurf}, removing from targets list.")
                 print(e)
+                _health.record_failure(smurf.instance_id)
                 clients_to_remove.append(smurf)
 
     # Remove failed SMuRF clients
-    for client in clients_to_remove:
-        run.CLIENTS['smurf'].remove(client)
+    _remove_failed(clients_to_remove)
 
     # Check if enough SMuRFs remain
     _check_smurf_threshold()
 
+    _quarantine_stragglers(operation)
+
 
 def set_targets(targets):
     """Set the target pysmurf-controller Agents that sorunlib will command.
@@ -117,6 +384,101 @@ def set_targets(targets):
 
     run.CLIENTS['smurf'] = _smurf_clients
 
+    # Do not re-add quarantined or failed clients that are no longer targeted
+    for instance_id in list(_quarantine):
+        if instance_id not in targets:
+            del _quarantine[instance_id]
+            _missed.pop(instance_id, None)
+    _dropped.intersection_update(targets)
+
+
+def recover(test_mode=False):
+    """Re-add previously failed SMuRF Controllers that are reachable again.
+
+    Only the SMuRFs dropped after a failure are checked. Each one still known
+    to the registry gets a new client, which must respond to a status request
+    before it is added back to the targets list.
+
+    Args:
+        test_mode (bool): Look for SmurfFileEmulators instead of
+            PysmurfControllers, as in :func:`sorunlib.initialize`.
+
+    Returns:
+        list: instance-ids of the recovered SMuRFs.
+
+    Notes:
+        This modifies the global ``sorunlib.CLIENTS`` list.
+
+    """
+    if not _dropped:
+        return []
+
+    if test_mode:
+        smurf_agent_class = 'SmurfFileEmulator'
+    else:
+        smurf_agent_class = 'PysmurfController'
+
+    online = _find_active_instances(smurf_agent_class)
+    if isinstance(online, str):
+        online = [online]
+
+    recovered = []
+    for instance_id in sorted(_dropped):
+        if instance_id not in online:
+            continue
+
+        try:
+            client = _try_client(instance_id)
+            if client is None:
+                continue
+            resp = client.stream.status()
+            _check_error(client, resp)
+        except (ControlClientError, RuntimeError) as e:
+            print(f"Unable to recover {instance_id}.")
+            print(e)
+            continue
+
+        print(f"Recovered {client}, adding back to targets list.")
+        _dropped.discard(instance_id)
+        _health.reset(instance_id)
+        run.CLIENTS['smurf'].append(client)
+        recovered.append(instance_id)
+
+    return recovered
+
+
+def check_targets():
+    """Check that all target SMuRF Controllers are reachable.
+
+    This is cheap enough to run ahead of time, i.e. as preparation during
+    :func:`sorunlib.commands.wait_until`, so that unreachable controllers are
+    dropped before the next operation rather than during it. Controllers that
+    do not respond within ``sorunlib.status.STATUS_TIMEOUT`` are treated as
+    unreachable.
+
+    Notes:
+        This modifies the global ``sorunlib.CLIENTS`` list.
+
+    """
+    clients_to_remove = []
+
+    replies = gather([(smurf, 'stream') for smurf in run.CLIENTS['smurf']],
+                     return_exceptions=True)
+    for (smurf, _), resp in replies.items():
+        # Handles case where agent becomes unreachable or hangs
+        if isinstance(resp, (ControlClientError, TimeoutError)):
+            print(f"Failed to reach {smurf}, removing from targets list.")
+            print(resp)
+            clients_to_remove.append(smurf)
+        elif isinstance(resp, Exception):
+            raise resp
+
+    # Remove failed SMuRF clients
+    _remove_failed(clients_to_remove)
+
+    # Check if enough SMuRFs remain
+    _check_smurf_threshold()
+
 
 def bias_step(tag=None, concurrent=True, settling_time=None):
     """Perform a bias step on all SMuRF Controllers.
@@ -346,6 +708,161 @@ def shutdown(concurrent=True, settling_time=0):
             settling_time=settling_time)
 
 
+class StreamProfile:
+    """Downsample and filter settings for SMuRF streams.
+
+    The settings are validated, and the filter cutoff and stream tags derived
+    from them, once on creation.
+
+    Args:
+        downsample_factor (int): Downsample factor for SMuRF.
+        filter_disable (bool): If True, disable the downsample filter.
+        filter_order (int, optional): Order of the downsample filter. If None,
+            the pysmurf default is used.
+        filter_cutoff (float, optional): Cutoff frequency in Hz for the
+            downsample filter. If None, ``FILTER_CUTOFF_RATIO`` of the
+            downsampled sampling rate.
+        tags (list, optional): Additional tags to attach to streams using the
+            profile.
+
+    Attributes:
+        kwargs (dict): Keyword arguments passed to the SMuRF controllers when
+            starting the stream.
+
+    Raises:
+        ValueError: If any of the settings are invalid.
+
+    """
+    __slots__ = ('downsample_factor', 'filter_disable', 'filter_order',
+                 'filter_cutoff', 'tags', 'kwargs', '_tag')
+
+    def __init__(self, downsample_factor, filter_disable=False,
+                 filter_order=None, filter_cutoff=None, tags=None):
+        if isinstance(downsample_factor, bool) or \
+                not isinstance(downsample_factor, (int, float)) or \
+                downsample_factor < 1 or \
+                int(downsample_factor) != downsample_factor:
+            raise ValueError("downsample_factor must be a positive integer, "
+                             + f"not {downsample_factor!r}.")
+        if not isinstance(filter_disable, bool):
+            raise ValueError("filter_disable must be True or False, not "
+                             + f"{filter_disable!r}.")
+        if filter_order is not None and (
+                isinstance(filter_order, bool)
+                or not isinstance(filter_order, int) or filter_order < 1):
+            raise ValueError("filter_order must be a positive integer, not "
+                             + f"{filter_order!r}.")
+        if filter_cutoff is not None and (
+                isinstance(filter_cutoff, bool)
+                or not isinstance(filter_cutoff, (int, float))
+                or filter_cutoff <= 0):
+            raise ValueError("filter_cutoff must be a positive number, not "
+                             + f"{filter_cutoff!r}.")
+        if isinstance(tags, str):
+            tags = [tags]
+
+        self.downsample_factor = int(downsample_factor)
+        self.filter_disable = filter_disable
+        self.filter_order = filter_order
+        if not filter_disable and filter_cutoff is None:
+            filter_cutoff = int(FILTER_CUTOFF_RATIO * SAMPLE_RATE
+                                / self.downsample_factor)
+        self.filter_cutoff = filter_cutoff
+        self.tags = tuple(tags or ())
+
+        self.kwargs = {'downsample_factor': self.downsample_factor,
+                       'filter_disable': self.filter_disable,
+                       'filter_order': self.filter_order,
+                       'filter_cutoff': self.filter_cutoff}
+
+        derived = [f'downsample_factor_{self.downsample_factor:.0f}']
+        if filter_disable:
+            derived.append('filter_disabled')
+        else:
+            derived.append(f'filter_cutoff_{self.filter_cutoff:.0f}')
+            if filter_order is not None and \
+                    filter_order != DEFAULT_FILTER_ORDER:
+                derived.append(f'filter_order_{filter_order:.0f}')
+        self._tag = ','.join([*self.tags, *derived])
+
+    def __repr__(self):
+        return f"StreamProfile(downsample_factor={self.downsample_factor}, " + \
+            f"filter_disable={self.filter_disable}, " + \
+            f"filter_order={self.filter_order}, " + \
+            f"filter_cutoff={self.filter_cutoff}, tags={list(self.tags)})"
+
+    def tag(self, tag=None):
+        """Build the tag for a stream using this profile.
+
+        Args:
+            tag (str, optional): Tag or comma-separated list of tags, i.e.
+                'stimulator,gain', to which the profile tags are appended.
+
+        Returns:
+            str: Comma-separated list of tags.
+
+        """
+        if tag:
+            return f'{tag},{self._tag}'
+        return self._tag
+
+
+def _load_stream_profiles():
+    """Load and validate all stream profiles from ``smurf_stream_profiles`` in
+    the configuration file, once per session.
+
+    Returns:
+        dict: :class:`StreamProfile` objects keyed by name.
+
+    Raises:
+        RuntimeError: If any configured profile is invalid.
+
+    """
+    global _profiles
+    if _profiles is not None:
+        return _profiles
+
+    cfg = run.config.load_config()
+    profiles = {}
+    for name, settings in (cfg.get('smurf_stream_profiles') or {}).items():
+        try:
+            profiles[name] = StreamProfile(**settings)
+        except (TypeError, ValueError) as e:
+            error = f"Invalid stream profile '{name}' in configuration: {e}"
+            raise RuntimeError(error)
+
+    _profiles = profiles
+    return _profiles
+
+
+def get_stream_profile(profile):
+    """Get a stream profile.
+
+    Args:
+        profile (str or StreamProfile): Name of a profile defined in the
+            configuration file, or a :class:`StreamProfile`, which is returned
+            unchanged.
+
+    Returns:
+        StreamProfile: The stream profile.
+
+    Raises:
+        RuntimeError: If the profile is not defined, or the configured
+            profiles are invalid.
+
+    """
+    if isinstance(profile, StreamProfile):
+        return profile
+
+    profiles = _load_stream_profiles()
+    try:
+        return profiles[profile]
+    except KeyError:
+        error = f"Stream profile '{profile}' not found in configuration. " + \
+            f"Available profiles: {sorted(profiles)}"
+        raise RuntimeError(error)
+
+
 def _wait_for_stream_start(smurf, timeout):
     """Wait for, at most, timeout seconds until the stream for the specified
     smurf client is enabled.
@@ -356,16 +873,79 @@ def _wait_for_stream_start(smurf, timeout):
 
     """
     for i in range(int(timeout)):
-        resp = smurf.stream.status()
-        stream_on = resp.session['data'].get('stream_on', True)
-        if stream_on:
+        resp = retry_request(smurf, 'stream', 'status')
+        if SmurfStream.from_reply(resp).stream_on:
             return
         time.sleep(1)
 
     raise RuntimeError(f"Stream for {smurf} did not turn on within {timeout} seconds.")
 
 
-def stream(state, tag=None, subtype=None, wait_for_stream=True, **kwargs):
+def _stop_stream(smurf):
+    """Stop the stream on a single SMuRF and wait for it to finish."""
+    retry_request(smurf, 'stream', 'stop')
+    print(f'Waiting for stream from {smurf.instance_id} to stop.')
+    resp = retry_request(smurf, 'stream', 'wait')
+    check_response(smurf, resp)
+
+
+def _stop_quarantined_stream(smurf):
+    """Stop the stream on a quarantined SMuRF, if it is streaming."""
+    resp = retry_request(smurf, 'stream', 'status')
+    _check_error(smurf, resp)
+    if resp.session.get('status') in ['starting', 'running']:
+        _stop_stream(smurf)
+
+
+def _stop_tasks():
+    """Tasks stopping the stream on each SMuRF, including any quarantined
+    after starting their stream, for
+    :func:`sorunlib._internal.run_concurrently`, keyed by client."""
+    tasks = {smurf: partial(_stop_stream, smurf)
+             for smurf in run.CLIENTS['smurf']}
+    for smurf, _ in _quarantine.values():
+        if smurf not in tasks:
+            tasks[smurf] = partial(_stop_quarantined_stream, smurf)
+    return tasks
+
+
+def _failed_stops(results, stragglers, timeout):
+    """Find the SMuRFs that failed to stop streaming.
+
+    Args:
+        results (dict): Results of the :func:`_stop_tasks`, keyed by client.
+        stragglers (list): Clients whose stream had not stopped by the
+            deadline.
+        timeout (float): The deadline, in seconds, used for reporting.
+
+    Returns:
+        list: Clients to remove from the targets list.
+
+    Raises:
+        Exception: Any error, other than a RuntimeError, raised while
+            stopping a stream.
+
+    """
+    failed = []
+    for smurf, result in results.items():
+        # Includes case where agent becomes unreachable
+        if isinstance(result, RuntimeError):
+            print(f"Failed to stop stream on {smurf}, removing from targets list.")
+            print(result)
+            failed.append(smurf)
+        elif isinstance(result, Exception):
+            raise result
+
+    for smurf in stragglers:
+        print(f"Stream on {smurf} did not stop within {timeout} "
+              + "seconds, abandoning and removing from targets list.")
+        failed.append(smurf)
+
+    return failed
+
+
+def stream(state, tag=None, subtype=None, wait_for_stream=True, timeout=None,
+           profile=None, **kwargs):
     """Stream data on all SMuRF Controllers.
 
     Args:
@@ -376,6 +956,14 @@ def stream(state, tag=None, subtype=None, wait_for_stream=True, **kwargs):
         wait_for_stream (bool, optional): If True, block until the streams are
             all enabled. If False, check that the client call goes through, but
             do not wait. Defaults to True.
+        timeout (float, optional): Deadline, in seconds, for all streams to
+            stop when ``state`` is 'off'. Streams are stopped concurrently, and
+            any SMuRF that has not stopped by the deadline is abandoned and
+            removed from the targets list. If None, wait indefinitely.
+        profile (str or StreamProfile, optional): Stream profile, or the name
+            of one defined in the configuration file, to start the stream
+            with. Its settings are passed to the SMuRF controllers, and its
+            tags appended to ``tag``. Ignored when ``state`` is 'off'.
         **kwargs: Additional keyword arguments. Passed through to the SMuRF
             controller unmodified. See the `controller documentation
             <https://socs.readthedocs.io/en/main/agents/pysmurf-controller.html#socs.agents.pysmurf_controller.agent.PysmurfController.stream>`_.
@@ -384,11 +972,18 @@ def stream(state, tag=None, subtype=None, wait_for_stream=True, **kwargs):
     clients_to_remove = []
 
     if state.lower() == 'on':
+        if profile is not None:
+            profile = get_stream_profile(profile)
+            tag = profile.tag(tag)
+            kwargs = {**profile.kwargs, **kwargs}
+
+        _readmit_quarantined()
+
         for smurf in run.CLIENTS['smurf']:
             smurf.stream.start(subtype=subtype, tag=tag, kwargs=kwargs)
 
         for smurf in run.CLIENTS['smurf']:
-            resp = smurf.stream.status()
+            resp = retry_request(smurf, 'stream', 'status')
             try:
                 check_started(smurf, resp, timeout=60)
                 if wait_for_stream:
@@ -397,37 +992,16 @@ def stream(state, tag=None, subtype=None, wait_for_stream=True, **kwargs):
                 print(f"Failed to start stream on {smurf}, removing from targets list.")
                 print(e)
                 smurf.stream.stop()
+                _health.record_failure(smurf.instance_id)
                 clients_to_remove.append(smurf)
 
     else:
         print('Stopping SMuRF streams.')
-        for smurf in run.CLIENTS['smurf']:
-            try:
-                smurf.stream.stop()
-            # Handles case where agent becomes unreachable
-            except ControlClientError as e:
-                print(f"Failed to stop stream on {smurf}, removing from targets list.")
-                print(e)
-                clients_to_remove.append(smurf)
-
-        # Remove failed SMuRF clients
-        for client in clients_to_remove:
-            run.CLIENTS['smurf'].remove(client)
-        clients_to_remove = []
-
-        for smurf in run.CLIENTS['smurf']:
-            print(f'Waiting for stream from {smurf.instance_id} to stop.')
-            resp = smurf.stream.wait()
-            try:
-                check_response(smurf, resp)
-            except RuntimeError as e:
-                print(f"Failed to stop stream on {smurf}, removing from targets list.")
-                print(e)
-                clients_to_remove.append(smurf)
+        results, stragglers = run_concurrently(_stop_tasks(), timeout=timeout)
+        clients_to_remove = _failed_stops(results, stragglers, timeout)
 
     # Remove failed SMuRF clients
-    for client in clients_to_remove:
-        run.CLIENTS['smurf'].remove(client)
+    _remove_failed(clients_to_remove)
 
     # Check if enough SMuRFs remain
     _check_smurf_threshold()
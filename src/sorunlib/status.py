@@ -0,0 +1,279 @@
+"""Query and parse the status of Operations across many Agents.
+
+Sequences often need to check the state of several Operations before
+proceeding, i.e. the ``acq`` Process on each of the wiregrid Agents. Rather
+than making each status request in turn, :func:`gather` makes them all
+concurrently and returns once every response has arrived, so the check costs
+a single round-trip.
+
+The responses are the usual :class:`ocs.ocs_client.OCSReply` objects, so the
+existing checks in :mod:`sorunlib._internal` work on them directly::
+
+    replies = status.gather([(actuator, 'acq'), (encoder, 'acq')])
+    check_running(actuator, replies[(actuator, 'acq')])
+
+This module also provides light-weight parsed views of the common
+``session.data`` structures, i.e. :class:`ACUStatus`, which validate and
+extract the fields used by sorunlib once per response::
+
+    position = ACUStatus.from_reply(acu.monitor.status())
+    print(position.az, position.el)
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from sorunlib._internal import retry_request
+
+# Default deadline, in seconds, for all status requests to return
+STATUS_TIMEOUT = 10
+
+
+def _status(client, operation):
+    return retry_request(client, operation, 'status')
+
+
+def gather(requests, timeout=STATUS_TIMEOUT, return_exceptions=False):
+    """Get the status of several Operations concurrently.
+
+    Args:
+        requests (list): List of ``(client, operation)`` tuples, where
+            ``client`` is an :class:`ocs.ocs_client.OCSClient` and
+            ``operation`` is the name of the Operation to query. Duplicate
+            requests are only made once.
+        timeout (float): Deadline, in seconds, shared by all requests.
+        return_exceptions (bool): If True, exceptions raised by a request,
+            i.e. ``ControlClientError`` when an Agent is unreachable, are
+            returned in place of its response, as is a ``TimeoutError`` for
+            any request that has not returned before the deadline. If False,
+            the first exception, in request order, is raised.
+
+    Returns:
+        dict: Dictionary mapping each ``(client, operation)`` tuple to the
+        corresponding :class:`ocs.ocs_client.OCSReply`.
+
+    Raises:
+        RuntimeError: If any request has not returned before the deadline,
+            unless ``return_exceptions`` is True.
+
+    """
+    requests = list(dict.fromkeys(requests))
+    if not requests:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=len(requests))
+    futures = {request: executor.submit(_status, *request)
+               for request in requests}
+    _, not_done = wait(futures.values(), timeout=timeout)
+    # Do not wait on any stragglers
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    if not_done and not return_exceptions:
+        late = [f"{client.instance_id}.{op}" for (client, op), future
+                in futures.items() if future in not_done]
+        error = f"Status requests did not return within {timeout} " + \
+            f"seconds: {', '.join(late)}"
+        raise RuntimeError(error)
+
+    replies = {}
+    for request, future in futures.items():
+        if future in not_done:
+            client, op = request
+            error = f"Status request for {client.instance_id}.{op} did " + \
+                f"not return within {timeout} seconds."
+            replies[request] = TimeoutError(error)
+            continue
+
+        exception = future.exception()
+        if exception is None:
+            replies[request] = future.result()
+        elif return_exceptions:
+            replies[request] = exception
+        else:
+            raise exception
+
+    return replies
+
+
+# Parsed Session Data
+def _require(data, key, view):
+    try:
+        return data[key]
+    except (KeyError, TypeError):
+        error = f"Unable to parse {view} from session data, missing '{key}'."
+        raise RuntimeError(error)
+
+
+class SessionView:
+    """Parsed view of the ``session.data`` from an Operation.
+
+    Subclasses parse the fields used by sorunlib from the common Agent
+    sessions once, on creation, and expose them as attributes.
+
+    Args:
+        data (dict): The ``session.data`` dictionary.
+
+    Attributes:
+        timestamp (float): Time the data was last updated, if reported.
+
+    Raises:
+        RuntimeError: If any field required by the view is missing.
+
+    """
+    __slots__ = ('timestamp',)
+
+    def __init__(self, data):
+        if not isinstance(data, dict):
+            error = f"Unable to parse {type(self).__name__} from session " + \
+                f"data: {data!r}"
+            raise RuntimeError(error)
+        self.timestamp = data.get('timestamp')
+
+    @classmethod
+    def from_reply(cls, reply):
+        """Create the view from an Operation's response.
+
+        Args:
+            reply (ocs.ocs_client.OCSReply): Response from an OCS operation
+                call, i.e. ``client.acq.status()``.
+
+        """
+        data = _require(reply.session, 'data', cls.__name__)
+        return cls(data)
+
+    def __repr__(self):
+        fields = ', '.join(f'{slot}={getattr(self, slot)!r}'
+                           for cls in reversed(type(self).__mro__)
+                           for slot in getattr(cls, '__slots__', ()))
+        return f'{type(self).__name__}({fields})'
+
+
+class ACUStatus(SessionView):
+    """Telescope position from the ACU ``monitor`` Process.
+
+    Attributes:
+        az (float): Current azimuth position.
+        el (float): Current elevation position.
+        boresight (float): Current boresight position, None if not reported.
+        platform_type (str): Platform type, i.e. 'satp', if reported.
+
+    """
+    __slots__ = ('az', 'el', 'boresight', 'platform_type')
+
+    def __init__(self, data):
+        super().__init__(data)
+        status = _require(data, 'StatusDetailed', 'ACUStatus')
+        self.az = _require(status, 'Azimuth current position', 'ACUStatus')
+        self.el = _require(status, 'Elevation current position', 'ACUStatus')
+        self.boresight = status.get('Boresight current position')
+        self.platform_type = data.get('PlatformType')
+
+
+class HWPState(SessionView):
+    """HWP state from the HWP Supervisor ``monitor`` Process.
+
+    Attributes:
+        direction (str): Rotation direction, 'cw' or 'ccw', if known.
+        enc_freq (float): Rotation frequency measured by the encoder in Hz.
+        pid_current_freq (float): Rotation frequency reported by the PID
+            controller in Hz.
+        pid_target_freq (float): Target frequency of the PID controller in Hz.
+        is_spinning (bool): Whether the HWP is spinning.
+
+    """
+    __slots__ = ('direction', 'enc_freq', 'pid_current_freq',
+                 'pid_target_freq', 'is_spinning')
+
+    def __init__(self, data):
+        super().__init__(data)
+        state = _require(data, 'hwp_state', 'HWPState')
+        self.direction = state.get('direction')
+        self.enc_freq = state.get('enc_freq')
+        self.pid_current_freq = state.get('pid_current_freq')
+        self.pid_target_freq = state.get('pid_target_freq')
+        self.is_spinning = state.get('is_spinning')
+
+    @property
+    def freq(self):
+        """float: Best available measure of the rotation frequency in Hz,
+        preferring the encoder, or None if unavailable."""
+        if self.enc_freq is not None:
+            return self.enc_freq
+        return self.pid_current_freq
+
+
+class WiregridActuator(SessionView):
+    """Wiregrid state from the wiregrid actuator ``acq`` Process.
+
+    Attributes:
+        motor (int): Motor state, 0 is off, 1 is on.
+        position (str): Wiregrid position, i.e. 'inside' or 'outside'.
+
+    """
+    __slots__ = ('motor', 'position')
+
+    def __init__(self, data):
+        super().__init__(data)
+        fields = _require(data, 'fields', 'WiregridActuator')
+        self.motor = _require(fields, 'motor', 'WiregridActuator')
+        self.position = _require(fields, 'position', 'WiregridActuator')
+
+
+class WiregridEncoder(SessionView):
+    """Encoder state from the wiregrid encoder ``acq`` Process.
+
+    Attributes:
+        last_updated (float): Time of the latest data from the encoder.
+
+    """
+    __slots__ = ('last_updated',)
+
+    def __init__(self, data):
+        super().__init__(data)
+        fields = _require(data, 'fields', 'WiregridEncoder')
+        encoder_data = _require(fields, 'encoder_data', 'WiregridEncoder')
+        self.last_updated = _require(encoder_data, 'last_updated',
+                                     'WiregridEncoder')
+
+
+class BLHSpeed(SessionView):
+    """Chopper speed from the BLH motor controller ``acq`` Process.
+
+    Attributes:
+        rpm (float): Current rotation speed in RPM.
+
+    """
+    __slots__ = ('rpm',)
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.rpm = _require(data, 'RPM', 'BLHSpeed')
+
+
+class Labjack(SessionView):
+    """Sensor readings from a Labjack ``acq`` Process.
+
+    Attributes:
+        data (dict): Latest reading, keyed by sensor name, i.e. 'AIN0C'.
+
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.data = _require(data, 'data', 'Labjack')
+
+
+class SmurfStream(SessionView):
+    """Stream state from the pysmurf-controller ``stream`` Process.
+
+    Attributes:
+        stream_on (bool): Whether data is streaming. Assumed True if not
+            reported, as not all controllers report it.
+
+    """
+    __slots__ = ('stream_on',)
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.stream_on = data.get('stream_on', True)
@@ -1,9 +1,21 @@
 import time
 import sorunlib as run
 from sorunlib._internal import check_response, protect_shutdown, stop_smurfs
+from sorunlib.status import BLHSpeed
 
 ID_SHUTTER = 1
 
+# Fractional difference from the target speed within which the chopper is
+# considered to be at speed
+SPEED_TOLERANCE = 0.02
+# Interval, in seconds, between checks on the chopper speed
+SPEED_CHECK_INTERVAL = 1
+# Duration, in seconds, to wait for the chopper to reach speed
+SPEED_TIMEOUT = 60
+# Fixed duration, in seconds, to let the chopper settle when its speed is not
+# reported by the BLH agent
+SPEED_SETTLE_TIME = 10
+
 
 def _open_shutter():
     """Open the shutter of the stimulator"""
@@ -33,6 +45,102 @@ def _setup():
     check_response(blh, resp)
 
 
+def _get_speed():
+    """Get the chopper speed in RPM, or None if unavailable."""
+    blh = run.CLIENTS['stimulator']['blh']
+    try:
+        return BLHSpeed.from_reply(blh.acq.status()).rpm
+    except RuntimeError:
+        return None
+
+
+def _wait_for_speed(speed_rpm, timeout=SPEED_TIMEOUT, settle=SPEED_SETTLE_TIME):
+    """Wait for the chopper to reach a speed, as reported by the BLH agent.
+
+    If the BLH agent does not report the speed, i.e. the ``acq`` Process is
+    not running, fall back to waiting a fixed settle time instead.
+
+    Args:
+        speed_rpm (float): Target speed in RPM.
+        timeout (float): Duration, in seconds, to wait for the speed.
+        settle (float): Duration, in seconds, to wait if the speed is not
+            reported.
+
+    Returns:
+        bool: True if the speed was reached, False if the timeout was reached
+        first or the speed was not reported.
+
+    """
+    if _get_speed() is None:
+        print("WARNING: Chopper speed not reported by the BLH agent, waiting "
+              + f"{settle} seconds for it to reach {speed_rpm} RPM instead.")
+        time.sleep(settle)
+        return False
+
+    deadline = time.monotonic() + timeout
+    while True:
+        rpm = _get_speed()
+        if rpm is not None and \
+                abs(rpm - speed_rpm) <= SPEED_TOLERANCE * speed_rpm:
+            return True
+        if time.monotonic() > deadline:
+            print(f"WARNING: Chopper did not reach {speed_rpm} RPM within "
+                  + f"{timeout} seconds, last reported speed {rpm} RPM. "
+                  + "Continuing at an unconfirmed speed.")
+            return False
+        time.sleep(SPEED_CHECK_INTERVAL)
+
+
+def _sweep(speeds_rpm, duration, timeout=SPEED_TIMEOUT,
+           settle=SPEED_SETTLE_TIME):
+    """Step the chopper through a list of speeds, holding each for a given
+    duration once it has been reached.
+
+    Args:
+        speeds_rpm (list): Speeds in RPM to step through.
+        duration (float): Duration, in seconds, to hold each speed.
+        timeout (float): Duration, in seconds, to wait for the chopper to
+            reach each speed, after which the step continues regardless.
+        settle (float): Duration, in seconds, to wait for each speed if it is
+            not reported by the BLH agent.
+
+    Returns:
+        list: List of dicts, one per step, containing the 'speed_rpm', the
+        'start' and 'stop' times of the dwell as unix timestamps, and whether
+        the speed was 'confirmed' by the BLH agent.
+
+    """
+    blh = run.CLIENTS['stimulator']['blh']
+
+    steps = []
+    for speed_rpm in speeds_rpm:
+        resp = blh.set_values(speed=speed_rpm)
+        check_response(blh, resp)
+
+        confirmed = _wait_for_speed(speed_rpm, timeout=timeout, settle=settle)
+        start = time.time()
+        time.sleep(duration)
+        steps.append({'speed_rpm': speed_rpm,
+                      'start': start,
+                      'stop': time.time(),
+                      'confirmed': confirmed})
+
+    return steps
+
+
+def _stream_profile(profile, downsample_factor, filter_disable, filter_order,
+                    filter_cutoff):
+    """Get the stream profile to calibrate with, built from the downsample and
+    filter settings if no profile is given."""
+    if profile is not None:
+        return run.smurf.get_stream_profile(profile)
+
+    return run.smurf.StreamProfile(downsample_factor=int(downsample_factor),
+                                   filter_disable=filter_disable,
+                                   filter_order=filter_order,
+                                   filter_cutoff=filter_cutoff)
+
+
 @protect_shutdown
 def _stop():
     blh = run.CLIENTS['stimulator']['blh']
@@ -49,7 +157,8 @@ def _stop():
 def calibrate_tau(duration_step=20,
                   speeds_rpm=[225, 495, 945, 1395, 1845, 2205],
                   forward=True, do_setup=True, stop=True,
-                  downsample_factor=8, filter_disable=False, filter_order=None, filter_cutoff=None):
+                  downsample_factor=8, filter_disable=False, filter_order=None, filter_cutoff=None,
+                  profile=None):
     """Time constant calibration using the stimulator.
 
     Parameters
@@ -75,60 +184,49 @@ def calibrate_tau(duration_step=20,
     filter_cutoff : float, optional
         The cutoff frequency in Hz for the downsample filter for SMuRF. Defaults to None.
         If None is passed, will be (63/200)*sampling_rate.
+    profile : str or sorunlib.smurf.StreamProfile, optional
+        Stream profile, or the name of one defined in the configuration file,
+        to stream with. If given, overrides the downsample and filter
+        settings above. Defaults to None.
+
+    Returns
+    -------
+    list of dict
+        The 'speed_rpm' of each step, with the 'start' and 'stop' times of
+        its data as unix timestamps. Each step starts once the BLH agent
+        reports the chopper at speed, which is noted by 'confirmed'.
     """
 
     blh = run.CLIENTS['stimulator']['blh']
-    downsample_factor = int(downsample_factor)
+    profile = _stream_profile(profile, downsample_factor, filter_disable,
+                              filter_order, filter_cutoff)
 
     try:
-        tag = f'stimulator,time_constant,downsample_factor_{downsample_factor:.0f}'
-        if filter_disable is True:
-            tag += ',filter_disabled'
-        else:
-            if filter_cutoff is None:
-                filter_cutoff = int(63 / 200 * 4000 / downsample_factor)
-            tag += f',filter_cutoff_{filter_cutoff:.0f}'
-
-            if filter_order is not None and filter_order != 4:
-                tag += f',filter_order_{filter_order:.0f}'
-
-        run.smurf.stream('on',
-                         tag=tag,
-                         subtype='cal',
-                         downsample_factor=downsample_factor,
-                         filter_disable=filter_disable,
-                         filter_order=filter_order,
-                         filter_cutoff=filter_cutoff)
+        run.smurf.stream('on', tag='stimulator,time_constant', subtype='cal',
+                         profile=profile)
 
         if do_setup:
             _setup()
-            # Rotation setting
-            resp = blh.set_values(speed=speeds_rpm[0])
-            check_response(blh, resp)
-
+            # Rotation setting, the first speed is set by the sweep
             resp = blh.start_rotation(forward=forward)
             check_response(blh, resp)
 
-            speeds_rpm = speeds_rpm[1:]
-
-            # First data point
-            time.sleep(duration_step)
-
-        for speed_rpm in speeds_rpm:
-            resp = blh.set_values(speed=speed_rpm)
-            check_response(blh, resp)
-
-            time.sleep(duration_step)
+        # Each step is held for duration_step once the speed is reached, or
+        # straight away if the speed is not reported
+        steps = _sweep(speeds_rpm, duration_step, settle=0)
     finally:
         stop_smurfs()
 
         if stop:
             _stop()
 
+    return steps
+
 
 def calibrate_gain(duration=60, speed_rpm=90,
                    forward=True, do_setup=True, stop=True,
-                   downsample_factor=8, filter_disable=False, filter_order=None, filter_cutoff=None):
+                   downsample_factor=8, filter_disable=False, filter_order=None, filter_cutoff=None,
+                   profile=None):
     """Gain calibration with the stimulator
 
     Parameters
@@ -155,10 +253,15 @@ def calibrate_gain(duration=60, speed_rpm=90,
     filter_cutoff : float, optional
         The cutoff frequency in Hz for the downsample filter for SMuRF. Defaults to None.
         If None is passed, will be (63/200)*sampling_rate.
+    profile : str or sorunlib.smurf.StreamProfile, optional
+        Stream profile, or the name of one defined in the configuration file,
+        to stream with. If given, overrides the downsample and filter
+        settings above. Defaults to None.
     """
 
     blh = run.CLIENTS['stimulator']['blh']
-    downsample_factor = int(downsample_factor)
+    profile = _stream_profile(profile, downsample_factor, filter_disable,
+                              filter_order, filter_cutoff)
 
     try:
         resp = blh.set_values(speed=speed_rpm)
@@ -170,26 +273,11 @@ def calibrate_gain(duration=60, speed_rpm=90,
             resp = blh.start_rotation(forward=forward)
             check_response(blh, resp)
 
-        # Sleep for rotation stabilization
-        time.sleep(10)
-
-        tag = f'stimulator,gain,downsample_factor_{downsample_factor:.0f}'
-        if filter_disable is True:
-            tag += ',filter_disabled'
-        else:
-            if filter_cutoff is None:
-                filter_cutoff = int(63 / 200 * 4000 / downsample_factor)
-            tag += f',filter_cutoff_{filter_cutoff:.0f}'
-            if filter_order is not None and filter_order != 4:
-                tag += f',filter_order_{filter_order:.0f}'
-
-        run.smurf.stream('on',
-                         tag=tag,
-                         subtype='cal',
-                         downsample_factor=downsample_factor,
-                         filter_disable=filter_disable,
-                         filter_order=filter_order,
-                         filter_cutoff=filter_cutoff)
+        # Wait for rotation stabilization
+        _wait_for_speed(speed_rpm)
+
+        run.smurf.stream('on', tag='stimulator,gain', subtype='cal',
+                         profile=profile)
 
         # Data taking
         time.sleep(duration)
@@ -203,7 +291,8 @@ def calibrate_gain(duration=60, speed_rpm=90,
 def calibrate_gain_tau(duration_gain=60, duration_tau=10, duration_stabilization=10,
                        speed_rpm_gain=90, speeds_rpm_tau=[225, 495, 945, 1395, 1845, 2205],
                        forward=True,
-                       downsample_factor=8, filter_disable=False, filter_order=None, filter_cutoff=None):
+                       downsample_factor=8, filter_disable=False, filter_order=None, filter_cutoff=None,
+                       profile=None):
     """Gain and time-constant calibration at the same time
 
     Parameters
@@ -213,7 +302,9 @@ def calibrate_gain_tau(duration_gain=60, duration_tau=10, duration_stabilization
     duration_tau : float, optional
         Duration of each step of time constant measurement in sec, default to 10 sec.
     duration_stabilization: float, optional
-        Duration to stabilize the chopper wheel speed in sec, default to 10 sec.
+        Maximum duration to wait for the chopper wheel to reach each speed in
+        sec, default to 10 sec. Data taking for each step starts as soon as
+        the speed is reached.
     speed_rpm_gain : float, optional
         Rotation speed of the chopper wheel in RPM for gain calibration, default to 90 RPM.
     speeds_rpm_tau : list of float, optional
@@ -232,10 +323,22 @@ def calibrate_gain_tau(duration_gain=60, duration_tau=10, duration_stabilization
     filter_cutoff : float, optional
         The cutoff frequency in Hz for the downsample filter for SMuRF. Defaults to None.
         If None is passed, will be (63/200)*sampling_rate.
+    profile : str or sorunlib.smurf.StreamProfile, optional
+        Stream profile, or the name of one defined in the configuration file,
+        to stream with. If given, overrides the downsample and filter
+        settings above. Defaults to None.
+
+    Returns
+    -------
+    list of dict
+        The 'speed_rpm' of each time-constant step, with the 'start' and
+        'stop' times of its data as unix timestamps, and whether the speed
+        was 'confirmed' by the BLH agent.
     """
 
     blh = run.CLIENTS['stimulator']['blh']
-    downsample_factor = int(downsample_factor)
+    profile = _stream_profile(profile, downsample_factor, filter_disable,
+                              filter_order, filter_cutoff)
 
     try:
         # Shutter and chopper setup
@@ -247,37 +350,22 @@ def calibrate_gain_tau(duration_gain=60, duration_tau=10, duration_stabilization
         resp = blh.start_rotation(forward=forward)
         check_response(blh, resp)
 
-        # Sleep for rotation stabilization
-        time.sleep(duration_stabilization)
+        # Wait for rotation stabilization
+        _wait_for_speed(speed_rpm_gain, timeout=duration_stabilization,
+                        settle=duration_stabilization)
 
         # Start data taking
-        tag = f'stimulator,gain_and_timeconstant,downsample_factor_{downsample_factor:.0f}'
-        if filter_disable is True:
-            tag += ',filter_disabled'
-        else:
-            if filter_cutoff is None:
-                filter_cutoff = int(63 / 200 * 4000 / downsample_factor)
-            tag += f',filter_cutoff_{filter_cutoff:.0f}'
-            if filter_order is not None and filter_order != 4:
-                tag += f',filter_order_{filter_order:.0f}'
-
-        run.smurf.stream('on',
-                         tag=tag,
-                         subtype='cal',
-                         downsample_factor=downsample_factor,
-                         filter_disable=filter_disable,
-                         filter_order=filter_order,
-                         filter_cutoff=filter_cutoff)
+        run.smurf.stream('on', tag='stimulator,gain_and_timeconstant', subtype='cal',
+                         profile=profile)
 
         time.sleep(duration_gain)
 
-        for speed_rpm in speeds_rpm_tau:
-            resp = blh.set_values(speed=speed_rpm)
-            check_response(blh, resp)
-
-            time.sleep(duration_stabilization)
-            time.sleep(duration_tau)
+        steps = _sweep(speeds_rpm_tau, duration_tau,
+                       timeout=duration_stabilization,
+                       settle=duration_stabilization)
     finally:
         stop_smurfs()
 
         _stop()
+
+    return steps
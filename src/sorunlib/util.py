@@ -1,17 +1,201 @@
+import json
 import os
 import re
+import threading
+import time
+
+import requests
 
 from sorunlib.config import load_config
 
 from ocs import site_config
 from ocs.ocs_client import OCSClient
-from ocs.client_http import ControlClientError
+from ocs.client_http import ControlClient, ControlClientError
+
+# Default number of persistent connections kept to the crossbar server
+HTTP_POOL_SIZE = 10
+# Default duration, in seconds, to wait for crossbar to accept a connection or
+# reply to a request. Added to the timeout of 'wait' requests, which the Agent
+# may legitimately hold open for that long.
+HTTP_TIMEOUT = 30
+
+# Shared HTTP session used by all clients, see _configure_session()
+_SESSION = None
+# Request timeout used with the shared session, see _configure_session()
+_TIMEOUT = HTTP_TIMEOUT
+
+# Consecutive failed requests to an Agent before further requests fail fast
+BREAKER_THRESHOLD = 5
+# Duration, in seconds, to fail fast before letting a request through again
+BREAKER_COOLOFF = 30
 
 
 class CrossbarConnectionError(Exception):
     pass
 
 
+class CircuitOpenError(ControlClientError):
+    """Raised in place of a request to an Agent that has recently been
+    unreachable."""
+    pass
+
+
+class _CircuitBreaker:
+    """Track consecutive failed requests to each Agent, failing fast once an
+    Agent appears to be unreachable.
+
+    After ``threshold`` consecutive failures the circuit for that Agent opens,
+    and requests raise :class:`CircuitOpenError` without being sent. Once
+    ``cooloff`` seconds have passed a single request is let through to probe
+    the Agent. If it succeeds the circuit closes, otherwise it stays open for
+    another cool-off period.
+
+    Args:
+        threshold (int): Consecutive failures before the circuit opens.
+        cooloff (float): Duration, in seconds, the circuit stays open.
+
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooloff=BREAKER_COOLOFF):
+        self.threshold = threshold
+        self.cooloff = cooloff
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._open_until = {}
+
+    def check(self, address):
+        """Raise CircuitOpenError if requests to ``address`` should fail fast."""
+        with self._lock:
+            open_until = self._open_until.get(address)
+            if open_until is None:
+                return
+            if time.monotonic() < open_until:
+                error = f"Agent {address} is unreachable, not sending " + \
+                    "request. Will retry after cool-off."
+                raise CircuitOpenError(error)
+            # Let this request probe the agent, others keep failing fast
+            self._open_until[address] = time.monotonic() + self.cooloff
+
+    def success(self, address):
+        with self._lock:
+            self._failures.pop(address, None)
+            if self._open_until.pop(address, None) is not None:
+                print(f"Agent {address} is reachable again.")
+
+    def failure(self, address):
+        with self._lock:
+            failures = self._failures.get(address, 0) + 1
+            self._failures[address] = failures
+            if failures >= self.threshold:
+                if address not in self._open_until:
+                    print(f"Agent {address} failed {failures} consecutive "
+                          + "requests, failing fast for "
+                          + f"{self.cooloff} seconds.")
+                self._open_until[address] = time.monotonic() + self.cooloff
+
+
+_breaker = _CircuitBreaker()
+
+
+def _configure_session(pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT):
+    """Create the HTTP session shared by all clients created by sorunlib.
+
+    The session keeps connections to the crossbar server alive between
+    requests, rather than opening a new connection for every request. Its
+    connection pool is thread-safe and can be shared by concurrent callers.
+
+    Args:
+        pool_size (int): Maximum number of connections kept open.
+        timeout (float): Duration, in seconds, to wait for crossbar to accept
+            a connection or reply to a request, see :func:`_request_timeout`.
+
+    Returns:
+        requests.Session: The new shared session.
+
+    """
+    global _SESSION, _TIMEOUT, _breaker
+
+    # Start afresh with all agents
+    _breaker = _CircuitBreaker()
+
+    if _SESSION is not None:
+        _SESSION.close()
+
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                            pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    _SESSION = session
+    _TIMEOUT = timeout
+
+    return session
+
+
+def _request_timeout(args, kwargs):
+    """Get the ``(connect, read)`` timeout for a request.
+
+    Requests to 'wait' on an Operation are held open by the Agent for up to
+    their own timeout, which is added to the read timeout. If they have no
+    timeout the Agent may hold them open indefinitely, so only the connection
+    is timed out.
+
+    """
+    if args and args[0] == 'wait':
+        wait_timeout = kwargs.get('timeout')
+        if wait_timeout is None:
+            return (_TIMEOUT, None)
+        return (_TIMEOUT, wait_timeout + _TIMEOUT)
+    return (_TIMEOUT, _TIMEOUT)
+
+
+class _PooledControlClient(ControlClient):
+    """ControlClient that sends its requests using the shared session.
+
+    The request and error handling of ``ControlClient.call`` are unchanged. In
+    addition, requests time out if crossbar does not reply, see
+    :func:`_request_timeout`, and requests to Agents that have repeatedly been
+    unreachable or timed out fail fast with :class:`CircuitOpenError`, see
+    :class:`_CircuitBreaker`.
+
+    """
+
+    def call(self, procedure, *args, **kwargs):
+        if _SESSION is None:
+            _configure_session()
+
+        address = self.agent_addr
+        _breaker.check(address)
+
+        params = json.dumps({'procedure': procedure,
+                             'args': args, 'kwargs': kwargs})
+        try:
+            r = _SESSION.post(self.call_url, data=params,
+                              timeout=_request_timeout(args, kwargs))
+        except requests.exceptions.Timeout:
+            _breaker.failure(address)
+            raise ControlClientError([0, 0, 0, 0, 'client_http.error.timeout',
+                                      ['Request to %s timed out' % self.call_url], {}])
+        except requests.exceptions.ConnectionError:
+            _breaker.failure(address)
+            raise ControlClientError([0, 0, 0, 0, 'client_http.error.connection_error',
+                                      ['Failed to connect to %s' % self.call_url], {}])
+        if r.status_code != 200:
+            _breaker.failure(address)
+            raise ControlClientError([0, 0, 0, 0, 'client_http.error.request_error',
+                                      ['Server replied with code %i' % r.status_code], {}])
+        decoded = r.json()
+        if 'error' in decoded:
+            # Agent is not connected to crossbar
+            if "no callee registered" in str(decoded['args']):
+                _breaker.failure(address)
+            else:
+                _breaker.success(address)
+            raise ControlClientError([0, 0, 0, 0, decoded['error'], decoded['args'], decoded['kwargs']])
+        _breaker.success(address)
+        return decoded['args'][0]
+
+
 def _load_site_config(filename=None):
     """Load a site config file, searching for default.yaml in OCS_CONFIG DIR by
     default.
@@ -119,6 +303,11 @@ def _try_client(instanceid):
         print(f"Unexpected error trying to instantiate OCSClient for '{instanceid}'.")
         raise ControlClientError(e)
 
+    # Route all further requests through the shared session. OCSClient
+    # creates its own ControlClient, which its operations hold on to, so the
+    # existing instance is converted rather than replaced
+    client._client.__class__ = _PooledControlClient
+
     return client
 
 
@@ -207,6 +396,10 @@ def create_clients(config=None, sorunlib_config=None, test_mode=False):
     """
     clients = {}
 
+    cfg = load_config(filename=sorunlib_config)
+    _configure_session(cfg.get('http_pool_size', HTTP_POOL_SIZE),
+                       cfg.get('http_timeout', HTTP_TIMEOUT))
+
     if test_mode:
         smurf_agent_class = 'SmurfFileEmulator'
     else:
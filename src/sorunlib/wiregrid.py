@@ -2,6 +2,8 @@ import time
 
 import sorunlib as run
 from sorunlib._internal import check_response, check_running, stop_smurfs
+from sorunlib.status import (gather, ACUStatus, Labjack, SessionView,
+                             WiregridActuator, WiregridEncoder)
 
 EL_DIFF_THRESHOLD = 0.5  # deg diff from target that its ok to run calibration
 BORESIGHT_DIFF_THRESHOLD = 0.5  # deg
@@ -19,10 +21,11 @@ def _check_process_data(process, last_timestamp):
 
     Raises:
         RuntimeError: When the last timestamp was more than
-            AGENT_TIMEDIFF_THRESHOLD old.
+            AGENT_TIMEDIFF_THRESHOLD old, or is missing.
 
     """
     try:
+        assert (last_timestamp is not None)
         assert ((time.time() - last_timestamp) < AGENT_TIMEDIFF_THRESHOLD)
     except AssertionError:
         error = f"{process} has no updated data. Cannot proceed with " + \
@@ -43,7 +46,7 @@ def _verify_temp_response(response, sensor, min_temp):
         RuntimeError: When the temperature of sensor below ``min_temp``.
 
     """
-    temp = response.session['data']['data'][sensor]
+    temp = Labjack.from_reply(response).data[sensor]
     try:
         assert (temp > min_temp)
     except AssertionError:
@@ -61,8 +64,7 @@ def _check_zenith():
 
     """
     acu = run.CLIENTS['acu']
-    resp = acu.monitor.status()
-    el = resp.session['data']['StatusDetailed']['Elevation current position']
+    el = ACUStatus.from_reply(acu.monitor.status()).el
 
     zenith = False
     if (abs(el - 90) < EL_DIFF_THRESHOLD):
@@ -75,10 +77,10 @@ def _check_zenith():
 def _check_telescope_position(elevation_check=True, boresight_check=True):
     # Get current telescope position
     acu = run.CLIENTS['acu']
-    resp = acu.monitor.status()
-    az = resp.session['data']['StatusDetailed']['Azimuth current position']
-    el = resp.session['data']['StatusDetailed']['Elevation current position']
-    boresight = resp.session['data']['StatusDetailed']['Boresight current position']
+    position = ACUStatus.from_reply(acu.monitor.status())
+    az = position.az
+    el = position.el
+    boresight = position.boresight
 
     # Check appropriate elevation
     if elevation_check:
@@ -92,6 +94,11 @@ def _check_telescope_position(elevation_check=True, boresight_check=True):
 
     # Check boresight angle
     if boresight_check:
+        if boresight is None:
+            error = "Boresight position not reported by the ACU. Cannot " + \
+                    "check boresight angle before wiregrid calibration. " + \
+                    "Aborting."
+            raise RuntimeError(error)
         try:
             assert (abs(boresight - 0) < BORESIGHT_DIFF_THRESHOLD)
         except AssertionError:
@@ -140,11 +147,11 @@ def _check_motor_on():
     actuator = run.CLIENTS['wiregrid']['actuator']
 
     # Check motor is on
-    resp = actuator.acq.status()
-    if resp.session['data']['fields']['motor'] == 1:
+    motor = WiregridActuator.from_reply(actuator.acq.status()).motor
+    if motor == 1:
         print("Wiregrid motor already on.")
     # Turn on motor if needed
-    elif resp.session['data']['fields']['motor'] == 0:
+    elif motor == 0:
         resp = actuator.motor_on()
         check_response(actuator, resp)
     else:
@@ -158,33 +165,38 @@ def _check_agents_online():
     encoder = run.CLIENTS['wiregrid']['encoder']
     labjack = run.CLIENTS['wiregrid']['labjack']
 
+    replies = gather([(actuator, 'acq'),
+                      (kikusui, 'IV_acq'),
+                      (encoder, 'acq'),
+                      (labjack, 'acq')])
+
     # wiregrid_actuator
-    resp = actuator.acq.status()
-    last_timestamp = resp.session['data']['timestamp']
+    resp = replies[(actuator, 'acq')]
+    last_timestamp = SessionView.from_reply(resp).timestamp
     check_running(actuator, resp)
     _check_process_data("Actuator agent", last_timestamp)
 
     # wiregrid_kikusui
-    resp = kikusui.IV_acq.status()
-    last_timestamp = resp.session['data']['timestamp']
+    resp = replies[(kikusui, 'IV_acq')]
+    last_timestamp = SessionView.from_reply(resp).timestamp
     check_running(kikusui, resp)
     _check_process_data("Kikusui agent", last_timestamp)
 
     # wiregrid_encoder
-    resp = encoder.acq.status()
-    last_timestamp = resp.session['data']['timestamp']
+    resp = replies[(encoder, 'acq')]
+    last_timestamp = SessionView.from_reply(resp).timestamp
     check_running(encoder, resp)
     _check_process_data("Encoder agent", last_timestamp)
 
     # labjack
-    resp = labjack.acq.status()
-    last_timestamp = resp.session['data']['timestamp']
+    resp = replies[(labjack, 'acq')]
+    last_timestamp = SessionView.from_reply(resp).timestamp
     check_running(labjack, resp)
     _check_process_data("Labjack agent", last_timestamp)
 
     # encoder data stream
-    resp = encoder.acq.status()
-    last_timestamp = resp.session['data']['fields']['encoder_data']['last_updated']
+    resp = replies[(encoder, 'acq')]
+    last_timestamp = WiregridEncoder.from_reply(resp).last_updated
     _check_process_data("Encoder BBB", last_timestamp)
 
 
@@ -210,8 +222,7 @@ def _check_wiregrid_position():
 
     """
     actuator = run.CLIENTS['wiregrid']['actuator']
-    resp = actuator.acq.status()
-    position = resp.session['data']['fields']['position']
+    position = WiregridActuator.from_reply(actuator.acq.status()).position
     if position not in ['inside', 'outside']:
         raise RuntimeError("The wiregrid position is unknown. Aborting...")
     return position
@@ -276,7 +287,8 @@ def rotate(continuous, duration=30, num_laps=1, stopped_time=10.):
 
 
 def calibrate(continuous=False, elevation_check=True, boresight_check=True,
-              temperature_check=True, bias_step_before=True, bias_step_after=False):
+              temperature_check=True, bias_step_before=True, bias_step_after=False,
+              profile=None):
     """Run a wiregrid calibration.
 
     Args:
@@ -291,11 +303,16 @@ def calibrate(continuous=False, elevation_check=True, boresight_check=True,
             Default is True.
         bias_step_before (bool): Perform detector bias step with and without wiregrid before the calibration.
         bias_step_after (bool): Perform detector bias step with and without wiregrid after the calibration.
+        profile (str or sorunlib.smurf.StreamProfile, optional): Stream
+            profile, or the name of one defined in the configuration file, to
+            stream with. If None, the SMuRF defaults are used.
 
     """
     _check_telescope_position(elevation_check=elevation_check,
                               boresight_check=boresight_check)
     _check_agents_online()
+    if profile is not None:
+        profile = run.smurf.get_stream_profile(profile)
     if temperature_check:
         _check_temperature_sensors()
     _check_motor_on()
@@ -315,9 +332,9 @@ def calibrate(continuous=False, elevation_check=True, boresight_check=True,
         if bias_step_before:
             run.smurf.bias_step(tag=f'wiregrid, wg_before_wo_wg{el_tag}', concurrent=True)
             time.sleep(5)
-            run.smurf.stream('on', tag=f'wiregrid, wg_inserting{el_tag}', subtype='cal')
+            run.smurf.stream('on', tag=f'wiregrid, wg_inserting{el_tag}', subtype='cal', profile=profile)
         else:
-            run.smurf.stream('on', tag=f'wiregrid, {rotation_tag}{el_tag}', subtype='cal')
+            run.smurf.stream('on', tag=f'wiregrid, {rotation_tag}{el_tag}', subtype='cal', profile=profile)
 
         # Insert the wiregrid
         insert()
@@ -330,7 +347,7 @@ def calibrate(continuous=False, elevation_check=True, boresight_check=True,
             stop_smurfs()
             run.smurf.bias_step(tag=f'wiregrid, wg_before_wt_wg{el_tag}', concurrent=True)
             time.sleep(5)
-            run.smurf.stream('on', tag=f'wiregrid, {rotation_tag}{el_tag}', subtype='cal')
+            run.smurf.stream('on', tag=f'wiregrid, {rotation_tag}{el_tag}', subtype='cal', profile=profile)
 
         # Rotate the wiregrid
         rotate(continuous)
@@ -340,7 +357,7 @@ def calibrate(continuous=False, elevation_check=True, boresight_check=True,
             stop_smurfs()
             run.smurf.bias_step(tag=f'wiregrid, wg_after_wt_wg{el_tag}', concurrent=True)
             time.sleep(5)
-            run.smurf.stream('on', tag=f'wiregrid, wg_ejecting{el_tag}', subtype='cal')
+            run.smurf.stream('on', tag=f'wiregrid, wg_ejecting{el_tag}', subtype='cal', profile=profile)
 
         # Eject the wiregrid
         eject()
@@ -356,14 +373,14 @@ def calibrate(continuous=False, elevation_check=True, boresight_check=True,
     # Take data without wiregrid for polarization eff. measurement
     try:
         # Enable SMuRF streams
-        run.smurf.stream('on', tag=f'wiregrid, wg_after_wo_wg{el_tag}', subtype='cal')
+        run.smurf.stream('on', tag=f'wiregrid, wg_after_wo_wg{el_tag}', subtype='cal', profile=profile)
         time.sleep(10)
     finally:
         # Stop SMuRF streams
         stop_smurfs()
 
 
-def time_constant(num_repeats=1):
+def time_constant(num_repeats=1, profile=None):
     """
     Run a wiregrid time constant measurement.
 
@@ -372,6 +389,9 @@ def time_constant(num_repeats=1):
             If this is odd, the HWP direction will be changed to the opposite
             of the initial direction. If this is even, the HWP direction will be
             the same as the initial direction.
+        profile (str or sorunlib.smurf.StreamProfile, optional): Stream
+            profile, or the name of one defined in the configuration file, to
+            stream with. If None, the SMuRF defaults are used.
 
     """
     # Check the number of repeats
@@ -382,6 +402,8 @@ def time_constant(num_repeats=1):
     _check_agents_online()
     _check_motor_on()
     _check_telescope_position(elevation_check=True, boresight_check=False)
+    if profile is not None:
+        profile = run.smurf.get_stream_profile(profile)
     _check_wiregrid_position()
     if _check_wiregrid_position() == 'inside':
         error = "The wiregrid is already inserted before the wiregrid time " + \
@@ -397,6 +419,9 @@ def time_constant(num_repeats=1):
     # Check the current HWP direction
     try:
         current_hwp_direction = run.hwp._get_direction()  # 'cw' or 'ccw'
+        # Resolve the frequency sign for each direction while the HWP spins,
+        # before it is stopped to reverse it
+        run.hwp._get_direction_sign()
     except RuntimeError as e:
         error = "Wiregrid time constant measurment has failed " + \
                 "due to a failure in getting the HWP direction.\n" + str(e)
@@ -412,7 +437,7 @@ def time_constant(num_repeats=1):
     try:
         stream_tag = 'wiregrid, wg_time_constant, wg_inserting, ' + \
                      f'hwp_{current_hwp_direction}' + el_tag
-        run.smurf.stream('on', tag=stream_tag, subtype='cal')
+        run.smurf.stream('on', tag=stream_tag, subtype='cal', profile=profile)
         insert()
         # Rotate to get encoder reference
         rotate(continuous=True, duration=20)
@@ -437,7 +462,7 @@ def time_constant(num_repeats=1):
             stream_tag = 'wiregrid, wg_time_constant, ' + \
                          f'wg_stepwise, hwp_{current_hwp_direction}' + \
                          el_tag
-            run.smurf.stream('on', tag=stream_tag, subtype='cal')
+            run.smurf.stream('on', tag=stream_tag, subtype='cal', profile=profile)
             # Run stepwise rotation
             rotate(continuous=False)
         finally:
@@ -447,7 +472,7 @@ def time_constant(num_repeats=1):
         try:
             stream_tag = 'wiregrid, wg_time_constant, ' + \
                          f'hwp_change_{current_hwp_direction}_to_stop' + el_tag
-            run.smurf.stream('on', tag=stream_tag, subtype='cal')
+            run.smurf.stream('on', tag=stream_tag, subtype='cal', profile=profile)
             run.hwp.stop(active=True)
         finally:
             stop_smurfs()
@@ -456,15 +481,8 @@ def time_constant(num_repeats=1):
         try:
             stream_tag = 'wiregrid, wg_time_constant, ' + \
                          f'hwp_change_stop_to_{target_hwp_direction}' + el_tag
-            run.smurf.stream('on', tag=stream_tag, subtype='cal')
-            # Note: This is hardcoding the correspondence between direction and
-            # the sign of the frequency, which is subject to change depending
-            # on the hardware/agent configuration. This should be removed in
-            # the future, if possible.
-            if target_hwp_direction == 'ccw':
-                run.hwp.set_freq(freq=2.0)
-            elif target_hwp_direction == 'cw':
-                run.hwp.set_freq(freq=-2.0)
+            run.smurf.stream('on', tag=stream_tag, subtype='cal', profile=profile)
+            run.hwp.set_direction(target_hwp_direction, freq=2.0)
             current_hwp_direction = target_hwp_direction
         finally:
             stop_smurfs()
@@ -474,7 +492,7 @@ def time_constant(num_repeats=1):
         stream_tag = 'wiregrid, wg_time_constant, ' + \
                      f'wg_stepwise, hwp_{current_hwp_direction}' + \
                      el_tag
-        run.smurf.stream('on', tag=stream_tag, subtype='cal')
+        run.smurf.stream('on', tag=stream_tag, subtype='cal', profile=profile)
         # Run stepwise rotation
         rotate(continuous=False)
     finally:
@@ -491,7 +509,7 @@ def time_constant(num_repeats=1):
     try:
         stream_tag = 'wiregrid, wg_time_constant, wg_ejecting, ' + \
                      f'hwp_{current_hwp_direction}' + el_tag
-        run.smurf.stream('on', tag=stream_tag, subtype='cal')
+        run.smurf.stream('on', tag=stream_tag, subtype='cal', profile=profile)
         eject()
         time.sleep(5)
     finally:
@@ -1,12 +1,16 @@
 import os
 import ocs
 import pytest
+import signal
+import threading
 import datetime as dt
 
 from unittest.mock import MagicMock, patch
+from ocs.client_http import ControlClientError
 from ocs.ocs_client import OCSReply
 
-from sorunlib._internal import check_response, check_running, check_started, monitor_process
+from sorunlib._internal import check_response, check_running, check_started, monitor_process, protect_shutdown, retry_request, run_concurrently, RETRY_COUNTS
+from sorunlib.util import CircuitOpenError
 
 from util import create_session as create_unencoded_session
 
@@ -110,3 +114,77 @@ def test_monitor_process_invalid(client, response):
     stop_time = (dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=0.01)).isoformat()
     with pytest.raises(RuntimeError):
         monitor_process(client, 'test', stop_time, check_interval=1)
+
+
+class FlakyClient:
+    """Client whose test_op.status() fails a given number of times."""
+    def __init__(self, failures):
+        self.instance_id = 'flaky-id'
+        self.test_op = MagicMock()
+        self.test_op.status = MagicMock(
+            side_effect=[ControlClientError('blip')] * failures + ['reply'])
+
+
+@patch('sorunlib._internal.time.sleep')
+def test_retry_request(sleep):
+    client = FlakyClient(failures=2)
+    assert retry_request(client, 'test_op', 'status') == 'reply'
+    assert client.test_op.status.call_count == 3
+    assert RETRY_COUNTS[('flaky-id', 'test_op', 'status')] >= 2
+    # Exponential backoff
+    first, second = [c.args[0] for c in sleep.call_args_list[-2:]]
+    assert second > first
+
+
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_retry_request_exhausted():
+    client = FlakyClient(failures=3)
+    with pytest.raises(ControlClientError):
+        retry_request(client, 'test_op', 'status')
+
+
+def test_retry_request_circuit_open():
+    client = MockClient()
+    client.test_op.status = MagicMock(side_effect=CircuitOpenError('open'))
+    with pytest.raises(CircuitOpenError):
+        retry_request(client, 'test_op', 'status')
+    client.test_op.status.assert_called_once()
+
+
+def test_retry_request_not_idempotent():
+    client = MockClient()
+    client.test_op.start = MagicMock(side_effect=ControlClientError('blip'))
+    with pytest.raises(ControlClientError):
+        retry_request(client, 'test_op', 'start')
+    client.test_op.start.assert_called_once()
+
+
+def test_run_concurrently():
+    def fail():
+        raise RuntimeError('failed')
+
+    results, stragglers = run_concurrently({'a': lambda: 1, 'b': fail})
+    assert results['a'] == 1
+    assert isinstance(results['b'], RuntimeError)
+    assert stragglers == []
+
+
+def test_run_concurrently_deadline():
+    release = threading.Event()
+    tasks = {'fast': lambda: 1, 'stuck': lambda: release.wait(10)}
+    results, stragglers = run_concurrently(tasks, timeout=0.1)
+    release.set()
+    assert results == {'fast': 1}
+    assert stragglers == ['stuck']
+
+
+def test_protect_shutdown_restores_handlers():
+    int_handler = signal.getsignal(signal.SIGINT)
+
+    @protect_shutdown
+    def fail():
+        raise RuntimeError('failed')
+
+    with pytest.raises(RuntimeError):
+        fail()
+    assert signal.getsignal(signal.SIGINT) is int_handler
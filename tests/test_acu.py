@@ -1,13 +1,16 @@
 import os
 os.environ["OCS_CONFIG_DIR"] = "./test_util/"
+os.environ["SORUNLIB_CONFIG"] = "./data/example_config.yaml"
 import datetime as dt
 
 import pytest
+from unittest.mock import MagicMock
 
+import ocs
 from ocs.ocs_client import OCSReply
 from sorunlib import acu
 
-from util import create_patch_clients
+from util import _mock_acu_client, create_patch_clients, create_session
 
 
 patch_clients_satp = create_patch_clients('satp')
@@ -19,6 +22,24 @@ def test_move_to(patch_clients_satp):
     acu.run.CLIENTS['acu'].go_to.start.assert_called_with(az=180, el=60)
 
 
+def test_move_to_recorded(patch_clients_satp):
+    session = create_session('go_to', status='done', success=True)
+    session.start_time = 100
+    session.end_time = 130
+    reply = OCSReply(ocs.OK, 'msg', session.encoded())
+    acu.run.CLIENTS['acu'].go_to.wait = MagicMock(return_value=reply)
+
+    acu._move_log.clear()
+    acu.move_to(200, 60)
+    assert acu.recorded_moves() == []
+    acu.run.CLIENTS['acu'].monitor.status.assert_not_called()
+
+    acu.move_to(200, 60, record=True)
+    assert acu.recorded_moves() == [{'start': {'az': 180, 'el': 50},
+                                     'target': {'az': 200, 'el': 60},
+                                     'duration': 30}]
+
+
 def test_move_to_failed(patch_clients_satp):
     mocked_response = OCSReply(
         0, 'msg', {'success': False, 'op_name': 'go_to'})
@@ -36,6 +57,60 @@ def test_move_to_timedout(patch_clients_satp):
         acu.move_to(180, 90)
 
 
+def test_move_to_async(patch_clients_satp):
+    handle = acu.move_to_async(180, 60)
+    acu.run.CLIENTS['acu'].go_to.start.assert_called_with(az=180, el=60)
+    acu.run.CLIENTS['acu'].go_to.wait.assert_not_called()
+
+    handle.result(timeout=10)
+    acu.run.CLIENTS['acu'].go_to.wait.assert_called_once_with(timeout=10)
+
+    # Result is cached once the task completes
+    assert handle.done()
+    handle.result()
+    acu.run.CLIENTS['acu'].go_to.wait.assert_called_once()
+
+
+@pytest.mark.parametrize("status,done", [('running', False), ('done', True)])
+def test_move_to_async_done(patch_clients_satp, status, done):
+    session = create_session('go_to', status=status)
+    reply = OCSReply(ocs.OK, 'msg', session.encoded())
+    acu.run.CLIENTS['acu'].go_to.status = MagicMock(return_value=reply)
+
+    handle = acu.move_to_async(180, 60)
+    assert handle.done() is done
+
+
+def test_move_to_async_failed(patch_clients_satp):
+    mocked_response = OCSReply(
+        0, 'msg', {'success': False, 'op_name': 'go_to'})
+    acu.run.CLIENTS['acu'].go_to.wait.side_effect = [mocked_response]
+    handle = acu.move_to_async(180, 90)
+    with pytest.raises(RuntimeError):
+        handle.result()
+
+
+def test_move_to_async_cancel(patch_clients_satp):
+    handle = acu.move_to_async(180, 60)
+    handle.cancel()
+    acu.run.CLIENTS['acu'].go_to.abort.assert_called_once()
+
+
+def test_move_to_async_progress(patch_clients_satp):
+    # Mocked ACU reports (180, 50)
+    handle = acu.move_to_async(190, 60)
+    progress = handle.progress()
+    assert progress['position'] == {'az': 180, 'el': 50}
+    assert progress['remaining'] == 10
+    # No motion observed yet
+    assert progress['eta'] is None
+
+
+def test_move_to_async_progress_arrived(patch_clients_satp):
+    handle = acu.move_to_async(180, 50)
+    assert handle.progress()['eta'] == 0
+
+
 def test_move_to_target_before_start(patch_clients_satp):
     start = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=10)
     end = start + dt.timedelta(seconds=3600)
@@ -48,6 +123,9 @@ def test_move_to_target_within_range(patch_clients_satp):
     end = start + dt.timedelta(seconds=3600)
     acu.move_to_target(300, 50, start.isoformat(), end.isoformat(), -0.005)
     acu.run.CLIENTS['acu'].go_to.start.assert_called_once()
+    # Target drifts further during the slew from the current position
+    az = acu.run.CLIENTS['acu'].go_to.start.call_args.kwargs['az']
+    assert az < 300 - 0.005 * 60
 
 
 def test_move_to_target_after_stop(patch_clients_satp):
@@ -59,7 +137,48 @@ def test_move_to_target_after_stop(patch_clients_satp):
 
 def test_set_boresight(patch_clients_satp):
     acu.set_boresight(20)
-    acu.run.CLIENTS['acu'].set_boresight.assert_called_with(target=20)
+    acu.run.CLIENTS['acu'].set_boresight.start.assert_called_with(target=20)
+    acu.run.CLIENTS['acu'].set_boresight.wait.assert_called_once_with(
+        timeout=acu.MOVE_TIMEOUT)
+
+
+def test_set_boresight_failed(patch_clients_satp):
+    mocked_response = OCSReply(
+        ocs.ERROR, 'msg', {'success': False, 'op_name': 'set_boresight'})
+    acu.run.CLIENTS['acu'].set_boresight.wait.return_value = mocked_response
+    with pytest.raises(RuntimeError):
+        acu.set_boresight(20)
+
+
+def test_set_boresight_recorded(patch_clients_satp):
+    session = create_session('set_boresight', status='done', success=True)
+    session.start_time = 100
+    session.end_time = 110
+    reply = OCSReply(ocs.OK, 'msg', session.encoded())
+    acu.run.CLIENTS['acu'].set_boresight.wait = MagicMock(return_value=reply)
+
+    acu._move_log.clear()
+    acu.set_boresight(20, record=True)
+    assert acu.recorded_moves() == [{'start': {'boresight': 0},
+                                     'target': {'boresight': 20},
+                                     'duration': 10}]
+
+
+def test_set_boresight_async(patch_clients_satp):
+    handle = acu.set_boresight_async(20)
+    acu.run.CLIENTS['acu'].set_boresight.start.assert_called_with(target=20)
+    progress = handle.progress()
+    assert progress['position'] == {'boresight': 0}
+    assert progress['remaining'] == 20
+    handle.result()
+    acu.run.CLIENTS['acu'].set_boresight.wait.assert_called_once()
+
+
+def test_set_boresight_async_not_reported(patch_clients_satp):
+    acu.run.CLIENTS['acu'] = _mock_acu_client('satp', boresight=None)
+    handle = acu.set_boresight_async(20)
+    with pytest.raises(RuntimeError, match='boresight'):
+        handle.progress()
 
 
 def test_set_boresight_lat(patch_clients_lat):
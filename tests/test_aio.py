@@ -0,0 +1,81 @@
+import os
+os.environ["OCS_CONFIG_DIR"] = "./test_util/"
+os.environ["SORUNLIB_CONFIG"] = "./data/example_config.yaml"
+import asyncio
+import datetime as dt
+import inspect
+import time
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+import sorunlib
+from sorunlib import aio
+
+from util import create_patch_clients
+
+
+patch_clients = create_patch_clients('satp')
+
+
+@pytest.mark.parametrize("module", aio.__all__[:-1])
+def test_mirrored_functions(module):
+    sync = getattr(sorunlib, module)
+    mirror = getattr(aio, module)
+    for name, obj in vars(sync).items():
+        if name.startswith('_') or not inspect.isfunction(obj):
+            continue
+        if obj.__module__ != sync.__name__:
+            continue
+        if aio._is_context_manager(obj):
+            assert not hasattr(mirror, name)
+            continue
+        coro = getattr(mirror, name)
+        assert inspect.iscoroutinefunction(coro)
+        assert coro.__doc__ == obj.__doc__
+
+
+def test_context_managers_not_mirrored():
+    assert aio._is_context_manager(sorunlib.seq.hwp_spin_up)
+    assert not hasattr(aio.seq, 'hwp_spin_up')
+
+
+def test_move_to(patch_clients):
+    asyncio.run(aio.acu.move_to(180, 60))
+    sorunlib.CLIENTS['acu'].go_to.start.assert_called_with(az=180, el=60)
+
+
+def test_gather(patch_clients):
+    async def setup():
+        await asyncio.gather(aio.acu.move_to(180, 60),
+                             aio.smurf.bias_step())
+
+    asyncio.run(setup())
+    sorunlib.CLIENTS['acu'].go_to.start.assert_called_with(az=180, el=60)
+    for client in sorunlib.CLIENTS['smurf']:
+        client.take_bias_steps.start.assert_called_with(tag=None)
+
+
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_scan_in_thread(patch_clients):
+    # Shutdown protection is skipped when not in the main thread
+    target = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=0.01)
+    asyncio.run(aio.seq.scan(description='test',
+                             stop_time=target.isoformat(),
+                             width=20.))
+    sorunlib.CLIENTS['acu'].generate_scan.stop.assert_called_once()
+
+
+def test_wait_until_cancel():
+    async def cancel_wait():
+        target = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=60)
+        task = asyncio.create_task(aio.wait_until(target.isoformat()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.monotonic()
+    asyncio.run(cancel_wait())
+    # asyncio.run waits on the worker thread, which must exit promptly
+    assert time.monotonic() - start < 5
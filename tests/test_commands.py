@@ -2,6 +2,8 @@ import os
 os.environ["OCS_CONFIG_DIR"] = "./test_util/"
 import pytest
 import datetime as dt
+import threading
+import time
 
 from unittest.mock import MagicMock, patch
 
@@ -74,3 +76,54 @@ def test_wait_until_unsupported_tz():
     ("2020-01-01T00:00:00+00:00", None)])
 def test_wait_until(timestamp, tolerance):
     wait_until(timestamp, tolerance)
+
+
+@patch('sorunlib.commands.time.sleep', MagicMock())
+def test_wait_until_prepare():
+    prepare = [MagicMock(), MagicMock()]
+    wait_until(mkts(0.05), prepare=prepare)
+    for func in prepare:
+        func.assert_called_once_with()
+
+
+@patch('sorunlib.commands.time.sleep', MagicMock())
+def test_wait_until_prepare_single_callable():
+    prepare = MagicMock()
+    wait_until(mkts(0.05), prepare=prepare)
+    prepare.assert_called_once_with()
+
+
+@patch('sorunlib.commands.time.sleep', MagicMock())
+def test_wait_until_prepare_skipped_in_past():
+    prepare = MagicMock()
+    wait_until(mkts(-1), prepare=prepare)
+    prepare.assert_not_called()
+
+
+def test_wait_until_abort():
+    abort = threading.Event()
+    abort.set()
+    start = time.monotonic()
+    assert wait_until(mkts(60), abort=abort) is False
+    assert time.monotonic() - start < 1
+
+
+@patch('sorunlib.commands.time.sleep', MagicMock())
+def test_wait_until_completed():
+    assert wait_until(mkts(0.05), abort=threading.Event()) is True
+    assert wait_until(mkts(-1)) is True
+
+
+def test_wait_until_progress():
+    progress = MagicMock()
+    wait_until(mkts(0.05), progress=progress)
+    progress.assert_called()
+    remaining = progress.call_args[0][0]
+    assert 0 < remaining <= 0.05
+
+
+def test_wait_until_precision():
+    target = mkts(0.05)
+    wait_until(target)
+    now = dt.datetime.now(dt.timezone.utc)
+    assert now >= dt.datetime.fromisoformat(target)
@@ -2,14 +2,14 @@ import os
 os.environ["OCS_CONFIG_DIR"] = "./test_util/"
 
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 import time
 
 import ocs
 from ocs.ocs_client import OCSReply
 from sorunlib import hwp, smurf
 
-from util import create_patch_clients, create_session
+from util import _mock_hwp_client, create_patch_clients, create_session
 
 os.environ["SORUNLIB_CONFIG"] = "./data/example_config.yaml"
 
@@ -61,20 +61,94 @@ def test__get_direction_invalid(patch_clients_satp, direction):
 def test_stop(patch_clients_satp, active):
     hwp.stop(active=active)
     if active:
-        hwp.run.CLIENTS['hwp'].brake.assert_called_with()
+        hwp.run.CLIENTS['hwp'].brake.start.assert_called_with()
+        hwp.run.CLIENTS['hwp'].brake.wait.assert_called_once()
     else:
-        hwp.run.CLIENTS['hwp'].pmx_off.assert_called()
+        hwp.run.CLIENTS['hwp'].pmx_off.start.assert_called_with(wait_stop=True)
+        hwp.run.CLIENTS['hwp'].pmx_off.wait.assert_called_once()
 
 
 def test_stop_brake_voltage(patch_clients_satp):
     VOLTAGE = 5.0
     hwp.stop(active=True, brake_voltage=VOLTAGE)
-    hwp.run.CLIENTS['hwp'].brake.assert_called_with(brake_voltage=VOLTAGE)
+    hwp.run.CLIENTS['hwp'].brake.start.assert_called_with(brake_voltage=VOLTAGE)
 
 
 def test_set_freq(patch_clients_satp):
     hwp.set_freq(freq=2.0)
-    hwp.run.CLIENTS['hwp'].pid_to_freq.assert_called_with(target_freq=2.0)
+    hwp.run.CLIENTS['hwp'].pid_to_freq.start.assert_called_with(target_freq=2.0)
+    hwp.run.CLIENTS['hwp'].pid_to_freq.wait.assert_called_once()
+
+
+def _running_hwp_client(freqs, op='pid_to_freq'):
+    """HWP client whose frequency changing Task never completes, reporting the
+    given sequence of frequencies."""
+    client = _mock_hwp_client()
+    session = create_session(op, status='running')
+    reply = OCSReply(ocs.TIMEOUT, 'msg', session.encoded())
+    getattr(client, op).wait = MagicMock(return_value=reply)
+
+    replies = []
+    for freq in freqs:
+        session = create_session('monitor')
+        session.data = {'hwp_state': {'enc_freq': freq}}
+        replies.append(OCSReply(ocs.OK, 'msg', session.encoded()))
+    client.monitor.status = MagicMock(side_effect=replies)
+
+    return client
+
+
+@patch('sorunlib.hwp.DEFAULT_STALL_PARAMS', {'duration': 0, 'tolerance': 0.05})
+def test_set_freq_stalled(patch_clients_satp):
+    hwp.run.CLIENTS['hwp'] = _running_hwp_client([0.5, 0.5, 0.5])
+    with pytest.raises(RuntimeError, match='stalled'):
+        hwp.set_freq(freq=2.0)
+    hwp.run.CLIENTS['hwp'].abort_action.assert_called_once()
+
+
+def test_set_freq_timeout(patch_clients_satp):
+    hwp.run.CLIENTS['hwp'] = _running_hwp_client([0.5, 1.0, 1.5])
+    with pytest.raises(RuntimeError, match='within'):
+        hwp.set_freq(freq=2.0, timeout=0)
+    hwp.run.CLIENTS['hwp'].abort_action.assert_called_once()
+
+
+def test_set_freq_progress(patch_clients_satp, capsys):
+    client = _running_hwp_client([0.5, 1.0])
+    running = client.pid_to_freq.wait.return_value
+    done = client.pid_to_freq.status.return_value
+    client.pid_to_freq.wait = MagicMock(side_effect=[running, done, done])
+    hwp.run.CLIENTS['hwp'] = client
+
+    hwp.set_freq(freq=-2.0)
+    out = capsys.readouterr().out
+    assert 'HWP at 0.50 Hz, target 2.0 Hz, ETA: unknown' in out
+    assert 'HWP at 1.00 Hz, target 2.0 Hz, ETA:' in out
+    client.abort_action.assert_not_called()
+
+
+@pytest.mark.parametrize('op,func', [('pid_to_freq', lambda: hwp.set_freq(freq=3.0)),
+                                     ('brake', lambda: hwp.stop(active=True)),
+                                     ('pmx_off', lambda: hwp.stop(active=False))])
+def test_start_error(patch_clients_satp, op, func):
+    session = create_session(op)
+    reply = OCSReply(ocs.ERROR, 'msg', session.encoded())
+    getattr(hwp.run.CLIENTS['hwp'], op).start = MagicMock(return_value=reply)
+    with pytest.raises(RuntimeError, match='failed'):
+        func()
+    getattr(hwp.run.CLIENTS['hwp'], op).wait.assert_not_called()
+
+
+@patch('sorunlib.hwp.DEFAULT_STALL_PARAMS', {'duration': 0, 'tolerance': 0.05})
+def test_stop_passive_no_stall(patch_clients_satp):
+    client = _running_hwp_client([0.5, 0.5, 0.5], op='pmx_off')
+    running = client.pmx_off.wait.return_value
+    done = client.pmx_off.status.return_value
+    client.pmx_off.wait = MagicMock(side_effect=[running, running, done, done])
+    hwp.run.CLIENTS['hwp'] = client
+
+    hwp.stop(active=False)
+    client.abort_action.assert_not_called()
 
 
 def test_spin_up(patch_clients_satp):
@@ -93,6 +167,58 @@ def test_spin_down(patch_clients_satp):
     for client in smurf.run.CLIENTS['smurf']:
         client.stream.start.assert_called_once()
     hwp.run.CLIENTS['hwp'].disable_driver_board.assert_called_once()
-    hwp.run.CLIENTS['hwp'].brake.assert_called_with(brake_voltage=VOLTAGE)
+    hwp.run.CLIENTS['hwp'].brake.start.assert_called_with(brake_voltage=VOLTAGE)
     for client in smurf.run.CLIENTS['smurf']:
         client.stream.stop.assert_called_once()
+
+
+@pytest.fixture
+def reset_direction_sign():
+    hwp._reset()
+    yield
+    hwp._reset()
+
+
+@pytest.mark.parametrize('direction,freq', [('ccw', 2.0), ('cw', -2.0)])
+def test_set_direction(patch_clients_satp, reset_direction_sign, direction, freq):
+    hwp.set_direction(direction, freq=2.0)
+    hwp.run.CLIENTS['hwp'].pid_to_freq.start.assert_called_with(target_freq=freq)
+
+
+@pytest.mark.parametrize('direction,freq,sign', [
+    ('ccw', 2.0, {'ccw': 1, 'cw': -1}),
+    ('ccw', -2.0, {'ccw': -1, 'cw': 1}),
+    ('cw', 2.0, {'ccw': -1, 'cw': 1})])
+def test__get_direction_sign_from_supervisor(patch_clients_satp, reset_direction_sign,
+                                             direction, freq, sign):
+    hwp.run.CLIENTS['hwp'] = _mock_hwp_client(freq=freq, direction=direction)
+    assert hwp._get_direction_sign() == sign
+
+
+@pytest.mark.parametrize('freq,direction', [(0, 'ccw'), (2.0, None)])
+def test__get_direction_sign_unknown(patch_clients_satp, reset_direction_sign,
+                                     freq, direction):
+    hwp.run.CLIENTS['hwp'] = _mock_hwp_client(freq=freq, direction=direction)
+    with pytest.raises(RuntimeError, match='hwp_direction_sign'):
+        hwp._get_direction_sign()
+
+
+def test_set_direction_invalid(patch_clients_satp, reset_direction_sign):
+    with pytest.raises(RuntimeError):
+        hwp.set_direction('up', freq=2.0)
+
+
+def test__get_direction_sign_cached(reset_direction_sign):
+    with patch('sorunlib.config.load_config',
+               MagicMock(return_value={'hwp_direction_sign': {'ccw': -1, 'cw': 1}})) as load:
+        assert hwp._get_direction_sign() == {'ccw': -1, 'cw': 1}
+        assert hwp._get_direction_sign() == {'ccw': -1, 'cw': 1}
+        load.assert_called_once()
+
+
+@pytest.mark.parametrize('sign', [{'ccw': 1, 'cw': 1}, {'ccw': 1}])
+def test__get_direction_sign_invalid(reset_direction_sign, sign):
+    with patch('sorunlib.config.load_config',
+               MagicMock(return_value={'hwp_direction_sign': sign})):
+        with pytest.raises(RuntimeError):
+            hwp._get_direction_sign()
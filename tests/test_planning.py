@@ -0,0 +1,157 @@
+import os
+os.environ["OCS_CONFIG_DIR"] = "./test_util/"
+os.environ["SORUNLIB_CONFIG"] = "./data/example_config.yaml"
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from sorunlib import planning
+
+from util import create_patch_clients
+
+
+patch_clients = create_patch_clients('satp')
+
+START = dt.datetime(2024, 6, 21, 12, 0, 0, tzinfo=dt.timezone.utc)
+
+
+def _stop(seconds):
+    return (START + dt.timedelta(seconds=seconds)).isoformat()
+
+
+def test_plan_scan():
+    plan = planning.plan_scan(_stop(120), width=10, az=180, el=50,
+                              az_speed=1, az_accel=1,
+                              start_time=START.isoformat())
+    # 10 s sweeps, 2 s turnarounds
+    assert plan.num_sweeps == 10
+    assert plan.efficiency == pytest.approx(20 / 24, abs=0.01)
+    assert plan.duration == pytest.approx(120)
+    assert plan.overshoot == 0.5
+    assert np.max(plan.az) == pytest.approx(190.5, abs=0.01)
+    assert np.min(plan.az) == pytest.approx(179.5, abs=0.01)
+    assert np.all(plan.el == 50)
+    # Trajectory is continuous
+    assert np.max(np.abs(np.diff(plan.az))) <= 0.1 + 1e-9
+
+
+def test_plan_scan_drift():
+    plan = planning.plan_scan(_stop(48), width=10, az=180, el=50,
+                              az_speed=1, az_accel=1, az_drift=0.1,
+                              start_time=START.isoformat())
+    # Back at the first endpoint after two full periods, plus drift
+    assert plan.az[-1] == pytest.approx(180 + 0.1 * 48)
+
+
+def test_plan_scan_type3():
+    plan = planning.plan_scan(_stop(60), width=10, az=180, el=50,
+                              el_freq=0.1, scan_type=3, el_amp=1,
+                              start_time=START.isoformat())
+    assert np.max(plan.el) == pytest.approx(51)
+    assert np.min(plan.el) == pytest.approx(49)
+
+
+def test_plan_scan_too_short():
+    plan = planning.plan_scan(_stop(5), width=10, az=180, el=50,
+                              start_time=START.isoformat())
+    assert plan.num_sweeps == 0
+    assert plan.efficiency == 1
+
+
+def test_plan_scan_current_position(patch_clients):
+    target = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=60)
+    plan = planning.plan_scan(target.isoformat(), width=10)
+    planning.run.CLIENTS['acu'].monitor.status.assert_called_once()
+    assert len(plan.az) > 0
+
+
+PARAMS = {'az_speed': 2.0, 'az_accel': 1.0, 'el_speed': 1.0, 'el_accel': 1.0,
+          'boresight_speed': 1.0, 'boresight_accel': 1.0, 'settle_time': 0.}
+
+
+def test_slew_time():
+    # Short move never reaches full speed, 2 * sqrt(1 / 1)
+    assert planning.slew_time(0, 50, 1, 50, params=PARAMS) == pytest.approx(2)
+    # Long move, 20 / 2 + 2 / 1
+    assert planning.slew_time(0, 50, 20, 50, params=PARAMS) == pytest.approx(12)
+    # Limited by elevation, 10 / 1 + 1 / 1
+    assert planning.slew_time(0, 40, 0, 50, params=PARAMS) == pytest.approx(11)
+
+
+def test_slew_time_vectorized():
+    times = planning.slew_time(0, 50, np.array([1, 20]), 50, params=PARAMS)
+    assert times == pytest.approx([2, 12])
+
+
+def test_slew_time_config():
+    assert planning.load_slew_params() == planning.DEFAULT_SLEW_PARAMS
+    assert planning.slew_time(0, 50, 0, 50) == \
+        planning.DEFAULT_SLEW_PARAMS['settle_time']
+
+
+def test_solve_intercept():
+    az, duration = planning.solve_intercept(100, 50, drift=0.1, elapsed=10,
+                                            current_az=80, current_el=50,
+                                            params=PARAMS)
+    # Target is caught where it will be at the end of the slew
+    assert az == pytest.approx(100 + 0.1 * (10 + duration))
+    assert duration == pytest.approx(
+        planning.slew_time(80, 50, az, 50, params=PARAMS), abs=1e-3)
+
+
+def test_solve_intercept_batch():
+    targets = np.array([100, 60, 81])
+    az, duration = planning.solve_intercept(targets, 50, drift=-0.01,
+                                            elapsed=0, current_az=80,
+                                            current_el=50, params=PARAMS)
+    assert az.shape == (3,)
+    assert np.argsort(duration).tolist() == [2, 0, 1]
+
+
+def test_slew_time_boresight():
+    # Boresight rotation follows the az/el move, 10 / 1 + 1 / 1
+    assert planning.slew_time(0, 50, 20, 50, 0, 10, params=PARAMS) == \
+        pytest.approx(23)
+    assert planning.slew_time(0, 50, 20, 50, 10, 10, params=PARAMS) == \
+        pytest.approx(12)
+
+
+def test_order_moves():
+    positions = [(100, 50), (0, 50), (90, 50), (10, 50)]
+    order = planning.order_moves(positions, start=(0, 50), params=PARAMS)
+    assert order == [1, 3, 2, 0]
+
+
+def test_order_moves_boresight():
+    positions = [(0, 50, 45), (0, 50, -45), (0, 50, 0)]
+    order = planning.order_moves(positions, start=(0, 50, 0), params=PARAMS)
+    assert order[0] == 2
+
+
+def test_order_moves_trivial():
+    assert planning.order_moves([], params=PARAMS) == []
+    assert planning.order_moves([(0, 50)], params=PARAMS) == [0]
+
+
+def test_calibrate_slew():
+    # Simulate moves on a telescope with a faster az axis and a settle time
+    actual = dict(PARAMS, az_speed=3.0, settle_time=2.0)
+    moves = []
+    for distance in [20, 40, 80]:
+        duration = planning.slew_time(0, 50, distance, 50, params=actual)
+        moves.append({'start': {'az': 0, 'el': 50},
+                      'target': {'az': distance, 'el': 50},
+                      'duration': float(duration)})
+
+    params = planning.calibrate_slew(moves, params=PARAMS)
+    assert params['az_speed'] == pytest.approx(3.0)
+    # Without elevation moves to fit, the elevation speed is unchanged
+    assert params['el_speed'] == PARAMS['el_speed']
+    assert params['settle_time'] == pytest.approx(2.0)
+
+
+def test_calibrate_slew_insufficient_data():
+    moves = [{'start': {'az': 0, 'el': 50}, 'target': {'az': 20, 'el': 50},
+              'duration': 12.}]
+    assert planning.calibrate_slew(moves, params=PARAMS) == PARAMS
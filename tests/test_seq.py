@@ -2,6 +2,8 @@ import os
 os.environ["OCS_CONFIG_DIR"] = "./test_util/"
 os.environ["SORUNLIB_CONFIG"] = "./data/example_config.yaml"
 import datetime as dt
+import threading
+import time
 
 import ocs
 import pytest
@@ -33,6 +35,32 @@ def test_scan_types(patch_clients):
                  stop_time=target.isoformat(), width=20.)
 
 
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_scan_with_position(patch_clients):
+    # This affects test runtime duration keep it short
+    target = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=0.01)
+    seq.scan(description='test', stop_time=target.isoformat(), width=20.,
+             az=120., el=60.)
+    acu = seq.run.CLIENTS['acu']
+    acu.go_to.start.assert_called_once_with(az=120., el=60.)
+    acu.go_to.wait.assert_called_once()
+    acu.generate_scan.start.assert_called_once()
+    for smurf in seq.run.CLIENTS['smurf']:
+        smurf.stream.start.assert_called_once()
+
+
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_scan_with_position_failed_move(patch_clients):
+    mocked_response = OCSReply(
+        0, 'msg', {'success': False, 'op_name': 'go_to'})
+    seq.run.CLIENTS['acu'].go_to.wait.side_effect = [mocked_response]
+    target = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=10)
+    with pytest.raises(RuntimeError):
+        seq.scan(description='test', stop_time=target.isoformat(), width=20.,
+                 az=120., el=60.)
+    seq.run.CLIENTS['acu'].generate_scan.start.assert_not_called()
+
+
 @patch('sorunlib._internal.time.sleep', MagicMock())
 def test_scan_passed_stop_time(patch_clients):
     # This affects test runtime duration keep it short
@@ -103,6 +131,110 @@ def test_scan_failed_smurfs_on_shutdown(patch_clients):
     seq.run.CLIENTS['acu'].generate_scan.wait.assert_called()
 
 
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_scan_series(patch_clients):
+    target = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=0.01)
+    later = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=0.5)
+    past = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=10)
+    segments = [{'description': 'field1', 'stop_time': target.isoformat(),
+                 'width': 20.},
+                {'description': 'field2', 'stop_time': past.isoformat(),
+                 'width': 20.},
+                {'description': 'field3', 'stop_time': later.isoformat(),
+                 'width': 10., 'az': 120, 'el': 50, 'az_speed': 1}]
+    scanned = seq.scan_series(segments, tag='series')
+
+    assert [x['description'] for x in scanned] == ['field1', 'field3']
+    assert all(x['start'] <= x['stop'] for x in scanned)
+    assert seq.run.CLIENTS['acu'].generate_scan.start.call_count == 2
+    assert seq.run.CLIENTS['acu'].generate_scan.start.call_args.kwargs['az_speed'] == 1
+    seq.run.CLIENTS['acu'].go_to.start.assert_called_once()
+    for client in seq.run.CLIENTS['smurf']:
+        client.stream.start.assert_called_once()
+        client.stream.stop.assert_called_once()
+
+
+def test_scan_series_start_failed(patch_clients):
+    target = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=10)
+    segments = [{'description': 'field1', 'stop_time': target.isoformat(),
+                 'width': 20.}]
+    mocked_response = OCSReply(
+        ocs.ERROR, 'msg', {'success': False, 'op_name': 'generate_scan'})
+    seq.run.CLIENTS['acu'].generate_scan.start.return_value = mocked_response
+
+    with pytest.raises(RuntimeError):
+        seq.scan_series(segments)
+    seq.run.CLIENTS['acu'].generate_scan.stop.assert_called_once()
+    for client in seq.run.CLIENTS['smurf']:
+        client.stream.stop.assert_called_once()
+
+
+def test_scan_series_stream_failed(patch_clients):
+    target = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=10)
+    segments = [{'description': 'field1', 'stop_time': target.isoformat(),
+                 'width': 20.}]
+
+    with patch('sorunlib.seq.run.smurf.stream',
+               MagicMock(side_effect=RuntimeError)) as stream:
+        with pytest.raises(RuntimeError):
+            seq.scan_series(segments)
+    assert stream.call_args.args == ('off',)
+    seq.run.CLIENTS['acu'].generate_scan.start.assert_not_called()
+
+
+def test_scan_series_all_passed(patch_clients):
+    past = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=10)
+    segments = [{'description': 'field1', 'stop_time': past.isoformat(),
+                 'width': 20.}]
+    assert seq.scan_series(segments) == []
+    for client in seq.run.CLIENTS['smurf']:
+        client.stream.start.assert_not_called()
+
+
+def test_stop_scan_concurrent(patch_clients):
+    def slow_wait(**kwargs):
+        time.sleep(0.2)
+        return OCSReply(0, 'msg', {'success': True, 'op_name': 'op'})
+
+    seq.run.CLIENTS['acu'].generate_scan.wait = MagicMock(side_effect=slow_wait)
+    for client in seq.run.CLIENTS['smurf']:
+        client.stream.wait = MagicMock(side_effect=slow_wait)
+
+    start = time.monotonic()
+    seq._stop_scan()
+    assert time.monotonic() - start < 0.4
+    seq.run.CLIENTS['acu'].generate_scan.stop.assert_called_once()
+
+
+@patch('sorunlib.seq._stop_motion_timeout', MagicMock(return_value=0.2))
+def test_stop_scan_smurf_hung(patch_clients):
+    release = threading.Event()
+    hung = seq.run.CLIENTS['smurf'][0]
+    hung.stream.wait = MagicMock(side_effect=lambda **kwargs: release.wait(5))
+
+    seq._stop_scan()
+    # Removed by _stop_scan itself, not left to the abandoned thread
+    assert hung not in seq.run.CLIENTS['smurf']
+    assert len(seq.run.CLIENTS['smurf']) == 2
+    release.set()
+
+
+def test_stop_motion_timeout_covers_retries():
+    attempts = sorunlib._internal.RETRY_POLICIES['wait']['attempts']
+    assert seq._stop_motion_timeout() > attempts * seq.OP_TIMEOUT
+
+
+def test_stop_scan_motion_failed(patch_clients):
+    mocked_response = OCSReply(
+        0, 'msg', {'success': False, 'op_name': 'generate_scan'})
+    seq.run.CLIENTS['acu'].generate_scan.wait.side_effect = [mocked_response]
+
+    with pytest.raises(RuntimeError):
+        seq._stop_scan()
+    for client in seq.run.CLIENTS['smurf']:
+        client.stream.stop.assert_called_once()
+
+
 @patch('sorunlib.seq.time.sleep', MagicMock())
 def test_el_nod(patch_clients):
     sorunlib.acu.move_to(az=180, el=50)
@@ -116,3 +248,42 @@ def test_el_nod(patch_clients):
 
     # Move back to initial position
     seq.run.CLIENTS['acu'].go_to.start.assert_called_with(az=180, el=50)
+
+
+def test_hwp_spin_up(patch_clients):
+    with seq.hwp_spin_up(2.0) as spin_up:
+        spin_up.run(sorunlib.acu.move_to, az=180, el=60)
+        spin_up.run(sorunlib.smurf.uxm_relock)
+    assert spin_up.done()
+    seq.run.CLIENTS['hwp'].enable_driver_board.assert_called_once()
+    seq.run.CLIENTS['hwp'].pid_to_freq.start.assert_called_with(target_freq=2.0)
+    seq.run.CLIENTS['acu'].go_to.start.assert_called_with(az=180, el=60)
+
+
+def test_hwp_spin_up_incompatible(patch_clients):
+    release = threading.Event()
+    seq.run.CLIENTS['hwp'].enable_driver_board = MagicMock(
+        side_effect=lambda: release.wait(10) and MagicMock())
+
+    operation = MagicMock(__module__='sorunlib.seq', __name__='scan')
+    operation.side_effect = lambda: spin_up.done()
+    compatible = MagicMock(__module__='sorunlib.acu', __name__='move_to')
+    compatible.side_effect = lambda: spin_up.done()
+
+    with seq.hwp_spin_up(2.0) as spin_up:
+        # Runs immediately
+        assert spin_up.run(compatible) is False
+        release.set()
+        # Waits for the spin-up
+        assert spin_up.run(operation) is True
+
+
+def test_hwp_spin_up_failed(patch_clients):
+    mocked_response = OCSReply(
+        0, 'msg', {'success': False, 'op_name': 'enable_driver_board'})
+    seq.run.CLIENTS['hwp'].enable_driver_board.return_value = mocked_response
+
+    with pytest.raises(RuntimeError):
+        with seq.hwp_spin_up(2.0):
+            pass
+    seq.run.CLIENTS['hwp'].pid_to_freq.start.assert_not_called()
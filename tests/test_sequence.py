@@ -0,0 +1,91 @@
+import os
+os.environ["OCS_CONFIG_DIR"] = "./test_util/"
+os.environ["SORUNLIB_CONFIG"] = "./data/example_config.yaml"
+import threading
+
+import pytest
+from unittest.mock import MagicMock
+
+from sorunlib import sequence
+from sorunlib.sequence import execute, parallel, step, streaming
+
+from util import create_patch_clients
+
+
+patch_clients = create_patch_clients('satp', autouse=True)
+
+
+def _smurf_calls(op):
+    return [getattr(client.stream, op).call_count
+            for client in sequence.run.CLIENTS['smurf']]
+
+
+def test_execute_steps():
+    calls = []
+    execute(step(calls.append, 1), step(calls.append, 2))
+    assert calls == [1, 2]
+
+
+def test_parallel():
+    # Both branches must be running at once to get past the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    execute(parallel(step(barrier.wait), step(barrier.wait)))
+
+
+def test_parallel_error():
+    func = MagicMock(side_effect=RuntimeError('failed'))
+    other = MagicMock()
+    with pytest.raises(RuntimeError):
+        execute(parallel(step(func), step(other)))
+    other.assert_called_once()
+
+
+def test_parallel_multiple_streams():
+    with pytest.raises(RuntimeError):
+        parallel(streaming(tag='a'), step(print), streaming(tag='b'))
+
+
+def test_streaming():
+    func = MagicMock()
+    execute(streaming(step(func), tag='test'))
+    func.assert_called_once()
+    assert _smurf_calls('start') == [1, 1, 1]
+    assert _smurf_calls('stop') == [1, 1, 1]
+    start = sequence.run.CLIENTS['smurf'][0].stream.start
+    assert start.call_args.kwargs['tag'] == 'test'
+
+
+def test_streaming_coalesced():
+    func = MagicMock()
+    execute(streaming(step(func), tag='test'),
+            streaming(step(func), tag='test'),
+            streaming(streaming(step(func), tag='test'), tag='test'))
+    assert func.call_count == 3
+    assert _smurf_calls('start') == [1, 1, 1]
+    assert _smurf_calls('stop') == [1, 1, 1]
+
+
+def test_streaming_different_tags():
+    execute(streaming(tag='a'), streaming(tag='b'))
+    assert _smurf_calls('start') == [2, 2, 2]
+
+
+def test_streaming_nested_conflict():
+    with pytest.raises(RuntimeError):
+        execute(streaming(streaming(tag='b'), tag='a'))
+    # Outer stream is still stopped
+    assert _smurf_calls('stop') == [1, 1, 1]
+
+
+def test_cleanup():
+    cleanup = MagicMock()
+    with pytest.raises(ValueError):
+        execute(step(MagicMock(side_effect=ValueError('failed'))),
+                cleanup=[step(MagicMock(side_effect=RuntimeError('also'))),
+                         step(cleanup)])
+    cleanup.assert_called_once()
+
+
+def test_cleanup_error():
+    with pytest.raises(RuntimeError):
+        execute(step(print), cleanup=[step(MagicMock(side_effect=RuntimeError('failed')))])
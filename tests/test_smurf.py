@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from functools import partial
 os.environ["OCS_CONFIG_DIR"] = "./test_util/"
 
 from unittest.mock import MagicMock, patch
@@ -11,7 +14,7 @@ from ocs.ocs_client import OCSReply
 
 import sorunlib as run
 from sorunlib import smurf
-from util import create_patch_clients, create_session
+from util import _mock_smurf_client, create_patch_clients, create_session
 
 os.environ["SORUNLIB_CONFIG"] = "./data/example_config.yaml"
 
@@ -225,7 +228,329 @@ def test_wait_for_stream_timeout():
         client.stream.start.assert_called_once()
 
 
+@patch('sorunlib._internal.time.sleep', MagicMock())
 def test_stream_agent_unavailable_on_stop():
     # Replace 'smurf1' client with one that will error on stream.stop()
     run.CLIENTS['smurf'][0] = ErrorClient('smurf1')
     smurf.stream(state='off')
+
+
+def test_stream_off_deadline(reset_health):
+    release = threading.Event()
+    run.CLIENTS['smurf'][0].stream.wait = MagicMock(
+        side_effect=lambda **kwargs: release.wait(10))
+    start = time.monotonic()
+    smurf.stream(state='off', timeout=0.1)
+    release.set()
+    assert time.monotonic() - start < 5
+    assert len(smurf.run.CLIENTS['smurf']) == 2
+    assert 'smurf1' not in [x.instance_id for x in smurf.run.CLIENTS['smurf']]
+
+
+def test_check_targets():
+    smurf.check_targets()
+    assert len(smurf.run.CLIENTS['smurf']) == 3
+
+
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_check_targets_agent_unavailable():
+    run.CLIENTS['smurf'][0] = ErrorClient('smurf1')
+    smurf.check_targets()
+    assert len(smurf.run.CLIENTS['smurf']) == 2
+    assert 'smurf1' not in [x.instance_id for x in smurf.run.CLIENTS['smurf']]
+
+
+@patch('sorunlib.smurf.gather', partial(smurf.gather, timeout=0.1))
+def test_check_targets_agent_hung():
+    event = threading.Event()
+    smurf.run.CLIENTS['smurf'][0].stream.status = MagicMock(
+        side_effect=lambda: event.wait(5))
+    smurf.check_targets()
+    event.set()
+    assert len(smurf.run.CLIENTS['smurf']) == 2
+    assert 'smurf1' not in [x.instance_id for x in smurf.run.CLIENTS['smurf']]
+
+
+def _timed_reply(duration):
+    session = create_session('take_bias_steps', status='done', success=True)
+    session.start_time = 0
+    session.end_time = duration
+    return OCSReply(ocs.OK, 'msg', session.encoded())
+
+
+def _straggler_config(factor=3, quarantine_time=3600):
+    config = {'smurf_failure_threshold': 2,
+              'smurf_straggler_factor': factor,
+              'smurf_quarantine_time': quarantine_time}
+    return MagicMock(return_value=config)
+
+
+@pytest.fixture
+def reset_health():
+    smurf._reset()
+    yield
+    smurf._reset()
+
+
+def test_health_tracker_stragglers():
+    tracker = smurf._HealthTracker(window=5)
+    for _ in range(5):
+        tracker.record('smurf1', 'op', 100)
+        tracker.record('smurf2', 'op', 10)
+        tracker.record('smurf3', 'op', 12)
+    tracker.record('smurf4', 'op', 1000)  # too few samples to judge
+    assert tracker.stragglers(['smurf1', 'smurf2', 'smurf3', 'smurf4'], 'op', 3) == ['smurf1']
+    assert tracker.stragglers(['smurf1', 'smurf2', 'smurf3'], 'op', 10) == []
+    assert tracker.stragglers(['smurf1'], 'op', 3) == []
+
+
+def test_health_tracker_per_operation():
+    tracker = smurf._HealthTracker(window=5)
+    for _ in range(5):
+        # smurf1 has only run the slow operation, the others the fast one
+        tracker.record('smurf1', 'slow_op', 100)
+        tracker.record('smurf2', 'fast_op', 10)
+        tracker.record('smurf2', 'slow_op', 90)
+        tracker.record('smurf3', 'fast_op', 12)
+        tracker.record('smurf3', 'slow_op', 110)
+    assert tracker.stragglers(['smurf1', 'smurf2', 'smurf3'], 'slow_op', 3) == []
+    assert tracker.stragglers(['smurf1', 'smurf2', 'smurf3'], 'fast_op', 3) == []
+
+    tracker.reset('smurf2')
+    assert tracker.median_duration('smurf2', 'slow_op') is None
+    assert tracker.median_duration('smurf3', 'slow_op') == 110
+
+
+@patch('sorunlib.smurf.run.config.load_config', _straggler_config())
+def test_quarantine_straggler(reset_health):
+    slow = smurf.run.CLIENTS['smurf'][0]
+    slow.take_bias_steps.wait = MagicMock(return_value=_timed_reply(100))
+    for client in smurf.run.CLIENTS['smurf'][1:]:
+        client.take_bias_steps.wait = MagicMock(return_value=_timed_reply(10))
+
+    for _ in range(smurf.HEALTH_MIN_SAMPLES):
+        smurf.bias_step()
+
+    assert slow not in smurf.run.CLIENTS['smurf']
+    assert len(smurf.run.CLIENTS['smurf']) == 2
+    assert 'smurf1' in smurf._quarantine
+
+
+@patch('sorunlib.smurf.run.config.load_config', _straggler_config(factor=None))
+def test_quarantine_disabled(reset_health):
+    slow = smurf.run.CLIENTS['smurf'][0]
+    slow.take_bias_steps.wait = MagicMock(return_value=_timed_reply(100))
+    for _ in range(smurf.HEALTH_MIN_SAMPLES):
+        smurf.bias_step()
+
+    assert slow in smurf.run.CLIENTS['smurf']
+
+
+@patch('sorunlib.smurf.run.config.load_config', _straggler_config())
+def test_quarantine_respects_threshold(reset_health):
+    # Only two SMuRFs, which is the failure threshold
+    smurf.run.CLIENTS['smurf'].pop()
+    slow = smurf.run.CLIENTS['smurf'][0]
+    slow.take_bias_steps.wait = MagicMock(return_value=_timed_reply(100))
+    smurf.run.CLIENTS['smurf'][1].take_bias_steps.wait = MagicMock(return_value=_timed_reply(10))
+    for _ in range(smurf.HEALTH_MIN_SAMPLES):
+        smurf.bias_step()
+
+    assert slow in smurf.run.CLIENTS['smurf']
+
+
+@patch('sorunlib.smurf.run.config.load_config', _straggler_config(quarantine_time=0))
+def test_quarantine_readmit(reset_health):
+    slow = smurf.run.CLIENTS['smurf'][0]
+    smurf.run.CLIENTS['smurf'].remove(slow)
+    smurf._quarantine['smurf1'] = (slow, 0)
+
+    smurf.bias_step()
+    assert slow in smurf.run.CLIENTS['smurf']
+    assert smurf._quarantine == {}
+    slow.take_bias_steps.start.assert_called_once()
+
+
+@patch('sorunlib.smurf.run.config.load_config', _straggler_config(quarantine_time=0))
+def test_quarantine_readmit_missed(reset_health, capsys):
+    slow = smurf.run.CLIENTS['smurf'][0]
+    smurf.run.CLIENTS['smurf'].remove(slow)
+    smurf._quarantine['smurf1'] = (slow, time.time() + 3600)
+
+    smurf.uxm_relock()
+    slow.uxm_relock.start.assert_not_called()
+
+    smurf._quarantine['smurf1'] = (slow, 0)
+    smurf.bias_step()
+    assert slow not in smurf.run.CLIENTS['smurf']
+    assert smurf._quarantine == {}
+    assert 'smurf1' in smurf._dropped
+    assert 'missed uxm_relock while quarantined' in capsys.readouterr().out
+    slow.take_bias_steps.start.assert_not_called()
+
+
+@patch('sorunlib.smurf.run.config.load_config', _straggler_config(quarantine_time=0))
+def test_quarantine_readmit_missed_measurement(reset_health):
+    slow = smurf.run.CLIENTS['smurf'][0]
+    smurf.run.CLIENTS['smurf'].remove(slow)
+    smurf._quarantine['smurf1'] = (slow, time.time() + 3600)
+
+    smurf.take_noise()
+
+    smurf._quarantine['smurf1'] = (slow, 0)
+    smurf.bias_step()
+    assert slow in smurf.run.CLIENTS['smurf']
+
+
+def test_stream_off_stops_quarantined(reset_health):
+    slow = smurf.run.CLIENTS['smurf'][0]
+    smurf.run.CLIENTS['smurf'].remove(slow)
+    smurf._quarantine['smurf1'] = (slow, time.time() + 3600)
+
+    smurf.stream('off')
+    slow.stream.stop.assert_called_once()
+    assert 'smurf1' in smurf._quarantine
+
+
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_stream_off_quarantined_failure(reset_health):
+    slow = ErrorClient('smurf1')
+    smurf.run.CLIENTS['smurf'].pop(0)
+    smurf._quarantine['smurf1'] = (slow, time.time() + 3600)
+
+    smurf.stream('off')
+    assert len(smurf.run.CLIENTS['smurf']) == 2
+    assert smurf._quarantine == {}
+    assert 'smurf1' in smurf._dropped
+
+
+def test_straggler_settings_loaded_once(reset_health):
+    load = _straggler_config()
+    with patch('sorunlib.smurf.run.config.load_config', load):
+        smurf.bias_step()
+        load.return_value['smurf_straggler_factor'] = None
+        smurf.bias_step()
+    assert smurf._straggler_settings == (3, 2, 3600)
+
+
+@patch('sorunlib._internal.time.sleep', MagicMock())
+@patch('sorunlib.smurf.run.config.load_config', _straggler_config(quarantine_time=0))
+def test_quarantine_readmit_unreachable(reset_health):
+    slow = ErrorClient('smurf1')
+    smurf.run.CLIENTS['smurf'].pop(0)
+    smurf._quarantine['smurf1'] = (slow, 0)
+
+    smurf.bias_step()
+    assert slow not in smurf.run.CLIENTS['smurf']
+    assert smurf._quarantine == {}
+    assert 'smurf1' in smurf._dropped
+
+
+def test_set_targets_clears_quarantine(reset_health):
+    slow = smurf.run.CLIENTS['smurf'][0]
+    smurf._quarantine['smurf1'] = (slow, 0)
+    smurf.set_targets(['smurf2'])
+    assert smurf._quarantine == {}
+
+
+def test_recover_nothing_dropped(reset_health):
+    with patch('sorunlib.smurf._find_active_instances') as find:
+        assert smurf.recover() == []
+        find.assert_not_called()
+
+
+@patch('sorunlib.smurf._find_active_instances', MagicMock(return_value=['smurf1', 'smurf2']))
+@patch('sorunlib.smurf._try_client', _mock_smurf_client)
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_recover(reset_health):
+    # Drop smurf1 after a failure
+    run.CLIENTS['smurf'][0] = ErrorClient('smurf1')
+    smurf.stream(state='off')
+    assert smurf._dropped == {'smurf1'}
+    assert len(smurf.run.CLIENTS['smurf']) == 2
+
+    assert smurf.recover() == ['smurf1']
+    assert len(smurf.run.CLIENTS['smurf']) == 3
+    assert smurf._dropped == set()
+
+
+@patch('sorunlib.smurf._find_active_instances', MagicMock(return_value='smurf2'))
+def test_recover_offline(reset_health):
+    smurf._dropped.add('smurf1')
+    with patch('sorunlib.smurf._try_client') as try_client:
+        assert smurf.recover() == []
+        try_client.assert_not_called()
+    assert smurf._dropped == {'smurf1'}
+
+
+@patch('sorunlib.smurf._find_active_instances', MagicMock(return_value=['smurf1', 'smurf2']))
+@patch('sorunlib.smurf._try_client', ErrorClient)
+def test_recover_unreachable(reset_health):
+    smurf._dropped.add('smurf1')
+    assert smurf.recover() == []
+    assert len(smurf.run.CLIENTS['smurf']) == 3
+    assert smurf._dropped == {'smurf1'}
+
+
+def _profile_config(profiles):
+    config = {'smurf_failure_threshold': 2,
+              'smurf_stream_profiles': profiles}
+    return MagicMock(return_value=config)
+
+
+@pytest.mark.parametrize("settings,tag,cutoff", [
+    ({'downsample_factor': 8}, 'downsample_factor_8,filter_cutoff_157', 157),
+    ({'downsample_factor': 8, 'filter_order': 4},
+     'downsample_factor_8,filter_cutoff_157', 157),
+    ({'downsample_factor': 4, 'filter_order': 2, 'filter_cutoff': 100},
+     'downsample_factor_4,filter_cutoff_100,filter_order_2', 100),
+    ({'downsample_factor': 20, 'filter_disable': True},
+     'downsample_factor_20,filter_disabled', None),
+    ({'downsample_factor': 8, 'tags': 'fast'},
+     'fast,downsample_factor_8,filter_cutoff_157', 157)])
+def test_stream_profile(settings, tag, cutoff):
+    profile = smurf.StreamProfile(**settings)
+    assert profile.tag() == tag
+    assert profile.tag('stimulator,gain') == f'stimulator,gain,{tag}'
+    assert profile.filter_cutoff == cutoff
+    assert profile.kwargs['filter_cutoff'] == cutoff
+
+
+@pytest.mark.parametrize("settings", [
+    {'downsample_factor': 0},
+    {'downsample_factor': 2.5},
+    {'downsample_factor': 8, 'filter_disable': 'no'},
+    {'downsample_factor': 8, 'filter_order': 0},
+    {'downsample_factor': 8, 'filter_cutoff': -1}])
+def test_stream_profile_invalid(settings):
+    with pytest.raises(ValueError):
+        smurf.StreamProfile(**settings)
+
+
+@patch('sorunlib.smurf.run.config.load_config',
+       _profile_config({'fast': {'downsample_factor': 4, 'tags': ['fast']}}))
+def test_stream_w_profile(reset_health):
+    smurf.stream('on', tag='test', subtype='cal', profile='fast')
+    for client in smurf.run.CLIENTS['smurf']:
+        client.stream.start.assert_called_once_with(
+            tag='test,fast,downsample_factor_4,filter_cutoff_315',
+            subtype='cal',
+            kwargs={'downsample_factor': 4,
+                    'filter_disable': False,
+                    'filter_order': None,
+                    'filter_cutoff': 315})
+
+
+@patch('sorunlib.smurf.run.config.load_config',
+       _profile_config({'bad': {'downsample_factor': 4, 'unknown': 1}}))
+def test_stream_profile_invalid_config(reset_health):
+    with pytest.raises(RuntimeError, match="Invalid stream profile 'bad'"):
+        smurf.get_stream_profile('bad')
+
+
+@patch('sorunlib.smurf.run.config.load_config', _profile_config({}))
+def test_stream_profile_not_found(reset_health):
+    with pytest.raises(RuntimeError, match='not found'):
+        smurf.stream('on', profile='missing')
+    for client in smurf.run.CLIENTS['smurf']:
+        client.stream.start.assert_not_called()
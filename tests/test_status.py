@@ -0,0 +1,150 @@
+import os
+os.environ["OCS_CONFIG_DIR"] = "./test_util/"
+import threading
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+import ocs
+from ocs.client_http import ControlClientError
+from ocs.ocs_client import OCSReply
+
+from sorunlib import status
+from sorunlib._internal import check_running
+
+from util import create_session
+
+
+def create_client(instance_id, op_name, status='running'):
+    client = MagicMock()
+    client.instance_id = instance_id
+    session = create_session(op_name, status=status)
+    reply = OCSReply(ocs.OK, 'msg', session.encoded())
+    getattr(client, op_name).status = MagicMock(return_value=reply)
+    return client
+
+
+def test_gather():
+    clients = [create_client(f'agent{i}', 'acq') for i in range(4)]
+    replies = status.gather([(client, 'acq') for client in clients])
+    assert len(replies) == 4
+    for client in clients:
+        client.acq.status.assert_called_once()
+        check_running(client, replies[(client, 'acq')])
+
+
+def test_gather_empty():
+    assert status.gather([]) == {}
+
+
+def test_gather_duplicates():
+    client = create_client('agent', 'acq')
+    replies = status.gather([(client, 'acq'), (client, 'acq')])
+    assert len(replies) == 1
+    client.acq.status.assert_called_once()
+
+
+def test_gather_is_concurrent():
+    # Each request blocks until all have been made
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_for_all():
+        barrier.wait()
+        return MagicMock()
+
+    clients = [create_client(f'agent{i}', 'acq') for i in range(3)]
+    for client in clients:
+        client.acq.status = MagicMock(side_effect=wait_for_all)
+    replies = status.gather([(client, 'acq') for client in clients])
+    assert len(replies) == 3
+
+
+def test_gather_timeout():
+    event = threading.Event()
+    client = create_client('agent', 'acq')
+    client.acq.status = MagicMock(side_effect=lambda: event.wait(5))
+    with pytest.raises(RuntimeError, match='agent.acq'):
+        status.gather([(client, 'acq')], timeout=0.01)
+    event.set()
+
+
+def test_gather_timeout_return_exceptions():
+    event = threading.Event()
+    good = create_client('good', 'acq')
+    slow = create_client('slow', 'acq')
+    slow.acq.status = MagicMock(side_effect=lambda: event.wait(5))
+    replies = status.gather([(good, 'acq'), (slow, 'acq')], timeout=0.1,
+                            return_exceptions=True)
+    event.set()
+    assert isinstance(replies[(slow, 'acq')], TimeoutError)
+    check_running(good, replies[(good, 'acq')])
+
+
+@pytest.mark.parametrize("return_exceptions", [True, False])
+@patch('sorunlib._internal.time.sleep', MagicMock())
+def test_gather_exceptions(return_exceptions):
+    good = create_client('good', 'acq')
+    bad = create_client('bad', 'acq')
+    bad.acq.status = MagicMock(side_effect=ControlClientError('unreachable'))
+    requests = [(good, 'acq'), (bad, 'acq')]
+
+    if return_exceptions:
+        replies = status.gather(requests, return_exceptions=True)
+        assert isinstance(replies[(bad, 'acq')], ControlClientError)
+        check_running(good, replies[(good, 'acq')])
+    else:
+        with pytest.raises(ControlClientError):
+            status.gather(requests)
+
+
+def create_reply(data):
+    session = create_session('monitor')
+    session.data = data
+    return OCSReply(ocs.OK, 'msg', session.encoded())
+
+
+def test_acu_status():
+    reply = create_reply({'PlatformType': 'satp',
+                          'StatusDetailed': {'Azimuth current position': 180,
+                                             'Elevation current position': 50}})
+    position = status.ACUStatus.from_reply(reply)
+    assert position.az == 180
+    assert position.el == 50
+    assert position.boresight is None
+    assert position.platform_type == 'satp'
+    assert 'az=180' in repr(position)
+
+
+@pytest.mark.parametrize("data", [
+    {},
+    {'StatusDetailed': {'Azimuth current position': 180}},
+    None])
+def test_acu_status_invalid(data):
+    with pytest.raises(RuntimeError):
+        status.ACUStatus.from_reply(create_reply(data))
+
+
+@pytest.mark.parametrize("state,freq", [
+    ({'enc_freq': 2.0, 'pid_current_freq': 1.9}, 2.0),
+    ({'pid_current_freq': 1.9}, 1.9),
+    ({}, None)])
+def test_hwp_state_freq(state, freq):
+    hwp_state = status.HWPState.from_reply(create_reply({'hwp_state': state}))
+    assert hwp_state.freq == freq
+
+
+def test_blh_speed():
+    # Session data as published by the socs BLH agent acq Process
+    data = {'RPM': 495, 'error': 0, 'timestamp': 1736541796.779634}
+    speed = status.BLHSpeed.from_reply(create_reply(data))
+    assert speed.rpm == 495
+
+    with pytest.raises(RuntimeError, match='RPM'):
+        status.BLHSpeed.from_reply(create_reply({}))
+
+
+def test_views_use_slots():
+    view = status.SmurfStream({'stream_on': False})
+    assert not view.stream_on
+    with pytest.raises(AttributeError):
+        view.unknown = True
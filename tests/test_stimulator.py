@@ -35,9 +35,12 @@ def test_calibrate_tau(patch_clients_lat, do_setup, smurf_error):
         # start rotation
         stimulator.run.CLIENTS['stimulator']['blh'].start_rotation.assert_called_with(forward=True)
 
-    # speed setting
+    # speed setting, once per step
     for speed in [225, 495, 945, 1395, 1845, 2205]:
         stimulator.run.CLIENTS['stimulator']['blh'].set_values.assert_any_call(speed=speed)
+    speed_calls = [call for call in stimulator.run.CLIENTS['stimulator']['blh'].set_values.call_args_list
+                   if 'speed' in call.kwargs]
+    assert len(speed_calls) == 6
 
     # stop test
     stimulator.run.CLIENTS['stimulator']['blh'].stop_rotation.assert_called_with()
@@ -94,3 +97,68 @@ def test_calibrate_gain_tau(patch_clients_lat, smurf_error):
     # stop test
     stimulator.run.CLIENTS['stimulator']['blh'].stop_rotation.assert_called_with()
     stimulator.run.CLIENTS['stimulator']['ds378'].set_relay.assert_any_call(relay_number=1, on_off=0)
+
+
+@patch('sorunlib.stimulator.time.sleep', MagicMock())
+def test_calibrate_tau_steps(patch_clients_lat):
+    speeds = [225, 495]
+    steps = stimulator.calibrate_tau(speeds_rpm=speeds, duration_step=5)
+
+    assert [step['speed_rpm'] for step in steps] == speeds
+    assert all(step['confirmed'] for step in steps)
+    assert all(step['start'] <= step['stop'] for step in steps)
+
+
+@patch('sorunlib.stimulator.time.sleep', MagicMock())
+def test_wait_for_speed(patch_clients_lat):
+    blh = stimulator.run.CLIENTS['stimulator']['blh']
+    blh.set_values(speed=1000)
+
+    assert stimulator._wait_for_speed(1010)
+    assert not stimulator._wait_for_speed(1100, timeout=0)
+
+
+def test_wait_for_speed_no_data(patch_clients_lat, capsys):
+    blh = stimulator.run.CLIENTS['stimulator']['blh']
+    blh.acq.status.return_value = OCSReply(0, 'msg', {'data': {}})
+
+    with patch('sorunlib.stimulator.time.sleep') as sleep:
+        assert not stimulator._wait_for_speed(1000, settle=5)
+    sleep.assert_called_once_with(5)
+    assert 'WARNING: Chopper speed not reported' in capsys.readouterr().out
+
+
+@patch('sorunlib.stimulator.time.sleep', MagicMock())
+def test_wait_for_speed_timeout(patch_clients_lat, capsys):
+    blh = stimulator.run.CLIENTS['stimulator']['blh']
+    blh.set_values(speed=1000)
+
+    assert not stimulator._wait_for_speed(1100, timeout=0)
+    assert 'WARNING: Chopper did not reach 1100 RPM' in capsys.readouterr().out
+
+
+def test_calibrate_tau_no_speed(patch_clients_lat):
+    blh = stimulator.run.CLIENTS['stimulator']['blh']
+    blh.set_values = MagicMock()
+    blh.acq.status.return_value = OCSReply(0, 'msg', {'data': {}})
+
+    with patch('sorunlib.stimulator.time.sleep') as sleep:
+        steps = stimulator.calibrate_tau(speeds_rpm=[225, 495],
+                                         duration_step=5, do_setup=False,
+                                         stop=False)
+    assert not any(step['confirmed'] for step in steps)
+    # Each step is held for duration_step only, as before speed checks
+    assert [call.args for call in sleep.call_args_list] == [(0,), (5,), (0,), (5,)]
+
+
+@patch('sorunlib.stimulator.time.sleep', MagicMock())
+def test_calibrate_gain_profile(patch_clients_lat):
+    profile = stimulator.run.smurf.StreamProfile(downsample_factor=20,
+                                                 filter_disable=True)
+    stimulator.calibrate_gain(profile=profile)
+
+    for client in stimulator.run.CLIENTS['smurf']:
+        client.stream.start.assert_called_once_with(
+            tag='stimulator,gain,downsample_factor_20,filter_disabled',
+            subtype='cal',
+            kwargs=profile.kwargs)
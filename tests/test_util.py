@@ -1,7 +1,9 @@
+import inspect
 import os
 import pytest
+import requests
 
-from ocs.client_http import ControlClientError
+from ocs.client_http import ControlClient, ControlClientError
 from unittest.mock import MagicMock, patch
 
 from sorunlib import util
@@ -228,3 +230,139 @@ def test__create_clients_minimal_config():
     assert 'wiregrid' in clients
     for client in clients['wiregrid'].values():
         assert client is None
+
+
+def test__configure_session():
+    session = util._configure_session(pool_size=4)
+    assert util._SESSION is session
+    adapter = session.get_adapter('http://localhost:8001/call')
+    assert adapter._pool_maxsize == 4
+
+
+def _pooled_control_client():
+    return util._PooledControlClient('observatory.test-agent',
+                                     url='http://localhost:8001/call',
+                                     realm='test_realm')
+
+
+def _mock_post(status_code=200, json=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json = MagicMock(return_value=json)
+    return MagicMock(return_value=response)
+
+
+@pytest.mark.parametrize("post,error", [
+    (_mock_post(json={'args': ['result']}), None),
+    (_mock_post(status_code=500), ControlClientError),
+    (_mock_post(json={'error': 'wamp.error', 'args': [], 'kwargs': {}}), ControlClientError)])
+def test__pooled_control_client(post, error):
+    session = util._configure_session()
+    session.post = post
+    control_client = _pooled_control_client()
+
+    if error is None:
+        assert control_client.call('proc', 'arg') == 'result'
+    else:
+        with pytest.raises(error):
+            control_client.call('proc', 'arg')
+    post.assert_called_once()
+    assert post.call_args[0][0] == 'http://localhost:8001/call'
+
+
+@pytest.mark.parametrize("json", [
+    {'args': ['result']},
+    {'error': 'wamp.error', 'args': ['msg'], 'kwargs': {}}])
+def test__pooled_control_client_matches_upstream(json):
+    """_PooledControlClient reimplements ControlClient.call. This fails if
+    upstream changes the request it sends or how it handles the reply, so the
+    subclass can be updated to match."""
+    assert inspect.signature(util._PooledControlClient.call) == \
+        inspect.signature(ControlClient.call)
+
+    def call(control_client):
+        try:
+            return control_client.call('proc', 'arg', kw=1)
+        except ControlClientError as e:
+            return e.args
+
+    post = _mock_post(json=json)
+    with patch('ocs.client_http.requests.post', post):
+        expected = call(ControlClient('observatory.test-agent',
+                                      url='http://localhost:8001/call',
+                                      realm='test_realm'))
+
+    session = util._configure_session()
+    session.post = _mock_post(json=json)
+    assert call(_pooled_control_client()) == expected
+    assert session.post.call_args.args == post.call_args.args
+    assert session.post.call_args.kwargs['data'] == post.call_args.kwargs['data']
+
+
+def test__pooled_control_client_timeout():
+    session = util._configure_session(timeout=5)
+    session.post = MagicMock(side_effect=requests.exceptions.ReadTimeout())
+    control_client = _pooled_control_client()
+
+    for _ in range(util.BREAKER_THRESHOLD):
+        with pytest.raises(ControlClientError):
+            control_client.call('proc')
+    assert session.post.call_args.kwargs['timeout'] == (5, 5)
+    with pytest.raises(util.CircuitOpenError):
+        control_client.call('proc')
+
+
+@pytest.mark.parametrize("args,kwargs,timeout", [
+    (('status', 'op', {}), {}, (5, 5)),
+    (('wait', 'op', {}), {'timeout': 10}, (5, 15)),
+    (('wait', 'op', {}), {'timeout': None}, (5, None))])
+def test__request_timeout(args, kwargs, timeout):
+    util._configure_session(timeout=5)
+    assert util._request_timeout(args, kwargs) == timeout
+
+
+def test__try_client_uses_session():
+    ocs_client = MagicMock()
+    ocs_client._client = ControlClient('observatory.test-agent',
+                                       url='http://localhost:8001/call',
+                                       realm='test_realm')
+    session = util._configure_session()
+    session.post = _mock_post(json={'args': ['result']})
+    with patch('sorunlib.util.OCSClient', MagicMock(return_value=ocs_client)):
+        client = util._try_client('test-agent')
+    assert isinstance(client._client, util._PooledControlClient)
+    assert client._client.call('proc') == 'result'
+    session.post.assert_called_once()
+
+
+def test__circuit_breaker():
+    breaker = util._CircuitBreaker(threshold=2, cooloff=30)
+    breaker.failure('agent')
+    breaker.check('agent')
+    breaker.failure('agent')
+    with pytest.raises(util.CircuitOpenError):
+        breaker.check('agent')
+    breaker.check('other-agent')
+
+
+def test__circuit_breaker_half_open():
+    breaker = util._CircuitBreaker(threshold=1, cooloff=0)
+    breaker.failure('agent')
+    # Cool-off expired, first request probes the agent
+    breaker.check('agent')
+    breaker.success('agent')
+    breaker.check('agent')
+    assert 'agent' not in breaker._open_until
+
+
+def test__pooled_control_client_circuit_open():
+    session = util._configure_session()
+    session.post = _mock_post(status_code=500)
+    control_client = _pooled_control_client()
+
+    for _ in range(util.BREAKER_THRESHOLD):
+        with pytest.raises(ControlClientError):
+            control_client.call('proc')
+    with pytest.raises(util.CircuitOpenError):
+        control_client.call('proc')
+    assert session.post.call_count == util.BREAKER_THRESHOLD
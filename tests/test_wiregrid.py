@@ -196,7 +196,7 @@ def test__check_telescope_position(patch_clients):
     wiregrid.run.CLIENTS['acu'].monitor.status.assert_called_once()
 
 
-@pytest.mark.parametrize('el,boresight', [(40, 0), (50, 10)])
+@pytest.mark.parametrize('el,boresight', [(40, 0), (50, 10), (50, None)])
 @patch('sorunlib.wiregrid.run.CLIENTS', mocked_clients())
 def test__check_telescope_position_invalid(el, boresight):
     wiregrid.run.CLIENTS['acu'] = create_acu_client(180, el, boresight)
@@ -205,6 +205,15 @@ def test__check_telescope_position_invalid(el, boresight):
     wiregrid.run.CLIENTS['acu'].monitor.status.assert_called_once()
 
 
+@patch('sorunlib.wiregrid.run.CLIENTS', mocked_clients())
+def test__check_telescope_position_boresight_not_reported():
+    wiregrid.run.CLIENTS['acu'] = create_acu_client(180, 50, None)
+    with pytest.raises(RuntimeError, match='Boresight position not reported'):
+        wiregrid._check_telescope_position()
+    # Not needed if the boresight is not checked
+    wiregrid._check_telescope_position(boresight_check=False)
+
+
 @pytest.mark.parametrize('motor', [(0), (1)])
 @patch('sorunlib.wiregrid.run.CLIENTS', mocked_clients())
 def test__check_motor_on(motor):
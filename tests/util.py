@@ -68,9 +68,62 @@ def _mock_acu_client(platform_type, az=180, el=50, boresight=0):
     acu.generate_scan.start = MagicMock(return_value=reply)
     acu.generate_scan.status = MagicMock(return_value=reply)
 
+    # Moves complete immediately
+    session = create_session('go_to', status='done', success=True)
+    reply = OCSReply(ocs.OK, 'msg', session.encoded())
+    acu.go_to = MagicMock()
+    acu.go_to.status = MagicMock(return_value=reply)
+    acu.go_to.wait = MagicMock(return_value=reply)
+
     return acu
 
 
+def _mock_hwp_client(freq=2.0, direction='ccw'):
+    """Create a HWP supervisor client with mock monitor Process session.data,
+    whose frequency changing Tasks complete immediately."""
+    hwp = MagicMock()
+    session = create_session('monitor')
+    session.data = {'hwp_state': {'direction': direction,
+                                  'enc_freq': freq,
+                                  'pid_current_freq': freq,
+                                  'pid_target_freq': freq,
+                                  'is_spinning': freq != 0}}
+    reply = OCSReply(ocs.OK, 'msg', session.encoded())
+    hwp.monitor.status = MagicMock(return_value=reply)
+
+    for op in ['pid_to_freq', 'brake', 'pmx_off']:
+        session = create_session(op, status='done', success=True)
+        reply = OCSReply(ocs.OK, 'msg', session.encoded())
+        task = MagicMock()
+        task.start = MagicMock(return_value=reply)
+        task.status = MagicMock(return_value=reply)
+        task.wait = MagicMock(return_value=reply)
+        setattr(hwp, op, task)
+
+    return hwp
+
+
+def _mock_blh_client():
+    """Create a BLH client whose acq Process reports the chopper at the last
+    speed set."""
+    blh = MagicMock()
+
+    def set_values(**kwargs):
+        if 'speed' in kwargs:
+            session = create_session('acq')
+            # Matches the acq Process session.data of the socs BLH agent
+            session.data = {'RPM': kwargs['speed'],
+                            'error': 0,
+                            'timestamp': 1736541796.779634}
+            reply = OCSReply(ocs.OK, 'msg', session.encoded())
+            blh.acq.status = MagicMock(return_value=reply)
+        return MagicMock()
+
+    blh.set_values = MagicMock(side_effect=set_values)
+
+    return blh
+
+
 def mocked_clients(**kwargs):
     platform_type = kwargs.get('platform_type', 'satp')
 
@@ -78,13 +131,13 @@ def mocked_clients(**kwargs):
     smurfs = [_mock_smurf_client(id_) for id_ in smurf_ids]
 
     clients = {'acu': _mock_acu_client(platform_type),
-               'hwp': MagicMock(),
+               'hwp': _mock_hwp_client(),
                'smurf': smurfs,
                'wiregrid': {'actuator': MagicMock(),
                             'encoder': MagicMock(),
                             'kikusui': MagicMock(),
                             'labjack': MagicMock()},
-               'stimulator': {'blh': MagicMock(),
+               'stimulator': {'blh': _mock_blh_client(),
                               'ds378': MagicMock(),
                               'pcr500ma': MagicMock()}}
 